@@ -0,0 +1,164 @@
+import multiprocessing
+import queue
+import threading
+from collections import OrderedDict
+from game_state import interpret_fen, get_fen_en_passent
+from move_generator import generate_legal_moves, get_opponents_attacked_squares
+from position import Position, move_to_uci
+from search import Searcher, format_score
+
+# Position analysis off the GUI thread. Positions go to a worker process through a queue;
+# for each one it sends back the legal move table and the opponent's attacked squares
+# first, then an engine search result. A relay thread in the GUI process hands every
+# result to a post callback (main.py turns them into pygame events), so the event loop
+# never waits on move generation or search. Only the newest position is worked on: older
+# queued requests are dropped and a running search is stopped when a new one arrives.
+# Finished tables are kept per position in a TableCache, so going back to a position
+# (undo, redo) needs no request at all.
+
+ANALYSIS_MOVETIME = 500  # ms of engine search per position, 0 for none
+MOVES, ANALYSIS = "moves", "analysis"
+TABLE_CACHE_SIZE = 64  # positions whose tables are kept
+
+
+def position_key(fen):
+    # the position part of a FEN: the move counters don't change the legal moves
+    return " ".join(fen.split()[:4])
+
+
+def position_moves(fen):
+    # {"moves": {start: [(end, move_type)]}, "attacked": [squares]} for the side to move,
+    # the same lists generate_piece_moves and get_opponents_attacked_squares give
+    board, turn, castling, en_passant, _, _ = interpret_fen(fen)
+    en_passant = get_fen_en_passent(en_passant)
+    moves = {}
+    for start, end, move_type in generate_legal_moves(board, turn, en_passant, castling):
+        moves.setdefault(start, []).append((end, move_type))
+    return {"moves": moves, "attacked": get_opponents_attacked_squares(board, turn)}
+
+
+def engine_analysis(searcher, fen, movetime_ms):
+    try:
+        position = Position.from_fen(fen)
+    except ValueError as error:
+        return {"error": str(error)}
+    result = searcher.search(position, movetime_ms)
+    return {
+        "best_move": move_to_uci(result.best_move) if result.best_move else None,
+        "score": format_score(result.score),
+        "depth": result.depth,
+        "nodes": result.nodes,
+    }
+
+
+def _newest(requests, request):
+    # the last of request and anything queued behind it; None (shut down) wins
+    while request is not None:
+        try:
+            request = requests.get_nowait()
+        except queue.Empty:
+            break
+    return request
+
+
+def _worker_loop(requests, results, stop, movetime_ms):
+    searcher = Searcher(stop=stop)
+    while True:
+        request = _newest(requests, requests.get())
+        if request is None:
+            return
+        request_id, fen, want_moves = request
+        stop.clear()
+        if want_moves:
+            try:
+                moves = position_moves(fen)
+            except (ValueError, IndexError) as error:
+                moves = {"moves": {}, "attacked": [], "error": str(error)}
+            results.put((MOVES, request_id, moves))
+        if movetime_ms and requests.empty():
+            analysis = engine_analysis(searcher, fen, movetime_ms)
+            if not stop.is_set():
+                results.put((ANALYSIS, request_id, analysis))
+
+
+class AnalysisWorker:
+    # post(kind, request_id, result) is called from the relay thread for every result
+
+    def __init__(self, post, movetime_ms=ANALYSIS_MOVETIME):
+        # spawn, not the fork default on Linux: the GUI has already started SDL, the display
+        # and the mixer's audio threads, and a forked copy of those may deadlock or crash
+        context = multiprocessing.get_context("spawn")
+        self.post = post
+        self.requests = context.Queue()
+        self.results = context.Queue()
+        self.stop = context.Event()
+        self.last_id = 0
+        self.process = context.Process(target=_worker_loop, daemon=True,
+                                       args=(self.requests, self.results, self.stop, movetime_ms))
+        self.process.start()
+        self.relay = threading.Thread(target=self._relay, daemon=True)
+        self.relay.start()
+
+    def _relay(self):
+        while True:
+            item = self.results.get()
+            if item is None:
+                return
+            self.post(*item)
+
+    def submit(self, fen, moves=True):
+        # queues fen and returns its request id; results for older ids are stale.
+        # moves=False skips the move table when the caller already has it
+        self.last_id += 1
+        self.stop.set()
+        self.requests.put((self.last_id, fen, moves))
+        return self.last_id
+
+    def cancel(self):
+        # stops the running search; returns an id no result will carry
+        self.last_id += 1
+        self.stop.set()
+        return self.last_id
+
+    def close(self):
+        self.stop.set()
+        self.requests.put(None)
+        self.process.join(1)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.results.put(None)
+        self.relay.join(1)
+
+
+class TableCache:
+    # the last TABLE_CACHE_SIZE positions' worker results, least recently used dropped
+    # first: {"moves": ..., "attacked": ..., "analysis": ...} by position_key(fen)
+
+    def __init__(self, size=TABLE_CACHE_SIZE):
+        self.size = size
+        self.entries = OrderedDict()
+
+    def get(self, fen):
+        entry = self.entries.get(position_key(fen))
+        if entry is not None:
+            self.entries.move_to_end(position_key(fen))
+        return entry
+
+    def put(self, fen, entry):
+        key = position_key(fen)
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+        return entry
+
+
+def request_tables(worker, tables, fen):
+    # (request id, cached entry or None) for a new position; the worker is asked only for
+    # what the cache lacks, and is stopped when it holds everything
+    entry = tables.get(fen)
+    if entry is None:
+        return worker.submit(fen), None
+    if entry.get("analysis") is None:
+        return worker.submit(fen, moves=False), entry
+    return worker.cancel(), entry
@@ -0,0 +1,160 @@
+import argparse
+import json
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from move_generator import attack_map
+from position import Position, move_to_uci
+
+# Headless batch analysis: FEN or EPD lines in, one JSON object per position out. Every
+# stage is a generator and at most a fixed number of chunks is in flight in the process
+# pool, so memory stays flat however large the input is.
+
+FIELDS = ("moves", "check", "mobility", "attacks")
+DEFAULT_FIELDS = ("moves", "check", "mobility")
+CHUNK_SIZE = 256
+
+
+def square_name(index):
+    return chr(index % 8 + 97) + str(8 - index // 8)
+
+
+def read_positions(lines):
+    # (line number, fen, epd operations) for each non-blank, non-comment line. EPD lines
+    # carry four position fields followed by operations such as `bm e4; id "x";`
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        parts = line.split(None, 4)
+        if len(parts) > 4 and not parts[4].split(None, 1)[0].isdigit():
+            yield number, ' '.join(parts[:4]) + " 0 1", parts[4]
+        else:
+            yield number, line, ""
+
+
+def epd_id(operations):
+    for operation in operations.split(';'):
+        operation = operation.strip()
+        if operation.startswith("id "):
+            return operation[3:].strip().strip('"')
+    return None
+
+
+def analyze(fen, fields=DEFAULT_FIELDS):
+    position = Position.from_fen(fen)
+    board = position.board
+    enemy = 'b' if position.turn == 'w' else 'w'
+    record = {}
+    moves = position.legal_moves() if "moves" in fields or "mobility" in fields else None
+    if "moves" in fields:
+        record["moves"] = [move_to_uci(move) for move in moves]
+    if "check" in fields or "attacks" in fields:
+        enemy_attacks = attack_map(board, enemy)
+        if "check" in fields:
+            king = 'K' if position.turn == 'w' else 'k'
+            record["check"] = king in board and bool(enemy_attacks >> board.index(king) & 1)
+        if "attacks" in fields:
+            own_attacks = attack_map(board, position.turn)
+            record["attacks"] = {
+                position.turn: [square_name(index) for index in range(64) if own_attacks >> index & 1],
+                enemy: [square_name(index) for index in range(64) if enemy_attacks >> index & 1],
+            }
+    if "mobility" in fields:
+        by_piece = {}
+        for start, _, _, _ in moves:
+            piece = board[start[1] * 8 + start[0]].upper()
+            by_piece[piece] = by_piece.get(piece, 0) + 1
+        record["mobility"] = {"total": len(moves), "by_piece": by_piece}
+    return record
+
+
+def analyze_chunk(chunk, fields):
+    # one output dict per (line number, fen, operations) item; bad FENs become error records
+    results = []
+    for number, fen, operations in chunk:
+        result = {"line": number, "fen": fen}
+        identifier = epd_id(operations) if operations else None
+        if identifier is not None:
+            result["id"] = identifier
+        try:
+            result.update(analyze(fen, fields))
+        except (ValueError, IndexError, KeyError) as error:
+            result["error"] = str(error)
+        results.append(result)
+    return results
+
+
+def chunked(items, size):
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def analyze_stream(positions, fields=DEFAULT_FIELDS, workers=1, chunk_size=CHUNK_SIZE):
+    # results in input order; with workers > 1 chunks go to a process pool, at most two per
+    # worker outstanding at a time (Executor.map would read the whole input up front)
+    chunks = chunked(positions, chunk_size)
+    if workers <= 1:
+        for chunk in chunks:
+            yield from analyze_chunk(chunk, fields)
+        return
+    with ProcessPoolExecutor(workers) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(analyze_chunk, chunk, fields))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def run_batch(lines, output, fields=DEFAULT_FIELDS, workers=1, chunk_size=CHUNK_SIZE):
+    # writes JSON lines as results arrive; returns (positions, errors)
+    count = errors = 0
+    for result in analyze_stream(read_positions(lines), fields, workers, chunk_size):
+        output.write(json.dumps(result, separators=(',', ':')) + "\n")
+        count += 1
+        if "error" in result:
+            errors += 1
+    output.flush()
+    return count, errors
+
+
+def parse_fields(text):
+    fields = tuple(field.strip() for field in text.split(',') if field.strip())
+    unknown = [field for field in fields if field not in FIELDS]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown field(s) {', '.join(unknown)}, expected some of {', '.join(FIELDS)}")
+    return fields
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze FEN/EPD positions in bulk, writing one JSON line each.")
+    parser.add_argument("input", nargs="?", default="-", help="FEN or EPD file, one position per line (default: stdin)")
+    parser.add_argument("-o", "--output", default="-", help="output file (default: stdout)")
+    parser.add_argument("--fields", type=parse_fields, default=DEFAULT_FIELDS,
+                        help=f"comma-separated outputs from {', '.join(FIELDS)} (default: {','.join(DEFAULT_FIELDS)})")
+    parser.add_argument("-j", "--workers", type=int, default=1, help="analyze in this many processes")
+    parser.add_argument("--chunk", type=int, default=CHUNK_SIZE, help="positions sent to a worker at a time")
+    args = parser.parse_args(argv)
+
+    source = sys.stdin if args.input == "-" else open(args.input)
+    output = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        count, errors = run_batch(source, output, args.fields, args.workers, args.chunk)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+    print(f"{count} positions, {errors} errors", file=sys.stderr)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,442 @@
+import argparse
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from itertools import product
+from move_generator import generate_legal_moves, is_square_attacked, index_square, PROMOTION_PIECES
+
+# Endgame bitbases built by retrograde analysis. A table covers one material set (KQvK,
+# KPvK, ...) with white as the stronger side: every placement of its pieces, with either
+# side to move, gets a win/draw/loss value and a distance to mate in plies, both from the
+# side to move's point of view. Castling and en passant are ignored.
+# Entries are bit-packed, 2 bits of WDL plus as many DTM bits as the longest mate needs,
+# and table files are memory-mapped when probed.
+# Only one placement of the two kings per symmetry class is stored: the board's 8
+# symmetries without pawns (462 king pairs), the left-right mirror with them (1806).
+# Other positions are mirrored onto those before they are indexed.
+# The command line builds tables of up to MAX_PIECES pieces: a 4-piece set has 64 times
+# the entries of a 3-piece one, roughly 15 minutes without pawns and an hour with them,
+# and about a gigabyte of edge lists.
+
+DRAW, WIN, LOSS, INVALID = 0, 1, 2, 3
+WDL_NAMES = ("draw", "win", "loss", "invalid")
+UNKNOWN = 255  # only during generation
+
+PIECE_VALUES = {'K': 0, 'Q': 9, 'R': 5, 'B': 3, 'N': 3, 'P': 1}
+PIECE_ORDER = "KQRBNP"
+DRAWN_MATERIAL = ("KvK", "KBvK", "KNvK")
+MAX_PIECES = 3
+
+HEADER = struct.Struct("<4sB16sBI")  # magic, version, material, DTM bits, entries
+MAGIC = b"BTBS"
+VERSION = 2
+BITBASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bitbases")
+DEFAULT_MATERIAL = ("KQvK", "KRvK", "KPvK")
+
+
+def material_key(board):
+    white = ''.join(sorted((piece for piece in board if piece.isupper()), key=PIECE_ORDER.index))
+    black = ''.join(sorted((piece.upper() for piece in board if piece.islower()), key=PIECE_ORDER.index))
+    return f"{white}v{black}"
+
+
+def swap_sides(material):
+    white, black = material.split('v')
+    return f"{black}v{white}"
+
+
+def canonical_material(material):
+    # tables are only built with the stronger side as white
+    white, black = material.split('v')
+    white_value = sum(PIECE_VALUES[piece] for piece in white)
+    black_value = sum(PIECE_VALUES[piece] for piece in black)
+    if black_value > white_value or (black_value == white_value and len(black) > len(white)):
+        return swap_sides(material)
+    return material
+
+
+def flip(board, turn):
+    # the same position with colours swapped and the board mirrored top to bottom
+    return ''.join(board[start:start + 8] for start in range(56, -8, -8)).swapcase(), 'b' if turn == 'w' else 'w'
+
+
+def table_pieces(material):
+    # piece letters in index order: both kings, then white's other pieces, then black's
+    white, black = material.split('v')
+    return ['K', 'k'] + list(white[1:]) + [piece.lower() for piece in black[1:]]
+
+
+def _symmetries():
+    # square maps of the 8 symmetries of the board, the identity first
+    maps = []
+    for flip_x, flip_y, swap in product((False, True), repeat=3):
+        table = []
+        for index in range(64):
+            x, y = index % 8, index // 8
+            if swap:
+                x, y = y, x
+            table.append((7 - y if flip_y else y) * 8 + (7 - x if flip_x else x))
+        maps.append(table)
+    return maps
+
+
+SYMMETRIES = _symmetries()
+MIRRORS = [SYMMETRIES[0], SYMMETRIES[4]]  # identity and a <-> h, all that keeps pawns moving the same way
+
+
+def _king_pairs(maps):
+    # (canonical (white king, black king) pairs, [(pair number, square map)] by white * 64 + black);
+    # a placement maps onto the smallest pair any symmetry gives it, by the first map that
+    # does, so a canonical pair keeps the identity
+    pairs = []
+    numbers = {}
+    lookup = [None] * 4096
+    for white in range(64):
+        for black in range(64):
+            if max(abs(white % 8 - black % 8), abs(white // 8 - black // 8)) < 2:
+                continue
+            images = [(table[white], table[black]) for table in maps]
+            best = min(images)
+            if best not in numbers:
+                numbers[best] = len(pairs)
+                pairs.append(best)
+            lookup[white * 64 + black] = (numbers[best], maps[images.index(best)])
+    return pairs, lookup
+
+
+KING_PAIRS = _king_pairs(SYMMETRIES)
+PAWN_KING_PAIRS = _king_pairs(MIRRORS)
+
+
+def king_pairs(material):
+    return PAWN_KING_PAIRS if 'P' in material else KING_PAIRS
+
+
+def table_path(material, directory=BITBASE_DIR):
+    return os.path.join(directory, f"{material}.btb")
+
+
+def board_index(board, turn, pieces, kings):
+    # entry index: side to move, king pair, then one 6-bit square per other piece in table
+    # order, after the symmetry that takes the kings to their canonical pair
+    pairs, lookup = kings
+    pair, table = lookup[board.index('K') * 64 + board.index('k')]
+    squares = {}
+    for index, piece in enumerate(board):
+        if piece != '.' and piece not in 'Kk':
+            squares.setdefault(piece, []).append(table[index])
+    index = (len(pairs) if turn == 'b' else 0) + pair
+    for piece in pieces[2:]:
+        # identical pieces take their squares in ascending order
+        placed = squares[piece]
+        square = min(placed)
+        placed.remove(square)
+        index = index * 64 + square
+    return index
+
+
+class Bitbase:
+    # Read-only, memory-mapped table file; use as a context manager or call close()
+
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, material, self.dtm_bits, self.count = HEADER.unpack_from(self.data)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a version {VERSION} bitbase file")
+        self.material = material.rstrip(b'\0').decode('ascii')
+        self.pieces = table_pieces(self.material)
+        self.kings = king_pairs(self.material)
+        self.width = 2 + self.dtm_bits
+        self.mask = (1 << self.width) - 1
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def entry(self, index):
+        # (wdl, dtm) of entry index
+        bit = index * self.width
+        offset = HEADER.size + (bit >> 3)
+        value = (int.from_bytes(self.data[offset:offset + 3], 'little') >> (bit & 7)) & self.mask
+        return value & 3, value >> 2
+
+    def probe_board(self, board, turn):
+        return self.entry(board_index(board, turn, self.pieces, self.kings))
+
+
+_open_tables = {}
+
+
+def open_table(material, directory=BITBASE_DIR):
+    # the cached Bitbase for a canonical material key, or None without a table file
+    path = table_path(material, directory)
+    table = _open_tables.get(path)
+    if table is None:
+        if not os.path.exists(path):
+            return None
+        table = _open_tables[path] = Bitbase(path)
+    return table
+
+
+def close_tables():
+    for table in _open_tables.values():
+        table.close()
+    _open_tables.clear()
+
+
+def probe_board(board, turn, directory=BITBASE_DIR):
+    # (wdl, dtm) for the side to move, or None when no table covers the material
+    material = material_key(board)
+    canonical = canonical_material(material)
+    if canonical in DRAWN_MATERIAL:
+        return DRAW, 0
+    if canonical != material:
+        board, turn = flip(board, turn)
+    table = open_table(canonical, directory)
+    if table is None:
+        return None
+    return table.probe_board(board, turn)
+
+
+def probe(position, directory=BITBASE_DIR):
+    # probe_board for a Position; positions with castling rights are not in the tables
+    if position.castling != '-':
+        return None
+    return probe_board(position.board, position.turn, directory)
+
+
+def pack(values, dtms, dtm_bits):
+    # little-endian bit stream of (wdl | dtm << 2) entries, padded so every 3-byte read fits
+    width = 2 + dtm_bits
+    data = bytearray((len(values) * width + 7) // 8 + 2)
+    for index, value in enumerate(values):
+        if value == DRAW:
+            continue
+        bit = index * width
+        offset = bit >> 3
+        entry = (value | (dtms[index] << 2)) << (bit & 7)
+        while entry:
+            data[offset] |= entry & 255
+            entry >>= 8
+            offset += 1
+    return data
+
+
+def _child_result(board, turn, directory, verbose):
+    # (wdl, dtm) of a position with other material, generating its table if needed
+    result = probe_board(board, turn, directory)
+    if result is None:
+        generate(canonical_material(material_key(board)), directory, verbose)
+        result = probe_board(board, turn, directory)
+    return result
+
+
+def generate(material, directory=BITBASE_DIR, verbose=True):
+    # builds the table for a material key such as "KRvK", and the tables its captures and
+    # promotions lead to when they are missing; returns (path, stats)
+    started = time.perf_counter()
+    material = canonical_material(material)
+    pieces = table_pieces(material)
+    size = len(pieces)
+    kings = king_pairs(material)
+    count = 2 * len(kings[0]) * 64 ** (size - 2)
+    weights = [64 ** (size - 1 - slot) for slot in range(size)]
+    values = bytearray([UNKNOWN]) * count
+    dtms = bytearray(count)
+    remaining = array('H', bytes(2 * count))
+    floors = bytearray(count)
+    starts = array('I', [0])
+    edges = array('I')
+    buckets = {}
+
+    # forward pass: children of every position, and the results of leaving the table
+    index = 0
+    for turn in ('w', 'b'):
+        enemy = 'b' if turn == 'w' else 'w'
+        base = 0 if turn == 'w' else count // 2
+        child_base = count // 2 - base
+        king_slot = 1 if turn == 'w' else 0
+        for pair, others in product(kings[0], product(range(64), repeat=size - 2)):
+            squares = pair + others
+            if index % 262144 == 0 and verbose:
+                print(f"{material}: {index}/{count} positions", file=sys.stderr)
+            board = ['.'] * 64
+            for piece, square in zip(pieces, squares):
+                board[square] = piece
+            board = ''.join(board)
+            if (board.count('.') != 64 - size or any(board[square] in 'Pp' and not 8 <= square < 56 for square in squares)
+                    or is_square_attacked(board, index_square(squares[king_slot]), turn)):
+                values[index] = INVALID
+                starts.append(len(edges))
+                index += 1
+                continue
+
+            moves = generate_legal_moves(board, turn, None, '-')
+            offset = index - base
+            blocked = 0
+            floor = 0
+            for start, end, move_type in moves:
+                start_index = start[1] * 8 + start[0]
+                end_index = end[1] * 8 + end[0]
+                if move_type == "PROMOTION" or board[end_index] != '.':
+                    child = list(board)
+                    piece = child[start_index]
+                    child[start_index] = '.'
+                    for promotion in PROMOTION_PIECES if move_type == "PROMOTION" else (None,):
+                        if promotion:
+                            child[end_index] = promotion.upper() if turn == 'w' else promotion
+                        else:
+                            child[end_index] = piece
+                        value, dtm = _child_result(''.join(child), enemy, directory, verbose)
+                        if value == LOSS:
+                            buckets.setdefault(dtm + 1, []).append((index, WIN))
+                        elif value == WIN:
+                            floor = max(floor, dtm + 1)
+                        else:
+                            blocked = 1
+                else:
+                    slot = squares.index(start_index)
+                    if slot < 2:
+                        # a king move may leave the canonical pairs: index the child from scratch
+                        child = list(board)
+                        child[end_index] = child[start_index]
+                        child[start_index] = '.'
+                        edges.append(board_index(''.join(child), enemy, pieces, kings))
+                    else:
+                        edges.append(child_base + offset + (end_index - start_index) * weights[slot])
+            remaining[index] = len(edges) - starts[-1] + blocked
+            floors[index] = floor
+            starts.append(len(edges))
+            if not moves:
+                if is_square_attacked(board, index_square(squares[1 - king_slot]), enemy):
+                    buckets.setdefault(0, []).append((index, LOSS))
+                else:
+                    values[index] = DRAW
+            elif remaining[index] == 0:
+                buckets.setdefault(floor, []).append((index, LOSS))
+            index += 1
+
+    # predecessor lists, the reverse of the forward edges
+    parent_starts = array('I', bytes(4 * (count + 1)))
+    for child in edges:
+        parent_starts[child + 1] += 1
+    for index in range(count):
+        parent_starts[index + 1] += parent_starts[index]
+    parents = array('I', bytes(4 * len(edges)))
+    fill = array('I', parent_starts)
+    for parent in range(count):
+        for edge in range(starts[parent], starts[parent + 1]):
+            child = edges[edge]
+            parents[fill[child]] = parent
+            fill[child] += 1
+    del edges, fill
+
+    # retrograde pass in order of distance to mate: a position is won once one child is
+    # lost, and lost once every child is won, at one ply more than the slowest of them
+    while buckets:
+        dtm = min(buckets)
+        for index, value in buckets.pop(dtm):
+            if values[index] != UNKNOWN:
+                continue
+            values[index] = value
+            dtms[index] = dtm
+            for edge in range(parent_starts[index], parent_starts[index + 1]):
+                parent = parents[edge]
+                if values[parent] != UNKNOWN:
+                    continue
+                if value == LOSS:
+                    buckets.setdefault(dtm + 1, []).append((parent, WIN))
+                else:
+                    remaining[parent] -= 1
+                    if floors[parent] < dtm + 1:
+                        floors[parent] = dtm + 1
+                    if remaining[parent] == 0:
+                        buckets.setdefault(floors[parent], []).append((parent, LOSS))
+    values = values.replace(bytes([UNKNOWN]), bytes([DRAW]))
+
+    max_dtm = max(dtms)
+    dtm_bits = max(1, max_dtm.bit_length())
+    data = pack(values, dtms, dtm_bits)
+    os.makedirs(directory, exist_ok=True)
+    path = table_path(material, directory)
+    table = _open_tables.pop(path, None)
+    if table is not None:
+        table.close()
+    with open(path, "wb") as output:
+        output.write(HEADER.pack(MAGIC, VERSION, material.encode('ascii'), dtm_bits, count))
+        output.write(data)
+    stats = {
+        "material": material,
+        "entries": count,
+        "bytes": HEADER.size + len(data),
+        "max_dtm": max_dtm,
+        "seconds": time.perf_counter() - started,
+    }
+    for value, name in enumerate(WDL_NAMES):
+        stats[name] = values.count(value)
+    if verbose:
+        print_stats(stats)
+    return path, stats
+
+
+def print_stats(stats):
+    print(f"{stats['material']}: {stats['entries']} entries in {stats['bytes']} bytes "
+          f"({stats['bytes'] * 8 / stats['entries']:.1f} bits each), longest mate {stats['max_dtm']} plies, "
+          f"{stats['win']} win / {stats['draw']} draw / {stats['loss']} loss / {stats['invalid']} invalid, "
+          f"generated in {stats['seconds']:.1f}s")
+
+
+def describe(result):
+    if result is None:
+        return "no table"
+    value, dtm = result
+    if value == WIN:
+        return f"win, mate in {dtm} plies"
+    if value == LOSS:
+        return f"loss, mated in {dtm} plies"
+    return WDL_NAMES[value]
+
+
+def main(argv=None):
+    from position import Position
+    parser = argparse.ArgumentParser(description="Generate or probe retrograde endgame bitbases.")
+    parser.add_argument("-d", "--directory", default=BITBASE_DIR, help="table directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("generate", help="build tables by retrograde analysis")
+    build.add_argument("material", nargs="*", default=DEFAULT_MATERIAL,
+                       help=f"material keys of up to {MAX_PIECES} pieces, such as KQvK or KPvK (default: {' '.join(DEFAULT_MATERIAL)})")
+    lookup = commands.add_parser("probe", help="look up a position")
+    lookup.add_argument("fen")
+    lookup.add_argument("--repeat", type=int, default=10000, help="probes to time")
+    args = parser.parse_args(argv)
+
+    if args.command == "generate":
+        for material in args.material:
+            if len(table_pieces(canonical_material(material))) > MAX_PIECES:
+                parser.error(f"{material}: the command line builds tables of up to {MAX_PIECES} pieces")
+        for material in args.material:
+            generate(material, args.directory)
+        return 0
+    position = Position.from_fen(args.fen)
+    result = probe(position, args.directory)
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        probe(position, args.directory)
+    elapsed = time.perf_counter() - started
+    print(f"{describe(result)} ({elapsed / args.repeat * 1e6:.1f} us per probe)")
+    return 0 if result is not None else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,562 @@
+from functools import lru_cache
+from move_encoding import QUIET, CAPTURE, PROMOTION, CASTLE
+
+# Bitboard move generation backend. Bit i stands for board index i (a8 = 0, h1 = 63), so
+# results convert straight back to the (x, y) squares used by move_generator.
+# The twelve bitboards are rebuilt from the board string on each call (cached per string),
+# not kept between moves; that is about 5% of perft time, the rest being per-move Python
+# work. Against the board backend: legal_moves 90 vs 161 us per position (1.8x) and
+# perft --suite -d 3 326k vs 165k nps (2x); not the order of magnitude either backend
+# gains over the original recursive generator.
+
+BOARD_SIZE = 8
+SQUARES = [(index % BOARD_SIZE, index // BOARD_SIZE) for index in range(64)]
+BITS = [1 << index for index in range(64)]
+
+
+def _offset_table(offsets):
+    table = []
+    for x, y in SQUARES:
+        attacks = 0
+        for dx, dy in offsets:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < BOARD_SIZE and 0 <= ny < BOARD_SIZE:
+                attacks |= 1 << (ny * BOARD_SIZE + nx)
+        table.append(attacks)
+    return table
+
+
+def _ray_table(dx, dy):
+    table = []
+    for x, y in SQUARES:
+        ray = 0
+        nx, ny = x + dx, y + dy
+        while 0 <= nx < BOARD_SIZE and 0 <= ny < BOARD_SIZE:
+            ray |= 1 << (ny * BOARD_SIZE + nx)
+            nx += dx
+            ny += dy
+        table.append(ray)
+    return table
+
+
+KNIGHT_ATTACKS = _offset_table([(2, 1), (1, 2), (-1, 2), (-2, 1), (-2, -1), (-1, -2), (1, -2), (2, -1)])
+KING_ATTACKS = _offset_table([(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1) if dx or dy])
+# squares a pawn of each colour attacks from a given square (white moves towards y = 0)
+PAWN_ATTACKS = {'w': _offset_table([(-1, -1), (1, -1)]), 'b': _offset_table([(-1, 1), (1, 1)])}
+
+# (ray table, positive) - a ray towards higher indices is blocked by its lowest set bit,
+# a ray towards lower indices by its highest set bit
+ROOK_RAYS = [(_ray_table(1, 0), True), (_ray_table(0, 1), True),
+             (_ray_table(-1, 0), False), (_ray_table(0, -1), False)]
+BISHOP_RAYS = [(_ray_table(1, 1), True), (_ray_table(-1, 1), True),
+               (_ray_table(-1, -1), False), (_ray_table(1, -1), False)]
+QUEEN_RAYS = ROOK_RAYS + BISHOP_RAYS
+
+PIECES = {'w': "PNBRQK", 'b': "pnbrqk"}
+
+
+def slider_attacks(square, occupied, rays):
+    attacks = 0
+    for table, positive in rays:
+        ray = table[square]
+        blockers = ray & occupied
+        if blockers:
+            if positive:
+                blocker = (blockers & -blockers).bit_length() - 1
+            else:
+                blocker = blockers.bit_length() - 1
+            ray ^= table[blocker]
+        attacks |= ray
+    return attacks
+
+
+def rook_attacks(square, occupied):
+    return slider_attacks(square, occupied, ROOK_RAYS)
+
+
+def bishop_attacks(square, occupied):
+    return slider_attacks(square, occupied, BISHOP_RAYS)
+
+
+def queen_attacks(square, occupied):
+    return slider_attacks(square, occupied, QUEEN_RAYS)
+
+
+@lru_cache(maxsize=4096)
+def _board_bitboards(board):
+    bitboards = dict.fromkeys("PNBRQKpnbrqk", 0)
+    for index, piece in enumerate(board):
+        if piece != '.':
+            bitboards[piece] |= 1 << index
+    white = 0
+    black = 0
+    for piece in "PNBRQK":
+        white |= bitboards[piece]
+    for piece in "pnbrqk":
+        black |= bitboards[piece]
+    return bitboards, {'w': white, 'b': black}
+
+
+def board_bitboards(board):
+    # boards are 64 character strings, or lists while a move is being simulated
+    if not isinstance(board, str):
+        board = ''.join(board)
+    return _board_bitboards(board)
+
+
+def iter_bits(bitboard):
+    while bitboard:
+        low = bitboard & -bitboard
+        yield low.bit_length() - 1
+        bitboard ^= low
+
+
+def _targets_to_moves(targets, enemies):
+    moves = []
+    while targets:
+        low = targets & -targets
+        targets ^= low
+        moves.append((SQUARES[low.bit_length() - 1], "CAPTURE" if low & enemies else "QUIET"))
+    return moves
+
+
+def _piece_targets(board, turn, square, rays=None, table=None):
+    _, colors = board_bitboards(board)
+    own = colors[turn]
+    enemies = colors['b' if turn == 'w' else 'w']
+    index = square[1] * BOARD_SIZE + square[0]
+    if rays is not None:
+        targets = slider_attacks(index, own | enemies, rays)
+    else:
+        targets = table[index]
+    return _targets_to_moves(targets & ~own, enemies)
+
+
+def generate_bishop_moves(board, turn, square):
+    return _piece_targets(board, turn, square, rays=BISHOP_RAYS)
+
+
+def generate_rook_moves(board, turn, square):
+    return _piece_targets(board, turn, square, rays=ROOK_RAYS)
+
+
+def generate_queen_moves(board, turn, square):
+    return _piece_targets(board, turn, square, rays=QUEEN_RAYS)
+
+
+def generate_knight_moves(board, turn, square):
+    return _piece_targets(board, turn, square, table=KNIGHT_ATTACKS)
+
+
+def generate_pawn_moves(board, turn, square, en_pass):
+    _, colors = board_bitboards(board)
+    enemies = colors['b' if turn == 'w' else 'w']
+    occupied = colors[turn] | enemies
+    x, y = square
+    index = y * BOARD_SIZE + x
+    step = -BOARD_SIZE if turn == 'w' else BOARD_SIZE
+    start_row = 6 if turn == 'w' else 1
+    promotion_row = 0 if turn == 'w' else 7
+    moves = []
+
+    one_step = index + step
+    if 0 <= one_step < 64 and not occupied & BITS[one_step]:
+        moves.append((SQUARES[one_step], "PROMOTION" if y + step // BOARD_SIZE == promotion_row else "QUIET"))
+        two_step = one_step + step
+        if y == start_row and not occupied & BITS[two_step]:
+            moves.append((SQUARES[two_step], "QUIET"))
+
+    attacks = PAWN_ATTACKS[turn][index]
+    targets = attacks & enemies
+    if en_pass:
+        en_pass_bit = BITS[en_pass[1] * BOARD_SIZE + en_pass[0]]
+        targets |= attacks & en_pass_bit
+    for target in iter_bits(targets):
+        moves.append((SQUARES[target], "PROMOTION" if SQUARES[target][1] == promotion_row else "CAPTURE"))
+    return moves
+
+
+def generate_king_moves(board, turn, square, castling_rights):
+    _, colors = board_bitboards(board)
+    own = colors[turn]
+    enemies = colors['b' if turn == 'w' else 'w']
+    occupied = own | enemies
+    index = square[1] * BOARD_SIZE + square[0]
+    moves = _targets_to_moves(KING_ATTACKS[index] & ~own, enemies)
+    _add_castling(moves, turn, index, occupied, castling_rights)
+    return moves
+
+
+def _add_castling(moves, turn, index, occupied, castling_rights):
+    # Castling (basic implementation), the same squares as the board backend
+    if turn == 'w' and index == 60:  # e1
+        if 'K' in castling_rights and not occupied & (BITS[61] | BITS[62]):
+            moves.append(((6, 7), "CASTLE"))
+        if 'Q' in castling_rights and not occupied & (BITS[57] | BITS[58] | BITS[59]):
+            moves.append(((2, 7), "CASTLE"))
+    elif turn == 'b' and index == 4:  # e8
+        if 'k' in castling_rights and not occupied & (BITS[5] | BITS[6]):
+            moves.append(((6, 0), "CASTLE"))
+        if 'q' in castling_rights and not occupied & (BITS[1] | BITS[2] | BITS[3]):
+            moves.append(((2, 0), "CASTLE"))
+
+
+def generate_piece_pseudo_legal_moves(board, turn, square, en_pass, castling_rights):
+    piece = board[square[1] * BOARD_SIZE + square[0]].lower()
+    if piece == 'b':
+        return generate_bishop_moves(board, turn, square)
+    if piece == 'r':
+        return generate_rook_moves(board, turn, square)
+    if piece == 'q':
+        return generate_queen_moves(board, turn, square)
+    if piece == 'n':
+        return generate_knight_moves(board, turn, square)
+    if piece == 'p':
+        return generate_pawn_moves(board, turn, square, en_pass)
+    if piece == 'k':
+        return generate_king_moves(board, turn, square, castling_rights)
+    return []
+
+
+def _piece_attacks(piece, index, occupied):
+    # squares a knight, bishop, rook, queen or king on index attacks
+    if piece == 'n':
+        return KNIGHT_ATTACKS[index]
+    if piece == 'k':
+        return KING_ATTACKS[index]
+    return slider_attacks(index, occupied, BISHOP_RAYS if piece == 'b' else ROOK_RAYS if piece == 'r' else QUEEN_RAYS)
+
+
+def generate_piece_captures(board, turn, square, en_pass):
+    # the captures (en passant included) and promotions among generate_piece_pseudo_legal_moves:
+    # attacks masked with the enemy pieces, so no quiet target is produced
+    _, colors = board_bitboards(board)
+    enemies = colors['b' if turn == 'w' else 'w']
+    occupied = colors[turn] | enemies
+    index = square[1] * BOARD_SIZE + square[0]
+    piece = board[index].lower()
+    if piece != 'p':
+        targets = _piece_attacks(piece, index, occupied) & enemies
+        return [(SQUARES[target], "CAPTURE") for target in iter_bits(targets)]
+
+    promotion_row = 0 if turn == 'w' else 7
+    moves = []
+    one_step = index + (-BOARD_SIZE if turn == 'w' else BOARD_SIZE)
+    if SQUARES[one_step][1] == promotion_row and not occupied & BITS[one_step]:
+        moves.append((SQUARES[one_step], "PROMOTION"))
+    targets = enemies
+    if en_pass:
+        targets |= BITS[en_pass[1] * BOARD_SIZE + en_pass[0]]
+    for target in iter_bits(PAWN_ATTACKS[turn][index] & targets):
+        moves.append((SQUARES[target], "PROMOTION" if SQUARES[target][1] == promotion_row else "CAPTURE"))
+    return moves
+
+
+def generate_piece_quiets(board, turn, square, castling_rights):
+    # the rest of generate_piece_pseudo_legal_moves: attacks masked with the empty squares,
+    # non-promoting pawn pushes and castling
+    _, colors = board_bitboards(board)
+    occupied = colors['w'] | colors['b']
+    index = square[1] * BOARD_SIZE + square[0]
+    piece = board[index].lower()
+    if piece == 'p':
+        return [move for move in generate_pawn_moves(board, turn, square, None) if move[1] == "QUIET"]
+    moves = [(SQUARES[target], "QUIET") for target in iter_bits(_piece_attacks(piece, index, occupied) & ~occupied)]
+    if piece == 'k':
+        _add_castling(moves, turn, index, occupied, castling_rights)
+    return moves
+
+
+def attacked_by(square, by_color, bitboards, occupied, removed=0):
+    # probe outward from square; removed masks out pieces captured by a simulated move
+    pawn, knight, bishop, rook, queen, king = PIECES[by_color]
+    victim = 'b' if by_color == 'w' else 'w'
+    if KNIGHT_ATTACKS[square] & bitboards[knight] & ~removed:
+        return True
+    if PAWN_ATTACKS[victim][square] & bitboards[pawn] & ~removed:
+        return True
+    if KING_ATTACKS[square] & bitboards[king]:
+        return True
+    queens = bitboards[queen]
+    rooks = (bitboards[rook] | queens) & ~removed
+    if rooks and slider_attacks(square, occupied, ROOK_RAYS) & rooks:
+        return True
+    bishops = (bitboards[bishop] | queens) & ~removed
+    if bishops and slider_attacks(square, occupied, BISHOP_RAYS) & bishops:
+        return True
+    return False
+
+
+def attacks_of(by_color, bitboards, colors):
+    # union of the squares by_color attacks; like the board backend, pieces other
+    # than pawns do not count squares occupied by their own side
+    pawn, knight, bishop, rook, queen, king = PIECES[by_color]
+    own = colors[by_color]
+    occupied = colors['w'] | colors['b']
+    pawn_attacks = 0
+    for index in iter_bits(bitboards[pawn]):
+        pawn_attacks |= PAWN_ATTACKS[by_color][index]
+    attacks = 0
+    for index in iter_bits(bitboards[knight]):
+        attacks |= KNIGHT_ATTACKS[index]
+    for index in iter_bits(bitboards[king]):
+        attacks |= KING_ATTACKS[index]
+    for index in iter_bits(bitboards[bishop]):
+        attacks |= slider_attacks(index, occupied, BISHOP_RAYS)
+    for index in iter_bits(bitboards[rook]):
+        attacks |= slider_attacks(index, occupied, ROOK_RAYS)
+    for index in iter_bits(bitboards[queen]):
+        attacks |= slider_attacks(index, occupied, QUEEN_RAYS)
+    return pawn_attacks | (attacks & ~own)
+
+
+def is_square_attacked(board, square, by_color):
+    bitboards, colors = board_bitboards(board)
+    return attacked_by(square[1] * BOARD_SIZE + square[0], by_color, bitboards, colors['w'] | colors['b'])
+
+
+def attack_map(board, by_color):
+    bitboards, colors = board_bitboards(board)
+    pawn, knight, bishop, rook, queen, king = PIECES[by_color]
+    occupied = colors['w'] | colors['b']
+    attacks = 0
+    for index in iter_bits(bitboards[pawn]):
+        attacks |= PAWN_ATTACKS[by_color][index]
+    for index in iter_bits(bitboards[knight]):
+        attacks |= KNIGHT_ATTACKS[index]
+    for index in iter_bits(bitboards[king]):
+        attacks |= KING_ATTACKS[index]
+    for index in iter_bits(bitboards[bishop] | bitboards[queen]):
+        attacks |= slider_attacks(index, occupied, BISHOP_RAYS)
+    for index in iter_bits(bitboards[rook] | bitboards[queen]):
+        attacks |= slider_attacks(index, occupied, ROOK_RAYS)
+    return attacks
+
+
+def get_opponents_attacked_squares(board, color_of_victim):
+    bitboards, colors = board_bitboards(board)
+    color_of_enemy = 'w' if color_of_victim == 'b' else 'b'
+    return [SQUARES[index] for index in iter_bits(attacks_of(color_of_enemy, bitboards, colors))]
+
+
+def _is_move_legal(bitboards, colors, turn, start, end, en_pass_index):
+    enemy = 'b' if turn == 'w' else 'w'
+    king = 'K' if turn == 'w' else 'k'
+    start_bit, end_bit = BITS[start], BITS[end]
+    occupied = ((colors['w'] | colors['b']) & ~start_bit) | end_bit
+    removed = end_bit
+    if end == en_pass_index and start_bit & bitboards['P' if turn == 'w' else 'p']:
+        captured = BITS[end + (BOARD_SIZE if turn == 'w' else -BOARD_SIZE)]
+        occupied &= ~captured
+        removed |= captured
+    king_bit = bitboards[king]
+    if king_bit & start_bit:
+        king_square = end
+    else:
+        king_square = king_bit.bit_length() - 1
+    return not attacked_by(king_square, enemy, bitboards, occupied, removed)
+
+
+def is_pseudo_legal_move_legal(board, start_square, end_square, turn, en_pass=None):
+    bitboards, colors = board_bitboards(board)
+    en_pass_index = en_pass[1] * BOARD_SIZE + en_pass[0] if en_pass else None
+    return _is_move_legal(bitboards, colors, turn,
+                          start_square[1] * BOARD_SIZE + start_square[0],
+                          end_square[1] * BOARD_SIZE + end_square[0], en_pass_index)
+
+
+def _is_castle_legal(bitboards, colors, turn, end):
+    # the king may not castle out of, or through, an attacked square
+    enemy = 'b' if turn == 'w' else 'w'
+    occupied = colors['w'] | colors['b']
+    passed = (end - 2, end - 1) if end % BOARD_SIZE == 6 else (end + 2, end + 1)
+    return not any(attacked_by(square, enemy, bitboards, occupied) for square in passed)
+
+
+def is_castle_legal(board, turn, end_square):
+    bitboards, colors = board_bitboards(board)
+    return _is_castle_legal(bitboards, colors, turn, end_square[1] * BOARD_SIZE + end_square[0])
+
+
+FULL_MASK = (1 << 64) - 1
+
+
+def _king_safety(bitboards, colors, turn):
+    pawn, knight, bishop, rook, queen, king = PIECES['b' if turn == 'w' else 'w']
+    king_square = bitboards[PIECES[turn][5]].bit_length() - 1
+    own = colors[turn]
+    occupied = colors['w'] | colors['b']
+    checkers = (KNIGHT_ATTACKS[king_square] & bitboards[knight]) | (PAWN_ATTACKS[turn][king_square] & bitboards[pawn])
+    check_mask = checkers
+    pins = {}
+    for rays, sliders in ((ROOK_RAYS, bitboards[rook] | bitboards[queen]),
+                          (BISHOP_RAYS, bitboards[bishop] | bitboards[queen])):
+        if not sliders:
+            continue
+        for table, positive in rays:
+            ray = table[king_square]
+            blockers = ray & occupied
+            if not blockers:
+                continue
+            first = (blockers & -blockers).bit_length() - 1 if positive else blockers.bit_length() - 1
+            if BITS[first] & sliders:
+                checkers |= BITS[first]
+                check_mask |= ray ^ table[first]
+            elif BITS[first] & own:
+                rest = blockers ^ BITS[first]
+                if rest:
+                    second = (rest & -rest).bit_length() - 1 if positive else rest.bit_length() - 1
+                    if BITS[second] & sliders:
+                        pins[first] = ray ^ table[second]
+    if not checkers:
+        check_mask = FULL_MASK
+    elif checkers & (checkers - 1):
+        check_mask = 0
+    return checkers, check_mask, pins
+
+
+def analyze_king_safety(board, turn):
+    bitboards, colors = board_bitboards(board)
+    return _king_safety(bitboards, colors, turn)
+
+
+def _is_move_legal_with_masks(bitboards, colors, turn, start, end, move_type, en_pass_index, king_safety):
+    if move_type == "CASTLE":
+        return _is_castle_legal(bitboards, colors, turn, end) and _is_move_legal(
+            bitboards, colors, turn, start, end, en_pass_index)
+    start_bit = BITS[start]
+    if start_bit & bitboards[PIECES[turn][5]] or (
+            end == en_pass_index and start_bit & bitboards[PIECES[turn][0]]):
+        return _is_move_legal(bitboards, colors, turn, start, end, en_pass_index)
+    checkers, check_mask, pins = king_safety
+    if not BITS[end] & check_mask:
+        return False
+    return start not in pins or bool(BITS[end] & pins[start])
+
+
+def is_move_legal(board, turn, start_square, end_square, move_type, en_pass, king_safety):
+    bitboards, colors = board_bitboards(board)
+    en_pass_index = en_pass[1] * BOARD_SIZE + en_pass[0] if en_pass else None
+    return _is_move_legal_with_masks(bitboards, colors, turn,
+                                     start_square[1] * BOARD_SIZE + start_square[0],
+                                     end_square[1] * BOARD_SIZE + end_square[0],
+                                     move_type, en_pass_index, king_safety)
+
+
+def generate_legal_moves(board, turn, en_pass, castling_rights):
+    # as generate_legal_move_codes: knight and slider targets are masked by the check and pin
+    # masks and turned into moves directly; king and pawn moves are checked one by one
+    if not isinstance(board, str):
+        board = ''.join(board)
+    bitboards, colors = board_bitboards(board)
+    own = colors[turn]
+    enemies = colors['b' if turn == 'w' else 'w']
+    occupied = own | enemies
+    en_pass_index = en_pass[1] * BOARD_SIZE + en_pass[0] if en_pass else None
+    king_safety = _king_safety(bitboards, colors, turn)
+    _, check_mask, pins = king_safety
+    moves = []
+    for start in iter_bits(own):
+        start_square = SQUARES[start]
+        piece = board[start].lower()
+        if piece == 'p' or piece == 'k':
+            for end_square, move_type in generate_piece_pseudo_legal_moves(board, turn, start_square, en_pass,
+                                                                          castling_rights):
+                end = end_square[1] * BOARD_SIZE + end_square[0]
+                if _is_move_legal_with_masks(bitboards, colors, turn, start, end, move_type, en_pass_index,
+                                             king_safety):
+                    moves.append((start_square, end_square, move_type))
+            continue
+        if piece == 'n':
+            targets = KNIGHT_ATTACKS[start]
+        else:
+            targets = slider_attacks(start, occupied, BISHOP_RAYS if piece == 'b' else ROOK_RAYS if piece == 'r'
+                                     else QUEEN_RAYS)
+        targets &= ~own & check_mask
+        if start in pins:
+            targets &= pins[start]
+        while targets:
+            low = targets & -targets
+            targets ^= low
+            moves.append((start_square, SQUARES[low.bit_length() - 1], "CAPTURE" if low & enemies else "QUIET"))
+    return moves
+
+
+def generate_legal_move_codes(board, turn, en_pass, castling_rights, out):
+    # 16-bit codes straight from the target bitboards: knights and sliders are masked by the
+    # check and pin masks, so only king and pawn moves go through per-move legality checks
+    if not isinstance(board, str):
+        board = ''.join(board)
+    bitboards, colors = board_bitboards(board)
+    own = colors[turn]
+    enemies = colors['b' if turn == 'w' else 'w']
+    occupied = own | enemies
+    en_pass_index = en_pass[1] * BOARD_SIZE + en_pass[0] if en_pass else None
+    king_safety = _king_safety(bitboards, colors, turn)
+    _, check_mask, pins = king_safety
+    capture = CAPTURE << 12
+    count = 0
+    for start in iter_bits(own):
+        piece = board[start].lower()
+        if piece == 'p' or piece == 'k':
+            for end_square, move_type in generate_piece_pseudo_legal_moves(board, turn, SQUARES[start], en_pass,
+                                                                          castling_rights):
+                end = end_square[1] * BOARD_SIZE + end_square[0]
+                if not _is_move_legal_with_masks(bitboards, colors, turn, start, end, move_type, en_pass_index,
+                                                 king_safety):
+                    continue
+                code = start | (end << 6)
+                if move_type == "PROMOTION":
+                    for promotion in range(4):
+                        out[count] = code | (PROMOTION << 12) | (promotion << 14)
+                        count += 1
+                    continue
+                out[count] = code | ((CASTLE if move_type == "CASTLE" else CAPTURE if move_type == "CAPTURE"
+                                      else QUIET) << 12)
+                count += 1
+            continue
+        if piece == 'n':
+            targets = KNIGHT_ATTACKS[start]
+        else:
+            targets = slider_attacks(start, occupied, BISHOP_RAYS if piece == 'b' else ROOK_RAYS if piece == 'r'
+                                     else QUEEN_RAYS)
+        targets &= ~own & check_mask
+        if start in pins:
+            targets &= pins[start]
+        while targets:
+            low = targets & -targets
+            targets ^= low
+            out[count] = start | ((low.bit_length() - 1) << 6) | (capture if low & enemies else 0)
+            count += 1
+    return count
+
+
+def has_legal_move(board, turn, en_pass, castling_rights):
+    # knights and sliders need no per-move checks: any target left after the check and pin
+    # masks is a legal move. King and pawn moves are tried one by one afterwards.
+    if not isinstance(board, str):
+        board = ''.join(board)
+    bitboards, colors = board_bitboards(board)
+    own = colors[turn]
+    occupied = own | colors['b' if turn == 'w' else 'w']
+    pawn, knight, bishop, rook, queen, king = PIECES[turn]
+    king_safety = _king_safety(bitboards, colors, turn)
+    _, check_mask, pins = king_safety
+    if check_mask:
+        for start in iter_bits(bitboards[knight]):
+            targets = KNIGHT_ATTACKS[start] & ~own & check_mask
+            if targets and (start not in pins or targets & pins[start]):
+                return True
+        for piece, rays in ((bishop, BISHOP_RAYS), (rook, ROOK_RAYS), (queen, QUEEN_RAYS)):
+            for start in iter_bits(bitboards[piece]):
+                targets = slider_attacks(start, occupied, rays) & ~own & check_mask
+                if targets and (start not in pins or targets & pins[start]):
+                    return True
+    en_pass_index = en_pass[1] * BOARD_SIZE + en_pass[0] if en_pass else None
+    for start in iter_bits(bitboards[king] | bitboards[pawn]):
+        for end_square, move_type in generate_piece_pseudo_legal_moves(board, turn, SQUARES[start], en_pass,
+                                                                      castling_rights):
+            end = end_square[1] * BOARD_SIZE + end_square[0]
+            if _is_move_legal_with_masks(bitboards, colors, turn, start, end, move_type, en_pass_index, king_safety):
+                return True
+    return False
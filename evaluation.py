@@ -0,0 +1,206 @@
+import argparse
+import random
+import sys
+import time
+
+# Tapered evaluation: material plus piece-square tables for the middlegame and the endgame,
+# blended by the remaining non-pawn material. Position keeps the mg/eg sums and the phase as
+# running totals in make_move/unmake_move, so evaluate() is O(1); evaluate_board() rescans
+# the board and is what the accumulators are checked and benchmarked against.
+
+MG_VALUES = {'p': 82, 'n': 337, 'b': 365, 'r': 477, 'q': 1025, 'k': 0}
+EG_VALUES = {'p': 94, 'n': 281, 'b': 297, 'r': 512, 'q': 936, 'k': 0}
+PHASE_WEIGHTS = {'p': 0, 'n': 1, 'b': 1, 'r': 2, 'q': 4, 'k': 0}
+MAX_PHASE = 24
+
+# from white's side, indexed like the board (a8 = 0, h1 = 63)
+PAWN_TABLE = [
+    0, 0, 0, 0, 0, 0, 0, 0,
+    50, 50, 50, 50, 50, 50, 50, 50,
+    10, 10, 20, 30, 30, 20, 10, 10,
+    5, 5, 10, 25, 25, 10, 5, 5,
+    0, 0, 0, 20, 20, 0, 0, 0,
+    5, -5, -10, 0, 0, -10, -5, 5,
+    5, 10, 10, -20, -20, 10, 10, 5,
+    0, 0, 0, 0, 0, 0, 0, 0,
+]
+PAWN_ENDGAME_TABLE = [0] * 8 + [80] * 8 + [50] * 8 + [30] * 8 + [20] * 8 + [10] * 8 + [0] * 16
+KNIGHT_TABLE = [
+    -50, -40, -30, -30, -30, -30, -40, -50,
+    -40, -20, 0, 0, 0, 0, -20, -40,
+    -30, 0, 10, 15, 15, 10, 0, -30,
+    -30, 5, 15, 20, 20, 15, 5, -30,
+    -30, 0, 15, 20, 20, 15, 0, -30,
+    -30, 5, 10, 15, 15, 10, 5, -30,
+    -40, -20, 0, 5, 5, 0, -20, -40,
+    -50, -40, -30, -30, -30, -30, -40, -50,
+]
+BISHOP_TABLE = [
+    -20, -10, -10, -10, -10, -10, -10, -20,
+    -10, 0, 0, 0, 0, 0, 0, -10,
+    -10, 0, 5, 10, 10, 5, 0, -10,
+    -10, 5, 5, 10, 10, 5, 5, -10,
+    -10, 0, 10, 10, 10, 10, 0, -10,
+    -10, 10, 10, 10, 10, 10, 10, -10,
+    -10, 5, 0, 0, 0, 0, 5, -10,
+    -20, -10, -10, -10, -10, -10, -10, -20,
+]
+ROOK_TABLE = [
+    0, 0, 0, 0, 0, 0, 0, 0,
+    5, 10, 10, 10, 10, 10, 10, 5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    0, 0, 0, 5, 5, 0, 0, 0,
+]
+QUEEN_TABLE = [
+    -20, -10, -10, -5, -5, -10, -10, -20,
+    -10, 0, 0, 0, 0, 0, 0, -10,
+    -10, 0, 5, 5, 5, 5, 0, -10,
+    -5, 0, 5, 5, 5, 5, 0, -5,
+    0, 0, 5, 5, 5, 5, 0, -5,
+    -10, 5, 5, 5, 5, 5, 0, -10,
+    -10, 0, 5, 0, 0, 0, 0, -10,
+    -20, -10, -10, -5, -5, -10, -10, -20,
+]
+KING_TABLE = [
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -20, -30, -30, -40, -40, -30, -30, -20,
+    -10, -20, -20, -20, -20, -20, -20, -10,
+    20, 20, 0, 0, 0, 0, 20, 20,
+    20, 30, 10, 0, 0, 10, 30, 20,
+]
+KING_ENDGAME_TABLE = [
+    -50, -40, -30, -20, -20, -30, -40, -50,
+    -30, -20, -10, 0, 0, -10, -20, -30,
+    -30, -10, 20, 30, 30, 20, -10, -30,
+    -30, -10, 30, 40, 40, 30, -10, -30,
+    -30, -10, 30, 40, 40, 30, -10, -30,
+    -30, -10, 20, 30, 30, 20, -10, -30,
+    -30, -30, 0, 0, 0, 0, -30, -30,
+    -50, -30, -30, -30, -30, -30, -30, -50,
+]
+
+MG_TABLES = {'p': PAWN_TABLE, 'n': KNIGHT_TABLE, 'b': BISHOP_TABLE, 'r': ROOK_TABLE, 'q': QUEEN_TABLE, 'k': KING_TABLE}
+EG_TABLES = {'p': PAWN_ENDGAME_TABLE, 'n': KNIGHT_TABLE, 'b': BISHOP_TABLE, 'r': ROOK_TABLE, 'q': QUEEN_TABLE,
+             'k': KING_ENDGAME_TABLE}
+
+
+def _signed_tables(values, tables):
+    # value + table entry per piece letter and square, negated for black; black reads
+    # the white table upside down (index ^ 56)
+    signed = {}
+    for piece, table in tables.items():
+        signed[piece.upper()] = [values[piece] + table[index] for index in range(64)]
+        signed[piece] = [-(values[piece] + table[index ^ 56]) for index in range(64)]
+    return signed
+
+
+MG = _signed_tables(MG_VALUES, MG_TABLES)
+EG = _signed_tables(EG_VALUES, EG_TABLES)
+PHASE = {piece: weight for letter, weight in PHASE_WEIGHTS.items() for piece in (letter, letter.upper())}
+
+
+def accumulate(board):
+    # (mg, eg, phase) totals for a whole board, white positive
+    mg = eg = phase = 0
+    for index, piece in enumerate(board):
+        if piece != '.':
+            mg += MG[piece][index]
+            eg += EG[piece][index]
+            phase += PHASE[piece]
+    return mg, eg, phase
+
+
+def taper(mg, eg, phase, turn):
+    phase = min(phase, MAX_PHASE)
+    score = (mg * phase + eg * (MAX_PHASE - phase)) // MAX_PHASE
+    return score if turn == 'w' else -score
+
+
+def evaluate(position):
+    # centipawns from the side to move's point of view, from the position's accumulators
+    return taper(position.mg, position.eg, position.phase, position.turn)
+
+
+def evaluate_board(board, turn):
+    return taper(*accumulate(board), turn)
+
+
+def bench_positions(count, plies=40, seed=1):
+    # a fixed position set: random games from the start position and the perft positions
+    from perft import REFERENCE_POSITIONS
+    from position import Position
+    rng = random.Random(seed)
+    fens = [fen for _, fen, _ in REFERENCE_POSITIONS]
+    positions = []
+    while len(positions) < count:
+        position = Position.from_fen(fens[len(positions) % len(fens)])
+        for _ in range(rng.randrange(plies)):
+            moves = position.legal_moves()
+            if not moves:
+                break
+            position.make_move(rng.choice(moves))
+        positions.append(position)
+    return positions
+
+
+def run_bench(count, repeat):
+    positions = bench_positions(count)
+    leaves = [(position, move) for position in positions for move in position.legal_moves()]
+
+    # both sides do the same make/unmake per leaf so only the evaluation differs
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for position, move in leaves:
+            undo = position.make_move(move)
+            evaluate(position)
+            position.unmake_move(undo)
+    incremental = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for position, move in leaves:
+            undo = position.make_move(move)
+            evaluate_board(position.board, position.turn)
+            position.unmake_move(undo)
+    full = time.perf_counter() - started
+
+    mismatches = 0
+    for position, move in leaves:
+        undo = position.make_move(move)
+        if evaluate(position) != evaluate_board(position.board, position.turn):
+            mismatches += 1
+        position.unmake_move(undo)
+
+    evaluations = len(leaves) * repeat
+    print(f"{len(positions)} positions, {len(leaves)} leaves, {repeat} repeats")
+    print(f"incremental: {incremental:.3f}s, {evaluations / incremental:,.0f} evals/s (make + eval + unmake)")
+    print(f"full rescan: {full:.3f}s, {evaluations / full:,.0f} evals/s (make + eval + unmake)")
+    print(f"speedup: {full / incremental:.2f}x, mismatches: {mismatches}")
+    return mismatches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate a position, or benchmark incremental evaluation.")
+    parser.add_argument("fen", nargs="?", help="position to evaluate")
+    parser.add_argument("--bench", action="store_true", help="compare incremental and full-board evaluation")
+    parser.add_argument("--positions", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    if args.bench or not args.fen:
+        return 1 if run_bench(args.positions, args.repeat) else 0
+    from position import Position
+    position = Position.from_fen(args.fen)
+    print(f"mg {position.mg} eg {position.eg} phase {position.phase} score {evaluate(position)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+# Game state of the GUI: FEN reading and writing, applying a move, castling rights and
+# en passant squares. Pure functions on (board, turn, castling, en_passant, halfmove,
+# fullmove) with no pygame dependency, so batch jobs and tests can use them without a
+# display.
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+ROOK_HOME_RIGHTS = {
+    (0, 7): 'Q',  # White queenside
+    (7, 7): 'K',  # White kingside
+    (0, 0): 'q',  # Black queenside
+    (7, 0): 'k',  # Black kingside
+}
+
+def interpret_fen_board(fen):
+    board_part = fen.split(" ")[0]
+    interpretation = ""
+    for c in board_part:
+        if c == '/':
+            continue
+        interpretation += c if not c.isdigit() else "." * int(c)
+    return interpretation
+
+def interpret_fen(fen):
+    parts = fen.split()
+    board = interpret_fen_board(fen)
+    turn = parts[1]
+    castling = parts[2] if len(parts) > 2 else "-"
+    en_passant = parts[3] if len(parts) > 3 else "-"
+    halfmove = int(parts[4]) if len(parts) > 4 else 0
+    fullmove = int(parts[5]) if len(parts) > 5 else 1
+    return board, turn, castling, en_passant, halfmove, fullmove
+
+def get_fen_en_passent(en_pass):
+    if en_pass == "-":
+        return ()
+    return (ord(en_pass[0].lower()) - ord('a'), 8 - int(en_pass[1]))
+
+def make_fen_en_passent(en_pass):
+    return chr(en_pass[0] + 97) + str(8 - en_pass[1]) if en_pass != () else "-"
+
+def to_index(pos):
+    x, y = pos
+    return y * 8 + x
+
+def update_board(board, start, end):
+    board = list(board)
+    start_idx = to_index(start)
+    end_idx = to_index(end)
+    board[end_idx] = board[start_idx]
+    board[start_idx] = '.'
+    return ''.join(board)
+
+def board_to_fen(board, turn, castling, en_passant, halfmove, fullmove):
+    fen_rows = []
+    for y in range(8):
+        row = board[y * 8:(y + 1) * 8]
+        fen_row = ''
+        empty = 0
+        for c in row:
+            if c == '.':
+                empty += 1
+            else:
+                if empty:
+                    fen_row += str(empty)
+                    empty = 0
+                fen_row += c
+        if empty:
+            fen_row += str(empty)
+        fen_rows.append(fen_row)
+    return f"{'/'.join(fen_rows)} {turn} {castling or '-'} {en_passant} {halfmove} {fullmove}"
+
+def update_castling_rights(castling, selected_square, moved_piece):
+    x, y = selected_square
+
+    # Remove castling rights if the king moves
+    if moved_piece.lower() == 'k':
+        if moved_piece.isupper():
+            castling = castling.replace('K', '').replace('Q', '')
+        else:
+            castling = castling.replace('k', '').replace('q', '')
+
+    # Remove castling rights if a rook moves from its original square
+    elif moved_piece.lower() == 'r':
+        to_remove = ROOK_HOME_RIGHTS.get((x, y))
+        if to_remove:
+            castling = castling.replace(to_remove, '')
+
+    return castling
+
+def is_en_passant_capture(board, selected_square, cur_sq_pos, en_passant):
+    return (
+        board[to_index(selected_square)].lower() == 'p' and
+        cur_sq_pos == en_passant and
+        board[to_index(cur_sq_pos)] == '.'
+    )
+
+def is_capture(board, selected_square, cur_sq_pos, en_passant):
+    return board[to_index(cur_sq_pos)] != '.' or is_en_passant_capture(board, selected_square, cur_sq_pos, en_passant)
+
+def make_move(board, selected_square, cur_sq_pos, type_of_move, en_passant, halfmove, turn, fullmove, castling,
+              promotion=None):
+    # promotion: the piece a promoting pawn becomes, a queen unless given
+    moved_piece = board[to_index(selected_square)]
+
+    is_en_passant = is_en_passant_capture(board, selected_square, cur_sq_pos, en_passant)
+    captured = board[to_index(cur_sq_pos)] != '.' or is_en_passant
+    if is_en_passant:
+        cap_y = cur_sq_pos[1] + (1 if moved_piece.isupper() else -1)
+        cap_x = cur_sq_pos[0]
+        capture_idx = to_index((cap_x, cap_y))
+        board = list(board)
+        board[capture_idx] = '.'
+        board = ''.join(board)
+
+    board = update_board(board, selected_square, cur_sq_pos)
+    castling = update_castling_rights(castling,selected_square,moved_piece)
+    # a rook captured on its home square takes its castling right with it
+    if cur_sq_pos in ROOK_HOME_RIGHTS:
+        castling = castling.replace(ROOK_HOME_RIGHTS[cur_sq_pos], '')
+
+    # === Handle castling ===
+    if type_of_move == "CASTLE":
+        board = list(board)
+        if cur_sq_pos == (6, 7):  # White king-side
+            board[to_index((5, 7))] = board[to_index((7, 7))]
+            board[to_index((7, 7))] = '.'
+        elif cur_sq_pos == (2, 7):  # White queen-side
+            board[to_index((3, 7))] = board[to_index((0, 7))]
+            board[to_index((0, 7))] = '.'
+        elif cur_sq_pos == (6, 0):  # Black king-side
+            board[to_index((5, 0))] = board[to_index((7, 0))]
+            board[to_index((7, 0))] = '.'
+        elif cur_sq_pos == (2, 0):  # Black queen-side
+            board[to_index((3, 0))] = board[to_index((0, 0))]
+            board[to_index((0, 0))] = '.'
+        board = ''.join(board)
+
+    if type_of_move == "PROMOTION":
+        # pawn already at 8th or 1st rank only need to change it
+        promotion = promotion or 'q'
+        temp  = list(board)
+        temp[to_index(cur_sq_pos)] = promotion.upper() if turn == 'w' else promotion.lower()
+        board = ''.join(temp)
+
+    if moved_piece.lower() == 'p' or captured:
+        halfmove = 0
+    else:
+        halfmove += 1
+
+    if moved_piece.lower() == 'p' and abs(cur_sq_pos[1] - selected_square[1]) == 2:
+        en_passant = (cur_sq_pos[0], (cur_sq_pos[1] + selected_square[1]) // 2)
+    else:
+        en_passant = ()
+
+
+    if turn == 'b':
+        fullmove += 1
+    turn = 'b' if turn == 'w' else 'w'
+
+    return board, turn, castling, en_passant, halfmove, fullmove
+
+
+def is_select_valid(board, square, turn):
+    return board[square] != "." and (
+        (board[square].isupper() and turn == "w") or (board[square].islower() and turn == "b")
+    )
+
+def rest_game():
+    return START_FEN, 'w', 'KQkq', '-', 0, 1
@@ -1,56 +1,77 @@
 import pygame
 import sys
-from move_generator import generate_piece_moves, get_opponents_attacked_squares
-pygame.init()
+import time
+from renderer import BoardRenderer
+from sprites import load_atlas, piece_sprites
+from analysis_worker import AnalysisWorker, MOVES, TableCache, request_tables
+from move_generator import get_opponents_attacked_squares
+from game_state import (START_FEN, interpret_fen, interpret_fen_board, get_fen_en_passent, make_fen_en_passent,
+                        to_index, update_board, board_to_fen, is_capture, is_select_valid, rest_game,
+                        make_move as apply_move)
 
 base_path = "Assets"
 
-pieces = {
-    "p": pygame.image.load(f"{base_path}/black/pawn.png"),
-    "n": pygame.image.load(f"{base_path}/black/knight.png"),
-    "b": pygame.image.load(f"{base_path}/black/bishop.png"),
-    "r": pygame.image.load(f"{base_path}/black/rook.png"),
-    "q": pygame.image.load(f"{base_path}/black/queen.png"),
-    "k": pygame.image.load(f"{base_path}/black/king.png"),
-    "P": pygame.image.load(f"{base_path}/white/PAWN.png"),
-    "N": pygame.image.load(f"{base_path}/white/KNIGHT.png"),
-    "B": pygame.image.load(f"{base_path}/white/BISHOP.png"),
-    "R": pygame.image.load(f"{base_path}/white/ROOK.png"),
-    "Q": pygame.image.load(f"{base_path}/white/QUEEN.png"),
-    "K": pygame.image.load(f"{base_path}/white/KING.png"),
-}
-
-for key in pieces:
-    pieces[key] = pygame.transform.smoothscale(pieces[key], (85, 85))
-
-info = pygame.display.Info()
-WIDTH, HEIGHT = info.current_w, info.current_h
-screen = pygame.display.set_mode((WIDTH, HEIGHT), pygame.NOFRAME)
-pygame.display.set_caption("Chessboard")
-pygame.scrap.init()
-
 FPS = 60
-clock = pygame.time.Clock()
 
 BOARD_SIZE = 8
-SQUARE_SIZE = 85
+SQUARE_SIZE = 85  # replaced by board_square_size() for the display in init_display()
 BOARD_WIDTH = BOARD_SIZE * SQUARE_SIZE
 BOARD_HEIGHT = BOARD_SIZE * SQUARE_SIZE
-OFFSET_X = (WIDTH - BOARD_WIDTH) / 2
-OFFSET_Y = (HEIGHT - BOARD_HEIGHT) / 2
-
-LIGHT_SQUARE = (240, 217, 181)
-DARK_SQUARE = (181, 136, 99)
-BLACK = (0, 0, 0)
-HIGHLIGHT_LIGHT = (205, 162, 82)
-HIGHLIGHT_DARK = (163, 114, 41)
-
-FONT = pygame.font.SysFont("arial", 24)
-SMALL_FONT = pygame.font.SysFont("arial", 20)
-
-MOVE_SOUND = pygame.mixer.Sound(f"{base_path}/sound_effects/move-self.mp3")
-CAPTURE_SOUND = pygame.mixer.Sound(f"{base_path}/sound_effects/capture.mp3")
-PROMOTION_SOUND = pygame.mixer.Sound(f"{base_path}/sound_effects/promote.mp3")
+MIN_SQUARE_SIZE = 32
+PANEL_HEIGHT = 100  # kept free above and below the board for the FEN panel
+
+STATS_INTERVAL = 1000  # ms between frame-time updates in the caption
+COPY_FEEDBACK_MS = 1000  # how long "Copied!" stays up
+IDLE_CPU_TARGET = 1.0  # percent of one core the window may use while nobody touches it
+NATIVE_WAIT_DRIVERS = ("x11", "wayland", "windows", "cocoa")  # SDL video drivers that sleep until an event
+IDLE_POLL_MS = 25  # how often other drivers, such as dummy, look for events while idle
+ANALYSIS_EVENT = pygame.event.custom_type()  # results from the analysis worker
+
+# window, fonts, images and sounds are created by init_display() when main() starts, so
+# importing this module opens no window and loads no assets
+screen = None
+clock = None
+WIDTH = HEIGHT = 0
+OFFSET_X = OFFSET_Y = 0
+FONT = SMALL_FONT = None
+MOVE_SOUND = CAPTURE_SOUND = PROMOTION_SOUND = None
+pieces = {}
+renderer = None
+
+def board_square_size(width, height):
+    # the largest squares that fit the display with room for the FEN panel
+    return max(MIN_SQUARE_SIZE, min(width, height - 2 * PANEL_HEIGHT) // BOARD_SIZE)
+
+def init_display():
+    global screen, clock, WIDTH, HEIGHT, OFFSET_X, OFFSET_Y, FONT, SMALL_FONT, MOVE_SOUND, CAPTURE_SOUND, PROMOTION_SOUND
+    global renderer, SQUARE_SIZE, BOARD_WIDTH, BOARD_HEIGHT
+    pygame.init()
+
+    info = pygame.display.Info()
+    WIDTH, HEIGHT = info.current_w, info.current_h
+    SQUARE_SIZE = board_square_size(WIDTH, HEIGHT)
+    BOARD_WIDTH = BOARD_SIZE * SQUARE_SIZE
+    BOARD_HEIGHT = BOARD_SIZE * SQUARE_SIZE
+    screen = pygame.display.set_mode((WIDTH, HEIGHT), pygame.NOFRAME)
+
+    # one atlas scaled for this board size, read from the disk cache after the first launch
+    atlas, _ = load_atlas(base_path, SQUARE_SIZE)
+    pieces.update(piece_sprites(atlas.convert_alpha()))
+    pygame.display.set_caption("Chessboard")
+    pygame.scrap.init()
+    clock = pygame.time.Clock()
+
+    OFFSET_X = (WIDTH - BOARD_WIDTH) / 2
+    OFFSET_Y = (HEIGHT - BOARD_HEIGHT) / 2
+
+    FONT = pygame.font.SysFont("arial", 24)
+    SMALL_FONT = pygame.font.SysFont("arial", 20)
+
+    MOVE_SOUND = pygame.mixer.Sound(f"{base_path}/sound_effects/move-self.mp3")
+    CAPTURE_SOUND = pygame.mixer.Sound(f"{base_path}/sound_effects/capture.mp3")
+    PROMOTION_SOUND = pygame.mixer.Sound(f"{base_path}/sound_effects/promote.mp3")
+
+    renderer = BoardRenderer(screen, pieces, (OFFSET_X, OFFSET_Y), SQUARE_SIZE, FONT, SMALL_FONT)
 
 selected_square = None
 show_attacked_squares = []
@@ -59,248 +80,98 @@ hovering_copy = False
 show_copied = False
 copy_timer = 0
 
-def draw(board, fen, flip_board, last_move, show_copied, copy_timer):
-    draw_chessboard(board, flip_board, last_move)
-    button_rect = draw_fen_display_and_tests(fen)
-    show_copied = draw_copy_feedback(show_copied, copy_timer, button_rect)
-    pygame.display.flip()
+def draw(board, fen, flip_board, last_move, show_copied, copy_timer, status=""):
+    # only what changed since the last frame is redrawn and sent to the display
+    global hovering_copy
+    show_copied = show_copied and pygame.time.get_ticks() - copy_timer < COPY_FEEDBACK_MS
+    mouse_pos = pygame.mouse.get_pos()
+    button_rect = renderer.draw_frame(board, flip_board, selected_square, last_move, legal_moves,
+                                      show_attacked_squares, fen, mouse_pos, show_copied, status)
+    hovering_copy = button_rect.collidepoint(mouse_pos)
     return show_copied, button_rect
 
 
-def interpret_fen_board(fen):
-    board_part = fen.split(" ")[0]
-    interpretation = ""
-    for c in board_part:
-        if c == '/':
-            continue
-        interpretation += c if not c.isdigit() else "." * int(c)
-    return interpretation
-
-def interpret_fen(fen):
-    parts = fen.split()
-    board = interpret_fen_board(fen)
-    turn = parts[1]
-    castling = parts[2] if len(parts) > 2 else "-"
-    en_passant = parts[3] if len(parts) > 3 else "-"
-    halfmove = int(parts[4]) if len(parts) > 4 else 0
-    fullmove = int(parts[5]) if len(parts) > 5 else 1
-    return board, turn, castling, en_passant, halfmove, fullmove
-
-def get_fen_en_passent(en_pass):
-    if en_pass == "-":
-        return ()
-    return (ord(en_pass[0].lower()) - ord('a'), 8 - int(en_pass[1]))
-
-def make_fen_en_passent(en_pass):
-    return chr(en_pass[0] + 97) + str(8 - en_pass[1]) if en_pass != () else "-"
-
-def to_index(pos):
-    x, y = pos
-    return y * 8 + x
-
-def update_board(board, start, end):
-    board = list(board)
-    start_idx = to_index(start)
-    end_idx = to_index(end)
-    board[end_idx] = board[start_idx]
-    board[start_idx] = '.'
-    return ''.join(board)
-
-def board_to_fen(board, turn, castling, en_passant, halfmove, fullmove):
-    fen_rows = []
-    for y in range(8):
-        row = board[y * 8:(y + 1) * 8]
-        fen_row = ''
-        empty = 0
-        for c in row:
-            if c == '.':
-                empty += 1
-            else:
-                if empty:
-                    fen_row += str(empty)
-                    empty = 0
-                fen_row += c
-        if empty:
-            fen_row += str(empty)
-        fen_rows.append(fen_row)
-    return f"{'/'.join(fen_rows)} {turn} {castling} {en_passant} {halfmove} {fullmove}"
-
-def update_castling_rights(castling, selected_square, moved_piece):
-    x, y = selected_square
-
-    # Remove castling rights if the king moves
-    if moved_piece.lower() == 'k':
-        if moved_piece.isupper():
-            castling = castling.replace('K', '').replace('Q', '')
-        else:
-            castling = castling.replace('k', '').replace('q', '')
-
-    # Remove castling rights if a rook moves from its original square
-    elif moved_piece.lower() == 'r':
-        rights_to_remove = {
-            (0, 7): 'Q',  # White queenside
-            (7, 7): 'K',  # White kingside
-            (0, 0): 'q',  # Black queenside
-            (7, 0): 'k',  # Black kingside
-        }
-        to_remove = rights_to_remove.get((x, y))
-        if to_remove:
-            castling = castling.replace(to_remove, '')
-
-    return castling
-
 def show_promotion_menu(board, screen, promotion_square, turn):
+    # waits for a choice, drawing again only when the hovered choice changes or the window
+    # is exposed; events for the main loop are posted back once the menu closes
     x, y = promotion_square
     direction = -1 if turn == 'b' else 1
     piece_choices = ['q', 'n', 'r', 'b']
+    rects = [pygame.Rect(OFFSET_X + x * SQUARE_SIZE, OFFSET_Y + (y + i * direction) * SQUARE_SIZE,
+                         SQUARE_SIZE, SQUARE_SIZE) for i in range(4)]
+    # Choose base overlay color based on promoting side
+    overlay_color = (100, 100, 100) if turn == 'b' else (200, 200, 200)
+    hover_color = tuple(min(c + 30, 255) for c in overlay_color)
     selected_piece = None
+    deferred = []
+    drawn_hover = None
+    full = True
 
     while selected_piece is None:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit(); sys.exit()
-            elif event.type == pygame.MOUSEBUTTONDOWN:
-                mx, my = pygame.mouse.get_pos()
-                for i in range(4):
-                    square_y = y + i * direction
-                    rect = pygame.Rect(
-                        OFFSET_X + x * SQUARE_SIZE,
-                        OFFSET_Y + square_y * SQUARE_SIZE,
-                        SQUARE_SIZE,
-                        SQUARE_SIZE
-                    )
-                    if rect.collidepoint(mx, my):
-                        selected_piece = piece_choices[i].upper() if turn == 'w' else piece_choices[i]
-                        break
-
-        # Draw everything behind first
-        draw_chessboard(board, flip_board=False, last_move=None)
-
-        # Draw overlay squares
-        for i in range(4):
-            square_y = y + i * direction
-            rect = pygame.Rect(
-                OFFSET_X + x * SQUARE_SIZE,
-                OFFSET_Y + square_y * SQUARE_SIZE,
-                SQUARE_SIZE,
-                SQUARE_SIZE
-            )
-            # Choose base overlay color based on promoting side
-            overlay_color = (100, 100, 100) if turn == 'b' else (200, 200, 200)
-
-            # Highlight hovered one
-            if rect.collidepoint(pygame.mouse.get_pos()):
-                overlay_color = tuple(min(c + 30, 255) for c in overlay_color)
-
-            pygame.draw.rect(screen, overlay_color, rect)
-
-            # Draw the piece image
-            piece_key = piece_choices[i].upper() if turn == 'w' else piece_choices[i]
-            piece_img = pieces[piece_key]
-            screen.blit(piece_img, (rect.x, rect.y))
-
-        pygame.display.flip()
-
+        mouse_pos = pygame.mouse.get_pos()
+        hovered = next((i for i, rect in enumerate(rects) if rect.collidepoint(mouse_pos)), None)
+        if full or hovered != drawn_hover:
+            if full:
+                # Draw everything behind first
+                draw_chessboard(board, flip_board=False, last_move=None)
+            for i, rect in enumerate(rects):
+                pygame.draw.rect(screen, hover_color if i == hovered else overlay_color, rect)
+                piece_key = piece_choices[i].upper() if turn == 'w' else piece_choices[i]
+                screen.blit(pieces[piece_key], rect)
+            if full:
+                pygame.display.flip()
+            else:
+                pygame.display.update(rects)
+            drawn_hover = hovered
+            full = False
+
+        event = pygame.event.wait()
+        if event.type == pygame.QUIT:
+            pygame.quit(); sys.exit()
+        elif event.type == pygame.MOUSEBUTTONDOWN:
+            mx, my = pygame.mouse.get_pos()
+            for i, rect in enumerate(rects):
+                if rect.collidepoint(mx, my):
+                    selected_piece = piece_choices[i].upper() if turn == 'w' else piece_choices[i]
+                    break
+        elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+            renderer.invalidate()
+            full = True
+        elif event.type != pygame.MOUSEMOTION:
+            # analysis results, key presses and the like are for the main loop
+            deferred.append(event)
+
+    for event in deferred:
+        pygame.event.post(event)
+    # the menu drew over the board behind the renderer's back
+    renderer.invalidate()
     return selected_piece
 
 
 
 
 def make_move(board, selected_square, cur_sq_pos, type_of_move, en_passant, halfmove, turn, fullmove, castling):
-    moved_piece = board[to_index(selected_square)]
-
-    is_en_passant = (
-        moved_piece.lower() == 'p' and
-        cur_sq_pos == en_passant and
-        board[to_index(cur_sq_pos)] == '.'
-    )
-
-    captured = board[to_index(cur_sq_pos)] != '.' or is_en_passant
-    if is_en_passant:
-        cap_y = cur_sq_pos[1] + (1 if moved_piece.isupper() else -1)
-        cap_x = cur_sq_pos[0]
-        capture_idx = to_index((cap_x, cap_y))
-        board = list(board)
-        board[capture_idx] = '.'
-        board = ''.join(board)
-
-    board = update_board(board, selected_square, cur_sq_pos)
-    castling = update_castling_rights(castling,selected_square,moved_piece)
-
-    # === Handle castling ===
-    if type_of_move == "CASTLE":
-        board = list(board)
-        if cur_sq_pos == (6, 7):  # White king-side
-            board[to_index((5, 7))] = board[to_index((7, 7))]
-            board[to_index((7, 7))] = '.'
-        elif cur_sq_pos == (2, 7):  # White queen-side
-            board[to_index((3, 7))] = board[to_index((0, 7))]
-            board[to_index((0, 7))] = '.'
-        elif cur_sq_pos == (6, 0):  # Black king-side
-            board[to_index((5, 0))] = board[to_index((7, 0))]
-            board[to_index((7, 0))] = '.'
-        elif cur_sq_pos == (2, 0):  # Black queen-side
-            board[to_index((3, 0))] = board[to_index((0, 0))]
-            board[to_index((0, 0))] = '.'
-        board = ''.join(board)
+    # game_state.make_move with the promotion menu and move sounds
+    promotion = None
+    if type_of_move == "PROMOTION":
+        promotion = show_promotion_menu(update_board(board, selected_square, cur_sq_pos), screen, cur_sq_pos, turn)
+    captured = is_capture(board, selected_square, cur_sq_pos, en_passant)
+    state = apply_move(board, selected_square, cur_sq_pos, type_of_move, en_passant, halfmove, turn, fullmove, castling,
+                       promotion)
 
     if type_of_move == "PROMOTION":
-        # pawn already at 8th or 1st rank only need to change it
-        user_choise = show_promotion_menu(board,screen,cur_sq_pos,turn)
-        temp  = list(board)
-        temp[to_index(cur_sq_pos)] = user_choise
-        board = ''.join(temp)
         PROMOTION_SOUND.play()
     elif captured:
         CAPTURE_SOUND.play()
     else:
         MOVE_SOUND.play()
-
-    if moved_piece.lower() == 'p' or captured:
-        halfmove = 0
-    else:
-        halfmove += 1
-
-    if moved_piece.lower() == 'p' and abs(cur_sq_pos[1] - selected_square[1]) == 2:
-        en_passant = (cur_sq_pos[0], (cur_sq_pos[1] + selected_square[1]) // 2)
-    else:
-        en_passant = ()
-
-
-    if turn == 'b':
-        fullmove += 1
-    turn = 'b' if turn == 'w' else 'w'
-
-    return board, turn, castling, en_passant, halfmove, fullmove
+    return state
 
 
-def is_select_valid(board, square, turn):
-    return board[square] != "." and (
-        (board[square].isupper() and turn == "w") or (board[square].islower() and turn == "b")
-    )
-
 def draw_chessboard(board, flip_board=False, last_move=None):
+    # redraws the squares that changed onto the screen, leaving the display update to the caller
+    return renderer.draw_board(board, flip_board, selected_square, last_move, legal_moves, show_attacked_squares)
 
-    screen.fill(BLACK)
-    for y in range(BOARD_SIZE):
-        for x in range(BOARD_SIZE):
-            draw_x = BOARD_SIZE - 1 - x if flip_board else x
-            draw_y = BOARD_SIZE - 1 - y if flip_board else y
-            color = LIGHT_SQUARE if (x + y) % 2 == 0 else DARK_SQUARE
-            rect = pygame.Rect(OFFSET_X + draw_x * SQUARE_SIZE, OFFSET_Y + draw_y * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE)
-            pygame.draw.rect(screen, color, rect)
-
-            if selected_square == (x, y) or (last_move and ((x, y) == last_move[0] or (x, y) == last_move[1])):
-                pygame.draw.rect(screen, HIGHLIGHT_LIGHT if (x + y) % 2 == 0 else HIGHLIGHT_DARK, rect)
-
-            piece = board[y * 8 + x]
-            if piece != '.':
-                screen.blit(pieces[piece], (rect.x, rect.y))
-
-            if (x, y) in legal_moves:
-                pygame.draw.circle(screen, (80, 80, 80), (rect.centerx, rect.centery), 10)
-            if (x,y) in show_attacked_squares:
-                pygame.draw.circle(screen, (200, 0, 0), (rect.centerx, rect.centery), 10)
 def is_pseudo_legal_move_legal(board,start_square,end_square,turn):
     # start_square and end_square are in (x,y) format (0,1) (0,3) -> a2 to a4
     start_square, end_square = to_index(start_square), to_index(end_square)
@@ -311,33 +182,6 @@ def is_pseudo_legal_move_legal(board,start_square,end_square,turn):
     victim_king = 'K' if turn == 'w' else 'k'
     return not fake_board.index(victim_king) in list(map(to_index, attack_squares))
 
-def draw_fen_display_and_tests(fen):
-    global hovering_copy
-    x, y = 20, 0
-    label = FONT.render("FEN:", True, (255, 255, 255))
-    screen.blit(label, (x, y))
-    input_rect = pygame.Rect(x, y + 30, 900, 30)
-    pygame.draw.rect(screen, (40, 40, 40), input_rect)
-    pygame.draw.rect(screen, (200, 200, 200), input_rect, 2)
-    screen.blit(SMALL_FONT.render(fen, True, (255, 255, 255)), (input_rect.x + 10, input_rect.y + 5))
-    button_rect = pygame.Rect(input_rect.right + 10, input_rect.y, 80, 30)
-    pygame.draw.rect(screen, (60, 60, 60), button_rect)
-    pygame.draw.rect(screen, (160, 160, 160), button_rect, 2)
-
-    screen.blit(SMALL_FONT.render("Copy", True, (255, 255, 255)), (button_rect.x + 15, button_rect.y + 5))
-    hovering_copy = button_rect.collidepoint(pygame.mouse.get_pos())
-    if hovering_copy:
-        screen.blit(SMALL_FONT.render("Copy to clipboard", True, (200, 200, 200)), (button_rect.x, button_rect.y - 25))
-
-
-    return button_rect
-
-def draw_copy_feedback(show_copied, copy_timer, button_rect):
-    if show_copied and pygame.time.get_ticks() - copy_timer < 1000:
-        screen.blit(SMALL_FONT.render("Copied!", True, (0, 255, 0)), (button_rect.x, button_rect.y + 35))
-        return True
-    return False
-
 def get_square_at_pos(pos, flip_board):
     mx, my = pos
     if OFFSET_X <= mx < OFFSET_X + BOARD_WIDTH and OFFSET_Y <= my < OFFSET_Y + BOARD_HEIGHT:
@@ -346,26 +190,108 @@ def get_square_at_pos(pos, flip_board):
         return (BOARD_SIZE - 1 - fx if flip_board else fx, BOARD_SIZE - 1 - fy if flip_board else fy)
     return None
 
-def rest_game():
-    return "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1", 'w', 'KQkq', '-', 0, 1
+def next_timeout(show_copied, copy_timer, report_time=None):
+    # ms until something changes by itself (the "Copied!" note expiring, the next frame
+    # report line), 0 when nothing will
+    now = pygame.time.get_ticks()
+    timeouts = []
+    if show_copied:
+        timeouts.append(COPY_FEEDBACK_MS - (now - copy_timer))
+    if report_time is not None:
+        timeouts.append(STATS_INTERVAL - (now - report_time))
+    return max(1, min(timeouts)) if timeouts else 0
+
+def wait_events(timeout):
+    # events once at least one arrives or timeout ms pass (0 waits forever). SDL emulates
+    # the wait on drivers without a native one by polling every millisecond, which alone
+    # costs more than IDLE_CPU_TARGET, so those are polled every IDLE_POLL_MS instead
+    if pygame.display.get_driver() in NATIVE_WAIT_DRIVERS:
+        return [pygame.event.wait(timeout)] + pygame.event.get()
+    deadline = pygame.time.get_ticks() + timeout if timeout else None
+    while True:
+        events = pygame.event.get()
+        now = pygame.time.get_ticks()
+        if events or (deadline is not None and now >= deadline):
+            return events
+        pygame.time.wait(IDLE_POLL_MS if deadline is None else min(IDLE_POLL_MS, deadline - now))
+
+def cpu_sample():
+    return pygame.time.get_ticks(), time.process_time()
+
+def cpu_percent(since):
+    # process CPU time since a cpu_sample() as a percentage of one core
+    ticks, cpu = since
+    elapsed = (pygame.time.get_ticks() - ticks) / 1000
+    return (time.process_time() - cpu) / elapsed * 100 if elapsed else 0.0
+
+def frame_report(frames_rendered, started, last_report):
+    # CPU is given overall and since the last report, which is the idle figure when
+    # nothing happened in between
+    elapsed = (pygame.time.get_ticks() - started[0]) / 1000
+    possible = int(elapsed * FPS)
+    return (f"{frames_rendered} frames rendered, {max(0, possible - frames_rendered)} of {possible} skipped "
+            f"at {FPS} FPS, cpu {cpu_percent(started):.1f}% of a core overall, {cpu_percent(last_report):.1f}% "
+            f"since the last report (idle target {IDLE_CPU_TARGET}%)")
+
+def post_analysis(kind, request_id, result):
+    # called on the worker's relay thread; pygame.event.post is safe from there
+    pygame.event.post(pygame.event.Event(ANALYSIS_EVENT, kind=kind, request_id=request_id, result=result))
+
+def analysis_status(move_table, analysis):
+    if move_table is None or analysis is None:
+        return "Analysing..."
+    if "error" in analysis:
+        return f"No engine analysis: {analysis['error']}"
+    if analysis["best_move"] is None:
+        return f"No legal moves ({analysis['score']})"
+    return f"Engine: {analysis['best_move']} ({analysis['score']}, depth {analysis['depth']})"
+
+def table_fields(entry):
+    # (move table, analysis, attacked squares) of a TableCache entry; None while pending
+    if entry is None:
+        return None, None, []
+    return entry["moves"], entry["analysis"], entry["attacked"]
 
 def main():
     global selected_square, legal_moves, hovering_copy, show_copied, copy_timer, show_attacked_squares
+    init_display()
+    worker = AnalysisWorker(post_analysis)
     test_fen = ""
-    fen = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1" if test_fen == "" else test_fen
+    fen = START_FEN if test_fen == "" else test_fen
     board, turn, castling, en_passant, halfmove, fullmove = interpret_fen(fen)
     en_passant = get_fen_en_passent(en_passant)
     flip_board = False
     running = True
     last_move = None
-    # Calculate attack squares once at start
-    attack_squares = get_opponents_attacked_squares(board, turn)
+    # legal moves and attacked squares arrive from the worker once per position and are
+    # kept in tables; until then a selected piece shows no moves and the status line says
+    # the work is pending
+    tables = TableCache()
+    request_id = worker.submit(fen)
+    move_table = None
+    analysis = None
+    attack_squares = []
+    # (board, turn, castling, en_passant, halfmove, fullmove, last_move) before each move
+    # made, and of each position undone for redo
+    history = []
+    redo = []
+    show_attacks = False
+    full_legal_moves = []
     show_attacked_squares  = []
+    caption = None
+    stats_text = ""
+    stats_time = 0
+    report_frames = False
+    started = report_sample = cpu_sample()
+    show_copied, button_rect = draw(board, fen, flip_board, last_move, show_copied, copy_timer,
+                                    analysis_status(move_table, analysis))
+    frames_rendered = 1
 
     while running:
-        clock.tick(FPS)
-        
-        for event in pygame.event.get():
+        # sleep until something happens instead of redrawing FPS times a second; the only
+        # timed changes are the "Copied!" note going away and the I report's next line
+        events = wait_events(next_timeout(show_copied, copy_timer, report_sample[0] if report_frames else None))
+        for event in events:
             if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
                 running = False
             elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
@@ -379,11 +305,13 @@ def main():
                         sq = cur_sq_pos[1] * 8 + cur_sq_pos[0]
                         if is_select_valid(board, sq, turn):
                             selected_square = cur_sq_pos
-                            legal_moves = [i[0] for i in generate_piece_moves(board, turn, cur_sq_pos, en_passant, castling)]
-                            full_legal_moves = generate_piece_moves(board, turn, cur_sq_pos, en_passant, castling)
-                            
+                            full_legal_moves = move_table.get(cur_sq_pos, []) if move_table is not None else []
+                            legal_moves = [i[0] for i in full_legal_moves]
+
                         elif selected_square and cur_sq_pos in legal_moves:
                             type_of_move = full_legal_moves[legal_moves.index(cur_sq_pos)][1]
+                            history.append((board, turn, castling, en_passant, halfmove, fullmove, last_move))
+                            redo = []
                             board, turn, castling, en_passant, halfmove, fullmove = make_move(
                                 board, selected_square, cur_sq_pos, type_of_move, en_passant, halfmove, turn, fullmove, castling)
                             last_move = (selected_square, cur_sq_pos)
@@ -391,30 +319,90 @@ def main():
                             legal_moves = []
                             selected_square = None
 
-                            # Update attack squares only after move
-                            attack_squares = get_opponents_attacked_squares(board, turn)
+                            request_id, entry = request_tables(worker, tables, fen)
+                            move_table, analysis, attack_squares = table_fields(entry)
+                            show_attacked_squares = attack_squares if show_attacks else []
                         else:
                             selected_square = None
                             legal_moves = []
+            elif event.type == ANALYSIS_EVENT and event.request_id == request_id:
+                if event.kind == MOVES:
+                    tables.put(fen, {"moves": event.result["moves"], "attacked": event.result["attacked"],
+                                     "analysis": None})
+                    move_table = event.result["moves"]
+                    attack_squares = event.result["attacked"]
+                    show_attacked_squares = attack_squares if show_attacks else []
+                    if selected_square:
+                        full_legal_moves = move_table.get(selected_square, [])
+                        legal_moves = [i[0] for i in full_legal_moves]
+                else:
+                    analysis = event.result
+                    entry = tables.get(fen)
+                    if entry is not None:
+                        entry["analysis"] = analysis
+            elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                renderer.invalidate()
             elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_i:
+                    report_frames = not report_frames
+                    report_sample = cpu_sample()
                 if event.key == pygame.K_f:
                     flip_board = not flip_board
                 if event.key == pygame.K_a:
-                    show_attacked_squares = attack_squares if show_attacked_squares == [] else []
+                    show_attacks = not show_attacks
+                    show_attacked_squares = attack_squares if show_attacks else []
+                if event.key in (pygame.K_LEFT, pygame.K_RIGHT):
+                    # left undoes a move, right redoes it; tables of positions seen
+                    # recently come from the cache
+                    source, target = (history, redo) if event.key == pygame.K_LEFT else (redo, history)
+                    if source:
+                        target.append((board, turn, castling, en_passant, halfmove, fullmove, last_move))
+                        board, turn, castling, en_passant, halfmove, fullmove, last_move = source.pop()
+                        fen = board_to_fen(board, turn, castling, make_fen_en_passent(en_passant), halfmove, fullmove)
+                        legal_moves = []
+                        selected_square = None
+
+                        request_id, entry = request_tables(worker, tables, fen)
+                        move_table, analysis, attack_squares = table_fields(entry)
+                        show_attacked_squares = attack_squares if show_attacks else []
                 if event.key == pygame.K_r:
-                    # not working
                     fen, turn, castling, en_passant, halfmove, fullmove = rest_game()
-                    board = interpret_fen(fen)
-                    show_attacked_squares = []
-                    attack_squares = []
+                    board = interpret_fen_board(fen)
+                    en_passant = get_fen_en_passent(en_passant)
+                    history = []
+                    redo = []
                     last_move = None
                     flip_board = False
                     legal_moves = []
+                    selected_square = None
+                    renderer.invalidate()
+
+                    request_id, entry = request_tables(worker, tables, fen)
+                    move_table, analysis, attack_squares = table_fields(entry)
+                    show_attacked_squares = attack_squares if show_attacks else []
+
+
+        show_copied, button_rect = draw(board, fen, flip_board, last_move, show_copied, copy_timer,
+                                        analysis_status(move_table, analysis))
+        frames_rendered += 1
+        if pygame.time.get_ticks() - stats_time >= STATS_INTERVAL:
+            stats_time = pygame.time.get_ticks()
+            frame_ms, dirty = renderer.frame_stats()
+            stats_text = f" - draw {frame_ms:.2f} ms/frame, {dirty:.1f} rects"
+        new_caption = f"Chessboard - Turn: {'White' if turn == 'w' else 'Black'}{stats_text}"
+        if new_caption != caption:
+            caption = new_caption
+            pygame.display.set_caption(caption)
+        if report_frames and pygame.time.get_ticks() - report_sample[0] >= STATS_INTERVAL:
+            print(frame_report(frames_rendered, started, report_sample))
+            report_sample = cpu_sample()
+        # a stream of events (dragging the mouse) still gets at most FPS frames a second
+        clock.tick(FPS)
 
-
-        show_copied, button_rect = draw(board, fen, flip_board, last_move, show_copied, copy_timer)
-        pygame.display.set_caption(f"Chessboard - Turn: {'White' if turn == 'w' else 'Black'}")
-
+    frame_ms, _ = renderer.frame_stats()
+    print(f"{renderer.frames} frames, {renderer.full_frames} full redraws, {frame_ms:.2f} ms per frame recently")
+    print(frame_report(frames_rendered, started, report_sample))
+    worker.close()
     pygame.quit()
     sys.exit()
 
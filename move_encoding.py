@@ -0,0 +1,179 @@
+import argparse
+import sys
+import time
+from array import array
+
+# 16-bit moves: from square (bits 0-5) | to square (bits 6-11) | flag (bits 12-13) |
+# promotion piece (bits 14-15, an index into PROMOTION_PIECES, only read with the PROMOTION
+# flag). Squares are board indices, a8 = 0. No legal move is 0, so 0 doubles as "no move".
+# Move lists are array('H') buffers of MAX_MOVES codes, allocated once and refilled.
+
+PROMOTION_PIECES = ('q', 'r', 'b', 'n')
+
+QUIET, CAPTURE, PROMOTION, CASTLE = 0, 1, 2, 3
+FLAG_NAMES = ("QUIET", "CAPTURE", "PROMOTION", "CASTLE")
+FLAGS = {name: flag for flag, name in enumerate(FLAG_NAMES)}
+NO_MOVE = 0
+MAX_MOVES = 256  # the most legal moves known in one position is 218
+
+
+def encode_move(start, end, flag=QUIET, promotion=0):
+    # start, end: board indices; promotion: index into PROMOTION_PIECES
+    return start | (end << 6) | (flag << 12) | (promotion << 14)
+
+
+def move_from(code):
+    return code & 63
+
+
+def move_to(code):
+    return (code >> 6) & 63
+
+
+def move_flag(code):
+    return (code >> 12) & 3
+
+
+def move_promotion(code):
+    # the promotion piece letter, or None
+    return PROMOTION_PIECES[code >> 14] if (code >> 12) & 3 == PROMOTION else None
+
+
+def new_move_list():
+    return array('H', bytes(2 * MAX_MOVES))
+
+
+_legacy_moves = [None] * 65536
+
+
+def to_legacy(code):
+    # the (start, end, move_type, promotion) tuple Position.make_move takes; built once per
+    # code and shared afterwards, so converting allocates nothing
+    move = _legacy_moves[code]
+    if move is None:
+        start = code & 63
+        end = (code >> 6) & 63
+        move = _legacy_moves[code] = ((start % 8, start // 8), (end % 8, end // 8),
+                                      FLAG_NAMES[(code >> 12) & 3], move_promotion(code))
+    return move
+
+
+def from_legacy(move):
+    # (start, end, move_type[, promotion]) with (x, y) squares; a promotion without a piece
+    # is taken to be a queen
+    start, end, move_type = move[0], move[1], move[2]
+    code = (start[1] * 8 + start[0]) | ((end[1] * 8 + end[0]) << 6) | (FLAGS[move_type] << 12)
+    if move_type == "PROMOTION":
+        promotion = move[3] if len(move) > 3 else None
+        code |= PROMOTION_PIECES.index(promotion or 'q') << 14
+    return code
+
+
+def square_name(index):
+    return chr(index % 8 + 97) + str(8 - index // 8)
+
+
+def to_uci(code):
+    uci = square_name(code & 63) + square_name((code >> 6) & 63)
+    if (code >> 12) & 3 == PROMOTION:
+        uci += PROMOTION_PIECES[code >> 14]
+    return uci
+
+
+def from_uci(uci, codes, count=None):
+    # the code among the first count entries of codes (a generated move list) that uci
+    # names; the flag comes from the generator, which is why a move list is needed
+    start = (ord(uci[0]) - 97) + (8 - int(uci[1])) * 8
+    end = (ord(uci[2]) - 97) + (8 - int(uci[3])) * 8
+    promotion = uci[4:5] or None
+    for index in range(len(codes) if count is None else count):
+        code = codes[index]
+        if code & 4095 == start | (end << 6) and move_promotion(code) == promotion:
+            return code
+    raise ValueError(f"{uci} is not in the move list")
+
+
+def perft_codes(position, depth, buffers):
+    # perft on 16-bit move lists; buffers holds one move list per remaining depth
+    if depth == 0:
+        return 1
+    codes = buffers[depth]
+    count = position.legal_move_codes(codes)
+    if depth == 1:
+        return count
+    nodes = 0
+    for index in range(count):
+        undo = position.make_move(to_legacy(codes[index]))
+        nodes += perft_codes(position, depth - 1, buffers)
+        position.unmake_move(undo)
+    return nodes
+
+
+def perft_tuples(position, depth):
+    if depth == 0:
+        return 1
+    moves = position.legal_moves()
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        undo = position.make_move(move)
+        nodes += perft_tuples(position, depth - 1)
+        position.unmake_move(undo)
+    return nodes
+
+
+def list_memory(position):
+    # bytes held by one position's move list: the list, its move tuples and their square
+    # tuples (each object counted once) against the preallocated array('H')
+    moves = position.legal_moves()
+    seen = set()
+    tuple_bytes = sys.getsizeof(moves)
+    for move in moves:
+        for part in (move, move[0], move[1]):
+            if id(part) not in seen:
+                seen.add(id(part))
+                tuple_bytes += sys.getsizeof(part)
+    codes = new_move_list()
+    count = position.legal_move_codes(codes)
+    return len(moves), tuple_bytes, count, sys.getsizeof(codes)
+
+
+def run_bench(depth):
+    from perft import REFERENCE_POSITIONS
+    from position import Position
+    totals = {"tuples": [0, 0.0], "codes": [0, 0.0]}
+    for name, fen, _ in REFERENCE_POSITIONS[:7]:
+        position = Position.from_fen(fen)
+        moves, tuple_bytes, count, array_bytes = list_memory(position)
+        started = time.perf_counter()
+        tuple_nodes = perft_tuples(position, depth)
+        tuple_time = time.perf_counter() - started
+        started = time.perf_counter()
+        code_nodes = perft_codes(position, depth, [new_move_list() for _ in range(depth + 1)])
+        code_time = time.perf_counter() - started
+        if tuple_nodes != code_nodes or moves != count:
+            print(f"FAIL {name}: {tuple_nodes} nodes with tuples, {code_nodes} with codes")
+            return 1
+        totals["tuples"][0] += tuple_nodes
+        totals["tuples"][1] += tuple_time
+        totals["codes"][0] += code_nodes
+        totals["codes"][1] += code_time
+        print(f"{name}: {count} moves, {tuple_bytes} bytes as tuples / {array_bytes} bytes as array('H') "
+              f"({2 * count} used); "
+              f"perft {depth} {tuple_nodes} nodes, {tuple_time:.3f}s tuples / {code_time:.3f}s codes")
+    for kind, (nodes, elapsed) in totals.items():
+        print(f"{kind}: {nodes} nodes in {elapsed:.3f}s, {nodes / elapsed:,.0f} nps")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare tuple and 16-bit move lists on perft.",
+                                     epilog="Set CHESS_MOVEGEN_BACKEND=bitboard to measure the bitboard backend.")
+    parser.add_argument("-d", "--depth", type=int, default=3)
+    args = parser.parse_args(argv)
+    return run_bench(args.depth)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
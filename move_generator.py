@@ -1,3 +1,6 @@
+import os
+from move_encoding import PROMOTION_PIECES, FLAGS
+
 BOARD_SIZE = 8
 
 def get_opponents_attacked_squares(board, color_of_victim):
@@ -22,16 +25,170 @@ def get_opponents_attacked_squares(board, color_of_victim):
                     attacked_squares.append((nx, ny))
     return attacked_squares
 
-def is_pseudo_legal_move_legal(board,start_square,end_square,turn):
+KNIGHT_OFFSETS = [(2, 1), (1, 2), (-1, 2), (-2, 1), (-2, -1), (-1, -2), (1, -2), (2, -1)]
+KING_OFFSETS = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1) if dx or dy]
+ROOK_DIRECTIONS = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+BISHOP_DIRECTIONS = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+
+def is_square_attacked(board, square, by_color):
+    # probe outward from the target square instead of generating every enemy move
+    x, y = square
+    if by_color == 'w':
+        pawn, knight, bishop, rook, queen, king = 'P', 'N', 'B', 'R', 'Q', 'K'
+        pawn_y = y + 1  # white pawns attack towards y = 0
+    else:
+        pawn, knight, bishop, rook, queen, king = 'p', 'n', 'b', 'r', 'q', 'k'
+        pawn_y = y - 1
+
+    for dx in (-1, 1):
+        if is_on_board(x + dx, pawn_y) and board[square_index(x + dx, pawn_y)] == pawn:
+            return True
+    for dx, dy in KNIGHT_OFFSETS:
+        if is_on_board(x + dx, y + dy) and board[square_index(x + dx, y + dy)] == knight:
+            return True
+    for dx, dy in KING_OFFSETS:
+        if is_on_board(x + dx, y + dy) and board[square_index(x + dx, y + dy)] == king:
+            return True
+
+    for directions, slider in ((ROOK_DIRECTIONS, rook), (BISHOP_DIRECTIONS, bishop)):
+        for dx, dy in directions:
+            nx, ny = x + dx, y + dy
+            while is_on_board(nx, ny):
+                target = board[square_index(nx, ny)]
+                if target != '.':
+                    if target == slider or target == queen:
+                        return True
+                    break
+                nx += dx
+                ny += dy
+    return False
+
+def attack_map(board, by_color):
+    # bit i is set when by_color attacks board index i, including squares of its own pieces
+    attacks = 0
+    for index, piece in enumerate(board):
+        if piece == '.' or is_enemy(piece, by_color):
+            continue
+        x, y = index_square(index)
+        lower_piece = piece.lower()
+        if lower_piece == 'p':
+            targets = [(x + dx, y + (-1 if by_color == 'w' else 1)) for dx in (-1, 1)]
+        elif lower_piece == 'n':
+            targets = [(x + dx, y + dy) for dx, dy in KNIGHT_OFFSETS]
+        elif lower_piece == 'k':
+            targets = [(x + dx, y + dy) for dx, dy in KING_OFFSETS]
+        else:
+            directions = []
+            if lower_piece in 'rq':
+                directions += ROOK_DIRECTIONS
+            if lower_piece in 'bq':
+                directions += BISHOP_DIRECTIONS
+            targets = []
+            for dx, dy in directions:
+                nx, ny = x + dx, y + dy
+                while is_on_board(nx, ny):
+                    targets.append((nx, ny))
+                    if board[square_index(nx, ny)] != '.':
+                        break
+                    nx += dx
+                    ny += dy
+        for nx, ny in targets:
+            if is_on_board(nx, ny):
+                attacks |= 1 << square_index(nx, ny)
+    return attacks
+
+FULL_MASK = (1 << 64) - 1
+
+def analyze_king_safety(board, turn):
+    # checkers: bitset of enemy pieces giving check
+    # check_mask: squares a non-king move must land on (everything when not in check,
+    #             nothing in double check, otherwise the checker and the squares between)
+    # pins: {board index of an absolutely pinned piece: bitset of squares it may move to}
+    king = 'K' if turn == 'w' else 'k'
+    king_x, king_y = index_square(board.index(king))
+    if turn == 'w':
+        pawn, knight, bishop, rook, queen = 'p', 'n', 'b', 'r', 'q'
+    else:
+        pawn, knight, bishop, rook, queen = 'P', 'N', 'B', 'R', 'Q'
+    checkers = 0
+    check_mask = 0
+    pins = {}
+
+    pawn_y = king_y - 1 if turn == 'w' else king_y + 1
+    for dx in (-1, 1):
+        if is_on_board(king_x + dx, pawn_y) and board[square_index(king_x + dx, pawn_y)] == pawn:
+            checkers |= 1 << square_index(king_x + dx, pawn_y)
+    for dx, dy in KNIGHT_OFFSETS:
+        if is_on_board(king_x + dx, king_y + dy) and board[square_index(king_x + dx, king_y + dy)] == knight:
+            checkers |= 1 << square_index(king_x + dx, king_y + dy)
+    check_mask |= checkers
+
+    for directions, slider in ((ROOK_DIRECTIONS, rook), (BISHOP_DIRECTIONS, bishop)):
+        for dx, dy in directions:
+            ray = 0
+            own_blocker = None
+            nx, ny = king_x + dx, king_y + dy
+            while is_on_board(nx, ny):
+                index = square_index(nx, ny)
+                ray |= 1 << index
+                target = board[index]
+                if target != '.':
+                    if not is_enemy(target, turn):
+                        if own_blocker is not None:
+                            break
+                        own_blocker = index
+                    else:
+                        if target == slider or target == queen:
+                            if own_blocker is None:
+                                checkers |= 1 << index
+                                check_mask |= ray
+                            else:
+                                pins[own_blocker] = ray
+                        break
+                nx += dx
+                ny += dy
+
+    if not checkers:
+        check_mask = FULL_MASK
+    elif checkers & (checkers - 1):
+        check_mask = 0
+    return checkers, check_mask, pins
+
+def is_move_legal(board, turn, start_square, end_square, move_type, en_pass, king_safety):
+    # legality against the masks from analyze_king_safety; only king moves, castling and
+    # en passant fall back to simulating the move
+    start = square_index(start_square)
+    piece = board[start].lower()
+    if move_type == "CASTLE" and not is_castle_legal(board, turn, end_square):
+        return False
+    if piece == 'k' or (piece == 'p' and end_square == en_pass and en_pass):
+        return is_pseudo_legal_move_legal(board, start_square, end_square, turn, en_pass)
+    checkers, check_mask, pins = king_safety
+    end_bit = 1 << square_index(end_square)
+    if not end_bit & check_mask:
+        return False
+    return start not in pins or bool(end_bit & pins[start])
+
+def is_pseudo_legal_move_legal(board,start_square,end_square,turn,en_pass=None):
     # start_square and end_square are in (x,y) format (0,1) (0,3) -> a2 to a4
+    is_en_passant = en_pass and end_square == en_pass and board[square_index(start_square)].lower() == 'p'
     start_square, end_square = square_index(start_square), square_index(end_square)
     fake_board = list(board)
+    if is_en_passant and fake_board[end_square] == '.':
+        # the captured pawn sits behind the en passant square
+        fake_board[end_square + (8 if turn == 'w' else -8)] = '.'
     fake_board[end_square] = fake_board[start_square]
     fake_board[start_square] = '.'
-    attack_squares = get_opponents_attacked_squares(fake_board,turn)
     victim_king = 'K' if turn == 'w' else 'k'
-    return not fake_board.index(victim_king) in list(map(square_index, attack_squares))
-
+    enemy_color = 'b' if turn == 'w' else 'w'
+    return not is_square_attacked(fake_board, index_square(fake_board.index(victim_king)), enemy_color)
+
+def is_castle_legal(board, turn, end_square):
+    # the king may not castle out of, or through, an attacked square
+    x, y = end_square
+    passed_squares = [(4, y), (5, y)] if x == 6 else [(4, y), (3, y)]
+    enemy_color = 'b' if turn == 'w' else 'w'
+    return not any(is_square_attacked(board, sq, enemy_color) for sq in passed_squares)
         
 
 def is_on_board(x, y):
@@ -166,49 +323,51 @@ def generate_king_moves(board, turn, square, castling_rights):
     return moves
 
 def generate_piece_moves(board, turn, square, en_pass, castling_rights):
-    x, y = square
-    piece = board[square_index(x, y)]
-    lower_piece = piece.lower()
-
-    pseudo_legal_moves = generate_piece_pseudo_legal_moves(board, turn, (x, y), en_pass, castling_rights)
-    legal_moves = []
-
-    for move in pseudo_legal_moves:
-        end_pos, move_type = move
-        if is_pseudo_legal_move_legal(board, square, end_pos, turn):
-            # Simulate the move
-            fake_board = list(board)
-            start_index = square_index(square)
-            end_index = square_index(end_pos)
-            fake_board[end_index] = fake_board[start_index]
-            fake_board[start_index] = '.'
-
-            # Check if the opponent is in check or checkmate
-            enemy_color = 'b' if turn == 'w' else 'w'
-            victim_king = 'k' if enemy_color == 'b' else 'K'
-
-            if victim_king in fake_board:
-                king_index = fake_board.index(victim_king)
-                attacked_squares = get_opponents_attacked_squares(fake_board, enemy_color)
-
-                if king_index in list(map(square_index, attacked_squares)):
-                    # Opponent is in check — check if they have any legal moves
-                    has_escape = False
-                    for i, p in enumerate(fake_board):
-                        if p == '.' or is_enemy(p, enemy_color):
-                            continue
-                        pos = index_square(i)
-                        if generate_piece_moves(fake_board, enemy_color, pos, en_pass, castling_rights):
-                            has_escape = True
-                            break
-                    if not has_escape:
-                        move_type = "CHECKMATE"
-                    else:
-                        move_type = "CHECK"
-
-            legal_moves.append((end_pos, move_type))
+    # legal moves of the piece on square; CHECK/CHECKMATE labels come from position.classify_move
+    pseudo_legal_moves = generate_piece_pseudo_legal_moves(board, turn, square, en_pass, castling_rights)
+    king_safety = analyze_king_safety(board, turn)
+    return [(end_pos, move_type) for end_pos, move_type in pseudo_legal_moves
+            if is_move_legal(board, turn, square, end_pos, move_type, en_pass, king_safety)]
+
+def generate_legal_moves(board, turn, en_pass, castling_rights):
+    # every legal move for the side to move as (start, end, move_type), without check annotation
+    moves = []
+    king_safety = analyze_king_safety(board, turn)
+    for index, piece in enumerate(board):
+        if piece == '.' or is_enemy(piece, turn):
+            continue
+        start = index_square(index)
+        for end, move_type in generate_piece_pseudo_legal_moves(board, turn, start, en_pass, castling_rights):
+            if is_move_legal(board, turn, start, end, move_type, en_pass, king_safety):
+                moves.append((start, end, move_type))
+    return moves
 
-    return legal_moves
+def generate_legal_move_codes(board, turn, en_pass, castling_rights, out):
+    # the moves of generate_legal_moves as 16-bit codes (see move_encoding) written into out,
+    # one per promotion piece; returns how many were written
+    count = 0
+    for (x, y), (end_x, end_y), move_type in generate_legal_moves(board, turn, en_pass, castling_rights):
+        code = (y * 8 + x) | ((end_y * 8 + end_x) << 6) | (FLAGS[move_type] << 12)
+        if move_type == "PROMOTION":
+            for promotion in range(len(PROMOTION_PIECES)):
+                out[count] = code | (promotion << 14)
+                count += 1
+        else:
+            out[count] = code
+            count += 1
+    return count
+
+def has_legal_move(board, turn, en_pass, castling_rights):
+    # stops at the first legal move instead of generating all of them
+    king_safety = analyze_king_safety(board, turn)
+    for index, piece in enumerate(board):
+        if piece == '.' or is_enemy(piece, turn):
+            continue
+        start = index_square(index)
+        for end, move_type in generate_piece_pseudo_legal_moves(board, turn, start, en_pass, castling_rights):
+            if is_move_legal(board, turn, start, end, move_type, en_pass, king_safety):
+                return True
+    return False
 
 def generate_piece_pseudo_legal_moves(board, turn, square, en_pass, castling_rights):
     x, y = square
@@ -228,4 +387,75 @@ def generate_piece_pseudo_legal_moves(board, turn, square, en_pass, castling_rig
     if lower_piece == 'k':
         return  generate_king_moves(board, turn, (x, y),castling_rights)
 
-    return []
\ No newline at end of file
+    return []
+
+def generate_piece_captures(board, turn, square, en_pass):
+    # the captures (en passant included) and promotions among generate_piece_pseudo_legal_moves,
+    # without producing the quiet moves
+    x, y = square
+    lower_piece = board[square_index(x, y)].lower()
+    moves = []
+
+    if lower_piece == 'p':
+        direction = -1 if turn == 'w' else 1
+        promotion_row = 0 if turn == 'w' else 7
+        ny = y + direction
+        if ny == promotion_row and board[square_index(x, ny)] == '.':
+            moves.append(((x, ny), "PROMOTION"))
+        for nx in (x - 1, x + 1):
+            if is_on_board(nx, ny) and (is_enemy(board[square_index(nx, ny)], turn) or en_pass == (nx, ny)):
+                moves.append(((nx, ny), "PROMOTION" if ny == promotion_row else "CAPTURE"))
+    elif lower_piece in ('n', 'k'):
+        for dx, dy in KNIGHT_OFFSETS if lower_piece == 'n' else KING_OFFSETS:
+            nx, ny = x + dx, y + dy
+            if is_on_board(nx, ny) and is_enemy(board[square_index(nx, ny)], turn):
+                moves.append(((nx, ny), "CAPTURE"))
+    elif lower_piece in ('b', 'r', 'q'):
+        directions = (BISHOP_DIRECTIONS if lower_piece == 'b' else ROOK_DIRECTIONS if lower_piece == 'r'
+                      else BISHOP_DIRECTIONS + ROOK_DIRECTIONS)
+        for dx, dy in directions:
+            nx, ny = x + dx, y + dy
+            while is_on_board(nx, ny) and board[square_index(nx, ny)] == '.':
+                nx += dx
+                ny += dy
+            if is_on_board(nx, ny) and is_enemy(board[square_index(nx, ny)], turn):
+                moves.append(((nx, ny), "CAPTURE"))
+    return moves
+
+def generate_piece_quiets(board, turn, square, castling_rights):
+    # the rest of generate_piece_pseudo_legal_moves: non-capturing, non-promoting moves and castling
+    lower_piece = board[square_index(square)].lower()
+    if lower_piece == 'p':
+        return [move for move in generate_pawn_moves(board, turn, square, None) if move[1] == "QUIET"]
+    return [move for move in generate_piece_pseudo_legal_moves(board, turn, square, None, castling_rights)
+            if move[1] != "CAPTURE"]
+
+
+# CHESS_MOVEGEN_BACKEND=bitboard swaps in the bitboard implementations at import time;
+# everything above keeps calling them through these module level names
+MOVEGEN_BACKEND = os.environ.get("CHESS_MOVEGEN_BACKEND", "board")
+
+if MOVEGEN_BACKEND == "bitboard":
+    from bitboard import (
+        generate_bishop_moves,
+        generate_rook_moves,
+        generate_queen_moves,
+        generate_knight_moves,
+        generate_pawn_moves,
+        generate_king_moves,
+        generate_piece_pseudo_legal_moves,
+        generate_piece_captures,
+        generate_piece_quiets,
+        generate_legal_moves,
+        generate_legal_move_codes,
+        has_legal_move,
+        get_opponents_attacked_squares,
+        is_square_attacked,
+        attack_map,
+        is_pseudo_legal_move_legal,
+        is_castle_legal,
+        analyze_king_safety,
+        is_move_legal,
+    )
+elif MOVEGEN_BACKEND != "board":
+    raise ValueError(f"Unknown CHESS_MOVEGEN_BACKEND {MOVEGEN_BACKEND!r}, expected 'board' or 'bitboard'")
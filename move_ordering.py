@@ -0,0 +1,125 @@
+import random
+from staged_moves import move_stages
+from transposition import pack_move
+
+# attacker/victim ranks for most-valuable-victim / least-valuable-attacker
+PIECE_RANKS = {'p': 1, 'n': 2, 'b': 3, 'r': 4, 'q': 5, 'k': 6}
+
+HASH_MOVE_SCORE = 1000000
+CAPTURE_SCORE = 100000
+PROMOTION_SCORE = 90000
+KILLER_SCORES = (80000, 79000)
+HISTORY_LIMIT = 50000  # history scores are halved once one reaches this, staying below killers
+
+MAX_PLY = 128
+
+
+class MoveOrderer:
+    # Scores moves for alpha-beta: hash move, captures by MVV-LVA, queen promotions, two
+    # killer moves per ply, then quiet moves by a butterfly history table indexed by side,
+    # from square and to square. Each heuristic can be switched off to measure what it saves
+    # in the main search; quiescence (ply None) always uses MVV-LVA to stay bounded.
+    # seed: start the history tables from small random scores, so parallel search helpers
+    # try quiet moves in different orders
+
+    def __init__(self, mvv_lva=True, killers=True, history=True, seed=None):
+        self.use_mvv_lva = mvv_lva
+        self.use_killers = killers
+        self.use_history = history
+        self.killers = [[None, None] for _ in range(MAX_PLY + 1)]
+        if seed is None:
+            self.history = {'w': [0] * 4096, 'b': [0] * 4096}
+        else:
+            rng = random.Random(seed)
+            self.history = {side: [rng.randrange(64) for _ in range(4096)] for side in 'wb'}
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.cutoff_index_total = 0
+
+    def new_search(self):
+        # killers belong to the previous tree; history is aged rather than dropped
+        for killers in self.killers:
+            killers[0] = killers[1] = None
+        for table in self.history.values():
+            for index in range(4096):
+                table[index] >>= 1
+        self.reset_stats()
+
+    def score_move(self, board, move, hash_move, ply, turn):
+        start, end, move_type, promotion = move
+        if hash_move and pack_move(move) == hash_move:
+            return HASH_MOVE_SCORE
+        start_index = start[1] * 8 + start[0]
+        end_index = end[1] * 8 + end[0]
+        victim = board[end_index]
+        if victim != '.' or move_type == "CAPTURE":
+            if not self.use_mvv_lva and ply is not None:
+                return CAPTURE_SCORE
+            victim_rank = PIECE_RANKS[victim.lower()] if victim != '.' else 1  # en passant takes a pawn
+            return CAPTURE_SCORE + 10 * victim_rank - PIECE_RANKS[board[start_index].lower()]
+        if promotion == 'q':
+            return PROMOTION_SCORE
+        if ply is not None and self.use_killers:
+            killers = self.killers[ply]
+            if move == killers[0]:
+                return KILLER_SCORES[0]
+            if move == killers[1]:
+                return KILLER_SCORES[1]
+        if self.use_history:
+            return self.history[turn][start_index * 64 + end_index]
+        return 0
+
+    def order(self, position, moves, hash_move=0, ply=None):
+        # ply is None in quiescence, where killers do not apply
+        board = position.board
+        turn = position.turn
+        moves.sort(key=lambda move: self.score_move(board, move, hash_move, ply, turn), reverse=True)
+        return moves
+
+    def staged(self, position, hash_move=0, ply=None, quiets=True):
+        # moves stage by stage from staged_moves, each stage sorted like order(); a cutoff on
+        # the hash move or a capture leaves the quiet moves unchecked
+        for _, moves in move_stages(position, hash_move, quiets):
+            if len(moves) > 1:
+                self.order(position, moves, 0, ply)
+            yield from moves
+
+    def record_cutoff(self, position, move, index, depth, ply, quiet):
+        self.cutoffs += 1
+        self.cutoff_index_total += index
+        if index == 0:
+            self.first_move_cutoffs += 1
+        if not quiet:
+            return
+        if self.use_killers:
+            killers = self.killers[ply]
+            if killers[0] != move:
+                killers[1] = killers[0]
+                killers[0] = move
+        if self.use_history:
+            start, end = move[0], move[1]
+            table = self.history[position.turn]
+            index = (start[1] * 8 + start[0]) * 64 + end[1] * 8 + end[0]
+            table[index] += depth * depth
+            if table[index] >= HISTORY_LIMIT:
+                for other in self.history.values():
+                    for i in range(4096):
+                        other[i] >>= 1
+
+    @property
+    def first_move_cutoff_rate(self):
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
+
+    @property
+    def average_cutoff_index(self):
+        return self.cutoff_index_total / self.cutoffs if self.cutoffs else 0.0
+
+    def stats(self):
+        return {
+            "cutoffs": self.cutoffs,
+            "first_move_cutoff_rate": self.first_move_cutoff_rate,
+            "average_cutoff_index": self.average_cutoff_index,
+        }
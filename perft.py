@@ -0,0 +1,264 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from position import Position, START_FEN, move_to_uci
+from transposition import TranspositionTable
+
+# (name, fen, {depth: expected nodes}) - counts from the chessprogramming.org perft tables
+# and Martin Sedlak's en passant / castling / promotion stress set; the stress set's depth
+# 1-3 counts were added from python-chess so a shallow --suite run covers those positions
+REFERENCE_POSITIONS = [
+    ("startpos", START_FEN,
+     {1: 20, 2: 400, 3: 8902, 4: 197281, 5: 4865609}),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+     {1: 48, 2: 2039, 3: 97862, 4: 4085603}),
+    ("position3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+     {1: 14, 2: 191, 3: 2812, 4: 43238, 5: 674624}),
+    ("position4", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+     {1: 6, 2: 264, 3: 9467, 4: 422333}),
+    ("position4_mirrored", "r2q1rk1/pP1p2pp/Q4n2/bbp1p3/Np6/1B3NBn/pPPP1PPP/R3K2R b KQ - 0 1",
+     {1: 6, 2: 264, 3: 9467, 4: 422333}),
+    ("position5", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+     {1: 44, 2: 1486, 3: 62379, 4: 2103487}),
+    ("position6", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+     {1: 46, 2: 2079, 3: 89890, 4: 3894594}),
+    ("illegal_ep_move_1", "3k4/3p4/8/K1P4r/8/8/8/8 b - - 0 1", {1: 18, 2: 92, 3: 1670, 6: 1134888}),
+    ("illegal_ep_move_2", "8/8/4k3/8/2p5/8/B2P2K1/8 w - - 0 1", {1: 13, 2: 102, 3: 1266, 6: 1015133}),
+    ("ep_capture_checks_opponent", "8/8/1k6/2b5/2pP4/8/5K2/8 b - d3 0 1", {1: 15, 2: 126, 3: 1928, 6: 1440467}),
+    ("short_castling_gives_check", "5k2/8/8/8/8/8/8/4K2R w K - 0 1", {1: 15, 2: 66, 3: 1198, 6: 661072}),
+    ("long_castling_gives_check", "3k4/8/8/8/8/8/8/R3K3 w Q - 0 1", {1: 16, 2: 71, 3: 1286, 6: 803711}),
+    ("castle_rights", "r3k2r/1b4bq/8/8/8/8/7B/R3K2R w KQkq - 0 1", {1: 26, 2: 1141, 3: 27826, 4: 1274206}),
+    ("castling_prevented", "r3k2r/8/3Q4/8/8/5q2/8/R3K2R b KQkq - 0 1", {1: 44, 2: 1494, 3: 50509, 4: 1720476}),
+    ("promote_out_of_check", "2K2r2/4P3/8/8/8/8/8/3k4 w - - 0 1", {1: 11, 2: 133, 3: 1442, 6: 3821001}),
+    ("discovered_check", "8/8/1P2K3/8/2n5/1q6/8/5k2 b - - 0 1", {1: 29, 2: 165, 3: 5160, 5: 1004658}),
+    ("promote_to_give_check", "4k3/1P6/8/8/8/8/K7/8 w - - 0 1", {1: 9, 2: 40, 3: 472, 6: 217342}),
+    ("under_promote_to_give_check", "8/P1k5/K7/8/8/8/8/8 w - - 0 1", {1: 6, 2: 27, 3: 273, 6: 92683}),
+    ("self_stalemate", "K1k5/8/P7/8/8/8/8/8 w - - 0 1", {1: 2, 2: 6, 3: 13, 6: 2217}),
+    ("stalemate_and_checkmate_1", "8/k1P5/8/1K6/8/8/8/8 w - - 0 1", {1: 10, 2: 25, 3: 268, 7: 567584}),
+    ("stalemate_and_checkmate_2", "8/8/2k5/5q2/5n2/8/5K2/8 b - - 0 1", {1: 37, 2: 183, 3: 6559, 4: 23527}),
+]
+
+
+def perft_key(position, depth):
+    # the same position is stored once per remaining depth
+    return position.hash ^ ((depth * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF)
+
+
+def perft_from(position, depth, table=None):
+    if depth == 0:
+        return 1
+    if table is not None:
+        entry = table.probe(perft_key(position, depth))
+        if entry is not None:
+            return entry[0]
+    moves = position.legal_moves()
+    if depth == 1:
+        nodes = len(moves)
+    else:
+        nodes = 0
+        for move in moves:
+            undo = position.make_move(move)
+            nodes += perft_from(position, depth - 1, table)
+            position.unmake_move(undo)
+    if table is not None:
+        table.store(perft_key(position, depth), nodes, depth)
+    return nodes
+
+
+def perft(fen, depth, table=None, workers=1):
+    if workers > 1 and depth > 0:
+        return sum(divide(fen, depth, table, workers).values())
+    return perft_from(Position.from_fen(fen), depth, table)
+
+
+def divide(fen, depth, table=None, workers=1):
+    # node count below each root move, keyed by UCI string. With workers > 1 the subtrees
+    # are counted in a process pool, each worker with its own table the size of table.
+    if workers > 1:
+        hash_mb = table.memory_bytes / (1024 * 1024) if table is not None else 0
+        with worker_pool(workers, hash_mb) as executor:
+            return parallel_divide(fen, depth, executor)[0]
+    position = Position.from_fen(fen)
+    counts = {}
+    for move in position.legal_moves():
+        undo = position.make_move(move)
+        counts[move_to_uci(move)] = perft_from(position, depth - 1, table)
+        position.unmake_move(undo)
+    return counts
+
+
+_worker_table = None
+
+
+def _init_worker(hash_mb):
+    global _worker_table
+    _worker_table = TranspositionTable(hash_mb) if hash_mb else None
+
+
+def _count_subtree(task):
+    fen, depth = task
+    started = time.perf_counter()
+    nodes = perft_from(Position.from_fen(fen), depth, _worker_table)
+    return nodes, os.getpid(), time.perf_counter() - started
+
+
+def worker_pool(workers, hash_mb=0):
+    # hash_mb: size of the subtree cache each worker keeps across its tasks (0 for none)
+    return ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(hash_mb,))
+
+
+def split_tasks(fen, depth, split_plies=2):
+    # (root move, fen, remaining depth) for every node split_plies below the root; splitting
+    # two plies deep gives a few hundred similar-sized tasks instead of ~30 uneven ones
+    split_plies = max(1, min(split_plies, depth))
+    position = Position.from_fen(fen)
+    roots = []
+    tasks = []
+    for move in position.legal_moves():
+        uci = move_to_uci(move)
+        roots.append(uci)
+        undo = position.make_move(move)
+        if split_plies == 1:
+            tasks.append((uci, position.fen(), depth - 1))
+        else:
+            for reply in position.legal_moves():
+                reply_undo = position.make_move(reply)
+                tasks.append((uci, position.fen(), depth - 2))
+                position.unmake_move(reply_undo)
+        position.unmake_move(undo)
+    return roots, tasks
+
+
+def parallel_divide(fen, depth, executor, split_plies=2):
+    # the same counts as divide(), plus {pid: [nodes, tasks, busy seconds]} per worker.
+    # Results come back in task order, so the merge does not depend on scheduling.
+    roots, tasks = split_tasks(fen, depth, split_plies)
+    counts = dict.fromkeys(roots, 0)
+    workers = {}
+    results = executor.map(_count_subtree, [(task_fen, task_depth) for _, task_fen, task_depth in tasks])
+    for (uci, _, _), (nodes, pid, busy) in zip(tasks, results):
+        counts[uci] += nodes
+        stats = workers.setdefault(pid, [0, 0, 0.0])
+        stats[0] += nodes
+        stats[1] += 1
+        stats[2] += busy
+    return counts, workers
+
+
+def timed_divide(fen, depth, table=None, executor=None, split_plies=2):
+    # executor: a worker_pool to count the subtrees in, instead of this process
+    started = time.perf_counter()
+    workers = {}
+    if depth <= 0:
+        counts = {}
+    elif executor is not None:
+        counts, workers = parallel_divide(fen, depth, executor, split_plies)
+    else:
+        counts = divide(fen, depth, table)
+    elapsed = time.perf_counter() - started
+    nodes = sum(counts.values()) if depth > 0 else 1
+    return counts, nodes, elapsed, workers
+
+
+def format_rate(nodes, elapsed):
+    return f"{nodes / elapsed:,.0f}" if elapsed > 0 else "inf"
+
+
+def print_table_stats(table):
+    stats = table.stats()
+    print(f"Hash: {stats['memory_bytes'] / (1024 * 1024):.1f} MB, {stats['probes']} probes, "
+          f"{stats['hits']} hits ({stats['hit_rate']:.1%}), {stats['stores']} stores, "
+          f"{stats['overwrites']} overwrites, {stats['hashfull']} permille full")
+
+
+def print_worker_stats(workers):
+    for number, pid in enumerate(sorted(workers), 1):
+        nodes, tasks, busy = workers[pid]
+        print(f"Worker {number} (pid {pid}): {nodes} nodes, {tasks} tasks, {busy:.3f}s busy, "
+              f"{format_rate(nodes, busy)} nps")
+
+
+def run_divide(fen, depth, table=None, executor=None, split_plies=2, compare_serial=False):
+    counts, nodes, elapsed, workers = timed_divide(fen, depth, table, executor, split_plies)
+    for uci in sorted(counts):
+        print(f"{uci}: {counts[uci]}")
+    print()
+    print(f"Nodes: {nodes}")
+    print(f"Time: {elapsed:.3f}s")
+    print(f"NPS: {format_rate(nodes, elapsed)}")
+    if table is not None and executor is None:
+        print_table_stats(table)
+    if workers:
+        print_worker_stats(workers)
+    if compare_serial:
+        serial_table = TranspositionTable(table.memory_bytes / (1024 * 1024)) if table is not None else None
+        serial_counts, _, serial_elapsed, _ = timed_divide(fen, depth, serial_table)
+        match = "identical" if serial_counts == counts else "DIFFERENT"
+        print(f"Serial: {serial_elapsed:.3f}s, speedup {serial_elapsed / elapsed:.2f}x, counts {match}")
+    return nodes
+
+
+def run_suite(max_depth, min_nps=0, names=None, table=None, executor=None, split_plies=2):
+    # returns the number of failures; wrong node counts and slow runs both count
+    failures = 0
+    total_nodes = 0
+    total_time = 0.0
+    for name, fen, expected in REFERENCE_POSITIONS:
+        if names and name not in names:
+            continue
+        for depth in sorted(expected):
+            if depth > max_depth:
+                continue
+            _, nodes, elapsed, _ = timed_divide(fen, depth, table, executor, split_plies)
+            total_nodes += nodes
+            total_time += elapsed
+            status = "ok" if nodes == expected[depth] else "FAIL"
+            if status == "FAIL":
+                failures += 1
+            print(f"{status:4} {name} depth {depth}: {nodes} (expected {expected[depth]}) "
+                  f"{elapsed:.3f}s {format_rate(nodes, elapsed)} nps")
+
+    nps = total_nodes / total_time if total_time > 0 else 0
+    print(f"\nTotal: {total_nodes} nodes in {total_time:.3f}s, {format_rate(total_nodes, total_time)} nps")
+    if table is not None and executor is None:
+        print_table_stats(table)
+    if min_nps and total_nodes and nps < min_nps:
+        print(f"FAIL throughput {nps:,.0f} nps is below the required {min_nps:,.0f} nps")
+        failures += 1
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Count leaf nodes of the legal move tree.",
+        epilog="Set CHESS_MOVEGEN_BACKEND=bitboard to measure the bitboard backend.")
+    parser.add_argument("fen", nargs="?", default=START_FEN, help="position to search (default: start position)")
+    parser.add_argument("-d", "--depth", type=int, default=3)
+    parser.add_argument("--suite", action="store_true", help="run the reference positions up to --depth")
+    parser.add_argument("--position", action="append", help="restrict --suite to the named reference positions")
+    parser.add_argument("--min-nps", type=float, default=0, help="fail the suite below this many nodes per second")
+    parser.add_argument("--hash", type=float, default=0, metavar="MB",
+                        help="cache subtree counts in a transposition table of this size (per worker)")
+    parser.add_argument("-j", "--workers", type=int, default=1, help="count subtrees in this many processes")
+    parser.add_argument("--split", type=int, choices=(1, 2), default=2,
+                        help="plies below the root at which the tree is split into worker tasks")
+    parser.add_argument("--speedup", action="store_true",
+                        help="also run the divide serially and report the speedup of --workers")
+    args = parser.parse_args(argv)
+
+    table = TranspositionTable(args.hash) if args.hash else None
+    executor = worker_pool(args.workers, args.hash) if args.workers > 1 else None
+    try:
+        if args.suite:
+            return 1 if run_suite(args.depth, args.min_nps, args.position, table, executor, args.split) else 0
+        run_divide(args.fen, args.depth, table, executor, args.split, args.speedup)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
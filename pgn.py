@@ -0,0 +1,278 @@
+import argparse
+import random
+import re
+import sys
+import time
+from move_generator import analyze_king_safety, generate_piece_pseudo_legal_moves, index_square, is_move_legal
+from position import Position, START_FEN, classify_move
+
+# Streaming PGN reading. Games are read line by line and handed out one at a time as
+# (tags, mainline SAN moves), so an archive of any size is replayed in constant memory.
+# Comments ({...} across lines and ; to the end of the line), variations, NAGs, move
+# numbers and results are dropped; only the mainline is kept.
+
+TAG_RE = re.compile(r'\[\s*(\w+)\s+"((?:[^"\\]|\\.)*)"\s*\]')
+TOKEN_RE = re.compile(r'\{[^}]*\}|;[^\n]*|\$\d+|[()]|[^\s(){};$]+')
+MOVE_NUMBER_RE = re.compile(r'^\d+\.*$')
+SAN_RE = re.compile(r'^([NBRQK])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([NBRQ]))?$')
+RESULTS = ("1-0", "0-1", "1/2-1/2", "*")
+ANNOTATION_CHARS = "!?"
+
+
+def comment_open(line, in_comment):
+    # whether a {...} comment is still open at the end of line
+    index = 0
+    while True:
+        if in_comment:
+            index = line.find('}', index)
+            if index < 0:
+                return True
+            in_comment = False
+        else:
+            brace = line.find('{', index)
+            semicolon = line.find(';', index)
+            if brace < 0 or 0 <= semicolon < brace:
+                return False
+            in_comment = True
+            index = brace
+        index += 1
+
+
+def read_games(lines):
+    # (tags, SAN moves) per game from an iterable of lines; a tag line after movetext
+    # starts the next game unless it sits inside a comment
+    tags = {}
+    movetext = []
+    in_comment = False
+    for line in lines:
+        if not in_comment:
+            if line.startswith('%'):
+                continue
+            stripped = line.strip()
+            if stripped.startswith('['):
+                if movetext:
+                    yield tags, parse_movetext(''.join(movetext))
+                    tags = {}
+                    movetext = []
+                match = TAG_RE.match(stripped)
+                if match:
+                    tags[match.group(1)] = match.group(2).replace('\\"', '"').replace('\\\\', '\\')
+                continue
+            if not stripped:
+                continue
+        movetext.append(line if line.endswith('\n') else line + '\n')
+        in_comment = comment_open(line, in_comment)
+    if movetext or tags:
+        yield tags, parse_movetext(''.join(movetext))
+
+
+def parse_movetext(text):
+    moves = []
+    depth = 0
+    for token in TOKEN_RE.findall(text):
+        if token == '(':
+            depth += 1
+        elif token == ')':
+            depth = max(0, depth - 1)
+        elif (depth or token[0] in '{;$' or token in RESULTS or MOVE_NUMBER_RE.match(token)
+              or not token.strip(ANNOTATION_CHARS)):
+            continue
+        else:
+            # "12.e4" and "12...e5" also occur without a space
+            moves.append(token.split('.')[-1])
+    return [move for move in moves if move]
+
+
+def square_name(square):
+    return chr(square[0] + 97) + str(8 - square[1])
+
+
+def parse_san(position, san):
+    # the legal (start, end, move_type, promotion) move san names; ValueError otherwise.
+    # Only the pieces that could have made the move are generated, as generate_piece_moves does.
+    text = san.rstrip('+#!?')
+    board = position.board
+    turn = position.turn
+    en_passant = position.en_passant
+    castling = position.castling
+    king_safety = analyze_king_safety(board, turn)
+
+    if text in ("O-O", "0-0", "O-O-O", "0-0-0"):
+        start = index_square(board.find('K' if turn == 'w' else 'k'))
+        end = (6 if len(text) == 3 else 2, start[1])
+        for move_end, move_type in generate_piece_pseudo_legal_moves(board, turn, start, en_passant, castling):
+            if (move_end == end and move_type == "CASTLE"
+                    and is_move_legal(board, turn, start, end, move_type, en_passant, king_safety)):
+                return start, end, move_type, None
+        raise ValueError(f"illegal castling {san!r} in {position.fen()}")
+
+    match = SAN_RE.match(text)
+    if not match:
+        raise ValueError(f"unreadable SAN move {san!r}")
+    piece, from_file, from_rank, target, promotion = match.groups()
+    piece = piece or 'P'
+    if turn == 'b':
+        piece = piece.lower()
+    end = (ord(target[0]) - 97, 8 - int(target[1]))
+    promotion = promotion.lower() if promotion else None
+    from_x = ord(from_file) - 97 if from_file else None
+    from_y = 8 - int(from_rank) if from_rank else None
+
+    found = None
+    index = board.find(piece)
+    while index >= 0:
+        start = index_square(index)
+        index = board.find(piece, index + 1)
+        if (from_x is not None and start[0] != from_x) or (from_y is not None and start[1] != from_y):
+            continue
+        for move_end, move_type in generate_piece_pseudo_legal_moves(board, turn, start, en_passant, castling):
+            if (move_end != end or (move_type == "PROMOTION") != (promotion is not None)
+                    or not is_move_legal(board, turn, start, end, move_type, en_passant, king_safety)):
+                continue
+            if found is not None:
+                raise ValueError(f"ambiguous SAN move {san!r} in {position.fen()}")
+            found = (start, end, move_type, promotion)
+    if found is None:
+        raise ValueError(f"illegal SAN move {san!r} in {position.fen()}")
+    return found
+
+
+def move_to_san(position, move):
+    start, end, move_type, promotion = move
+    board = position.board
+    if move_type == "CASTLE":
+        san = "O-O" if end[0] == 6 else "O-O-O"
+    else:
+        piece = board[start[1] * 8 + start[0]]
+        capture = move_type == "CAPTURE" or board[end[1] * 8 + end[0]] != '.'
+        if piece in 'Pp':
+            san = (chr(start[0] + 97) + 'x' if capture else '') + square_name(end)
+            if promotion:
+                san += '=' + promotion.upper()
+        else:
+            rivals = [other[0] for other in position.legal_moves()
+                      if other[1] == end and other[0] != start and board[other[0][1] * 8 + other[0][0]] == piece]
+            prefix = ''
+            if rivals:
+                if all(rival[0] != start[0] for rival in rivals):
+                    prefix = chr(start[0] + 97)
+                elif all(rival[1] != start[1] for rival in rivals):
+                    prefix = str(8 - start[1])
+                else:
+                    prefix = square_name(start)
+            san = piece.upper() + prefix + ('x' if capture else '') + square_name(end)
+    label = classify_move(position, move)
+    if label == "CHECKMATE":
+        san += '#'
+    elif label == "CHECK":
+        san += '+'
+    return san
+
+
+def positions(games, errors=None):
+    # (tags, ply, position, move) for every position of every game, move being the one
+    # played from it (None after the last). The same Position is updated in place, so
+    # copy() it to keep one. A game stops at its first bad move, which goes to errors
+    # as (game number, ply, message) when a list is given.
+    for number, (tags, sans) in enumerate(games, 1):
+        try:
+            position = Position.from_fen(tags.get("FEN", START_FEN))
+        except ValueError as error:
+            if errors is not None:
+                errors.append((number, 0, str(error)))
+            continue
+        for ply, san in enumerate(sans):
+            try:
+                move = parse_san(position, san)
+            except ValueError as error:
+                if errors is not None:
+                    errors.append((number, ply, str(error)))
+                yield tags, ply, position, None
+                break
+            yield tags, ply, position, move
+            position.make_move(move)
+        else:
+            yield tags, len(sans), position, None
+
+
+def random_games(count, max_plies=120, seed=1):
+    # (tags, SAN moves) of random legal games, to benchmark with when no archive is at hand
+    rng = random.Random(seed)
+    for number in range(1, count + 1):
+        position = Position.from_fen(START_FEN)
+        sans = []
+        for _ in range(rng.randint(max_plies // 2, max_plies)):
+            moves = position.legal_moves()
+            if not moves:
+                break
+            move = rng.choice(moves)
+            sans.append(move_to_san(position, move))
+            position.make_move(move)
+        yield {"Event": "Random game", "Round": str(number), "White": "random", "Black": "random",
+               "Result": "*"}, sans
+
+
+def write_game(output, tags, sans, width=80):
+    for name, value in tags.items():
+        value = value.replace('\\', '\\\\').replace('"', '\\"')
+        output.write(f'[{name} "{value}"]\n')
+    output.write('\n')
+    line = ''
+    for ply, san in enumerate(sans):
+        token = f"{ply // 2 + 1}. {san}" if ply % 2 == 0 else san
+        if line and len(line) + len(token) + 1 > width:
+            output.write(line + '\n')
+            line = ''
+        line = f"{line} {token}" if line else token
+    result = tags.get("Result", "*")
+    output.write((f"{line} {result}" if line else result) + '\n\n')
+
+
+def run_bench(path):
+    # parsing alone, then parsing with every SAN move resolved and played
+    started = time.perf_counter()
+    games = plies = 0
+    with open(path, errors="replace") as pgn_file:
+        for _, sans in read_games(pgn_file):
+            games += 1
+            plies += len(sans)
+    parse_time = time.perf_counter() - started
+    print(f"parse: {games} games, {plies} plies in {parse_time:.2f}s, "
+          f"{games / parse_time:,.0f} games/s, {plies / parse_time:,.0f} plies/s")
+
+    errors = []
+    started = time.perf_counter()
+    games = plies = 0
+    with open(path, errors="replace") as pgn_file:
+        for _, ply, _, move in positions(read_games(pgn_file), errors):
+            if ply == 0:
+                games += 1
+            if move is not None:
+                plies += 1
+    replay_time = time.perf_counter() - started
+    print(f"replay: {games} games, {plies} plies in {replay_time:.2f}s, "
+          f"{games / replay_time:,.0f} games/s, {plies / replay_time:,.0f} plies/s")
+    for number, ply, message in errors[:10]:
+        print(f"game {number} ply {ply}: {message}")
+    if errors:
+        print(f"{len(errors)} games stopped at a bad move")
+    return 1 if errors else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a PGN file through the move generator and report throughput.")
+    parser.add_argument("pgn", help="PGN file to read")
+    parser.add_argument("--write-random", type=int, metavar="GAMES",
+                        help="first write this many random legal games to the file")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    if args.write_random:
+        with open(args.pgn, "w") as output:
+            for tags, sans in random_games(args.write_random, seed=args.seed):
+                write_game(output, tags, sans)
+    return run_bench(args.pgn)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,406 @@
+import argparse
+import random
+import sys
+import time
+from functools import lru_cache
+from itertools import combinations
+from move_generator import generate_legal_moves, generate_legal_move_codes, has_legal_move, is_square_attacked, index_square, PROMOTION_PIECES
+from zobrist import PIECE_KEYS, SIDE_KEY, EN_PASSANT_KEYS, castling_hash, compute_hash
+from evaluation import MG, EG, PHASE, accumulate
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+CASTLE_ROOK_MOVES = {
+    62: (63, 61),  # White king-side
+    58: (56, 59),  # White queen-side
+    6: (7, 5),     # Black king-side
+    2: (0, 3),     # Black queen-side
+}
+
+# castling rights lost when a piece leaves or is captured on these board indices
+CASTLING_RIGHTS_SQUARES = {
+    60: 'KQ', 63: 'K', 56: 'Q',
+    4: 'kq', 7: 'k', 0: 'q',
+}
+
+# king and rook squares each castling right needs
+CASTLING_RIGHTS_PIECES = {
+    'K': ((60, 'K'), (63, 'R')), 'Q': ((60, 'K'), (56, 'R')),
+    'k': ((4, 'k'), (7, 'r')), 'q': ((4, 'k'), (0, 'r')),
+}
+VALID_CASTLING = {'-'} | {''.join(rights) for count in range(1, 5) for rights in combinations("KQkq", count)}
+
+FEN_PIECES = frozenset("PNBRQKpnbrqk")
+FEN_DIGITS = {str(count): count for count in range(1, 9)}
+
+# Position.squares holds the ASCII code of each piece letter ('.' for empty); these are the
+# per-piece tables make_move needs, indexed by that code instead of the letter
+EMPTY = ord('.')
+WHITE_PAWN = ord('P')
+BLACK_PAWN = ord('p')
+BYTE_PIECE_KEYS = [None] * 128
+BYTE_MG = [None] * 128
+BYTE_EG = [None] * 128
+BYTE_PHASE = [0] * 128
+for _piece in FEN_PIECES:
+    BYTE_PIECE_KEYS[ord(_piece)] = PIECE_KEYS[_piece]
+    BYTE_MG[ord(_piece)] = MG[_piece]
+    BYTE_EG[ord(_piece)] = EG[_piece]
+    BYTE_PHASE[ord(_piece)] = PHASE[_piece]
+
+
+def move_to_uci(move):
+    start, end, _, promotion = move
+    uci = chr(start[0] + 97) + str(8 - start[1]) + chr(end[0] + 97) + str(8 - end[1])
+    return uci + promotion if promotion else uci
+
+
+def classify_move(position, move):
+    # "CHECKMATE" or "CHECK" when the move gives one, otherwise the move's own type.
+    # Only callers that display the label pay for it, and repeated queries are cached.
+    return _classify_move(position.board, position.turn, position.castling, position.en_passant, move)
+
+
+def parse_fen(fen):
+    # (squares, turn, castling, en_passant, halfmove, fullmove) in one pass over the piece
+    # placement; raises ValueError for anything that is not a legal-looking position.
+    # The move counters may be left off, as in EPD.
+    parts = fen.split()
+    if len(parts) not in (4, 6):
+        raise ValueError(f"FEN needs 4 or 6 fields, got {len(parts)}: {fen!r}")
+    placement, turn, castling, en_passant = parts[:4]
+
+    squares = bytearray(b'.' * 64)
+    index = 0
+    rank_end = 8
+    previous_digit = False
+    for c in placement:
+        if c in FEN_PIECES:
+            if index >= rank_end:
+                raise ValueError(f"rank {9 - rank_end // 8} has more than 8 squares in {placement!r}")
+            squares[index] = ord(c)
+            index += 1
+            previous_digit = False
+        elif c in FEN_DIGITS:
+            if previous_digit:
+                raise ValueError(f"consecutive digits in {placement!r}")
+            index += FEN_DIGITS[c]
+            if index > rank_end:
+                raise ValueError(f"rank {9 - rank_end // 8} has more than 8 squares in {placement!r}")
+            previous_digit = True
+        elif c == '/':
+            if rank_end == 64:
+                raise ValueError(f"more than 8 ranks in {placement!r}")
+            if index != rank_end:
+                raise ValueError(f"rank {9 - rank_end // 8} does not have 8 squares in {placement!r}")
+            rank_end += 8
+            previous_digit = False
+        else:
+            raise ValueError(f"unexpected {c!r} in piece placement {placement!r}")
+    if index != 64 or rank_end != 64:
+        raise ValueError(f"piece placement {placement!r} does not describe 8 ranks")
+    if squares.count(b'K') != 1 or squares.count(b'k') != 1:
+        raise ValueError(f"each side needs exactly one king in {placement!r}")
+    if b'P' in squares[:8] or b'p' in squares[:8] or b'P' in squares[56:] or b'p' in squares[56:]:
+        raise ValueError(f"pawn on the first or last rank in {placement!r}")
+
+    if turn != 'w' and turn != 'b':
+        raise ValueError(f"side to move must be 'w' or 'b', got {turn!r}")
+    if castling not in VALID_CASTLING:
+        raise ValueError(f"castling rights must be '-' or a subset of 'KQkq' in that order, got {castling!r}")
+    if castling != '-':
+        for right in castling:
+            for square, piece in CASTLING_RIGHTS_PIECES[right]:
+                if squares[square] != ord(piece):
+                    raise ValueError(f"castling right {right!r} without its king and rook in place")
+
+    if en_passant == '-':
+        en_passant = ()
+    else:
+        if (len(en_passant) != 2 or en_passant[0] not in "abcdefgh"
+                or en_passant[1] != ('6' if turn == 'w' else '3')):
+            raise ValueError(f"invalid en passant square {en_passant!r} with {turn!r} to move")
+        x = ord(en_passant[0]) - 97
+        y = 8 - int(en_passant[1])
+        pawn = (y + 1) * 8 + x if turn == 'w' else (y - 1) * 8 + x
+        if squares[pawn] != (BLACK_PAWN if turn == 'w' else WHITE_PAWN):
+            raise ValueError(f"en passant square {parts[3]!r} without the pawn that just moved")
+        en_passant = (x, y)
+
+    halfmove, fullmove = 0, 1
+    if len(parts) == 6:
+        if not parts[4].isdigit() or not parts[5].isdigit() or int(parts[5]) < 1:
+            raise ValueError(f"invalid move counters {parts[4]!r} {parts[5]!r}")
+        halfmove, fullmove = int(parts[4]), int(parts[5])
+    return squares, turn, castling, en_passant, halfmove, fullmove
+
+
+@lru_cache(maxsize=4096)
+def _classify_move(board, turn, castling, en_passant, move):
+    position = Position(board, turn, castling, en_passant, 0, 1)
+    position.make_move(move)
+    king = 'K' if position.turn == 'w' else 'k'
+    if king not in position.board or not is_square_attacked(position.board, index_square(position.board.index(king)), turn):
+        return move[2]
+    if has_legal_move(position.board, position.turn, position.en_passant, position.castling):
+        return "CHECK"
+    return "CHECKMATE"
+
+
+class Position:
+    # A mutable game state. Moves are (start, end, move_type, promotion) with squares in
+    # (x, y) form; promotion is one of PROMOTION_PIECES for promotions and None otherwise.
+    # make_move changes the position in place and returns the record unmake_move needs.
+    # hash is the Zobrist key of the position, kept up to date by make_move, as are the
+    # evaluation accumulators mg, eg and phase (see evaluation.py).
+    # The board is a 64-byte bytearray of piece letters (squares); board is a string view
+    # of it for the move generator, and fen() is cached. Both caches are dropped by
+    # make_move and put back by unmake_move, so change positions only through those two.
+
+    __slots__ = ("squares", "turn", "castling", "en_passant", "halfmove", "fullmove", "hash", "mg", "eg", "phase",
+                 "_board", "_fen")
+
+    def __init__(self, board, turn, castling, en_passant, halfmove, fullmove):
+        # board: 64 piece letters with '.' for empty squares, as a string, list or bytes
+        if isinstance(board, (bytes, bytearray)):
+            self.squares = bytearray(board)
+        else:
+            self.squares = bytearray(''.join(board), 'ascii')
+        self._board = self.squares.decode('ascii')
+        self._fen = None
+        self.turn = turn
+        self.castling = castling
+        self.en_passant = en_passant
+        self.halfmove = halfmove
+        self.fullmove = fullmove
+        self.hash = compute_hash(self._board, turn, castling, en_passant)
+        self.mg, self.eg, self.phase = accumulate(self._board)
+
+    @classmethod
+    def from_fen(cls, fen=START_FEN):
+        return cls(*parse_fen(fen))
+
+    def copy(self):
+        position = Position.__new__(Position)
+        for name in Position.__slots__:
+            setattr(position, name, getattr(self, name))
+        position.squares = bytearray(self.squares)
+        return position
+
+    @property
+    def board(self):
+        board = self._board
+        if board is None:
+            board = self._board = self.squares.decode('ascii')
+        return board
+
+    def fen(self):
+        fen = self._fen
+        if fen is None:
+            board = self.board
+            placement = '/'.join([board[start:start + 8] for start in range(0, 64, 8)])
+            for count in range(8, 0, -1):
+                placement = placement.replace('.' * count, str(count))
+            en_passant = chr(self.en_passant[0] + 97) + str(8 - self.en_passant[1]) if self.en_passant else "-"
+            fen = self._fen = f"{placement} {self.turn} {self.castling} {en_passant} {self.halfmove} {self.fullmove}"
+        return fen
+
+    def legal_moves(self):
+        # a "PROMOTION" move from the generator stands for one move per promotion piece
+        moves = []
+        for start, end, move_type in generate_legal_moves(self.board, self.turn, self.en_passant, self.castling):
+            if move_type == "PROMOTION":
+                for promotion in PROMOTION_PIECES:
+                    moves.append((start, end, move_type, promotion))
+            else:
+                moves.append((start, end, move_type, None))
+        return moves
+
+    def legal_move_codes(self, out):
+        # legal moves as 16-bit codes written into out (a move_encoding.new_move_list());
+        # returns the count. move_encoding.to_legacy turns a code into a make_move argument.
+        return generate_legal_move_codes(self.board, self.turn, self.en_passant, self.castling, out)
+
+    def make_move(self, move):
+        start, end, move_type, promotion = move
+        squares = self.squares
+        start_index = start[1] * 8 + start[0]
+        end_index = end[1] * 8 + end[0]
+        piece = squares[start_index]
+        is_pawn = piece == WHITE_PAWN or piece == BLACK_PAWN
+
+        captured_index = end_index
+        if is_pawn and end == self.en_passant and squares[end_index] == EMPTY:
+            captured_index = end_index + (8 if self.turn == 'w' else -8)
+        captured = squares[captured_index]
+        undo = (move, captured, captured_index, self.castling, self.en_passant, self.halfmove, self.fullmove, self.hash,
+                self.mg, self.eg, self.phase, self._board, self._fen)
+        key = self.hash ^ SIDE_KEY ^ BYTE_PIECE_KEYS[piece][start_index]
+        mg = self.mg - BYTE_MG[piece][start_index]
+        eg = self.eg - BYTE_EG[piece][start_index]
+
+        if captured != EMPTY:
+            key ^= BYTE_PIECE_KEYS[captured][captured_index]
+            mg -= BYTE_MG[captured][captured_index]
+            eg -= BYTE_EG[captured][captured_index]
+            self.phase -= BYTE_PHASE[captured]
+            squares[captured_index] = EMPTY
+        squares[start_index] = EMPTY
+        if promotion:
+            piece = ord(promotion.upper() if self.turn == 'w' else promotion)
+            self.phase += BYTE_PHASE[piece]
+        squares[end_index] = piece
+        key ^= BYTE_PIECE_KEYS[piece][end_index]
+        mg += BYTE_MG[piece][end_index]
+        eg += BYTE_EG[piece][end_index]
+
+        if move_type == "CASTLE":
+            rook_start, rook_end = CASTLE_ROOK_MOVES[end_index]
+            rook = squares[rook_start]
+            squares[rook_end] = rook
+            squares[rook_start] = EMPTY
+            key ^= BYTE_PIECE_KEYS[rook][rook_start] ^ BYTE_PIECE_KEYS[rook][rook_end]
+            mg += BYTE_MG[rook][rook_end] - BYTE_MG[rook][rook_start]
+            eg += BYTE_EG[rook][rook_end] - BYTE_EG[rook][rook_start]
+
+        castling = self.castling
+        if start_index in CASTLING_RIGHTS_SQUARES or end_index in CASTLING_RIGHTS_SQUARES:
+            for right in CASTLING_RIGHTS_SQUARES.get(start_index, '') + CASTLING_RIGHTS_SQUARES.get(end_index, ''):
+                castling = castling.replace(right, '')
+            castling = castling or '-'
+            key ^= castling_hash(self.castling) ^ castling_hash(castling)
+            self.castling = castling
+
+        if self.en_passant:
+            key ^= EN_PASSANT_KEYS[self.en_passant[0]]
+        if is_pawn and abs(end[1] - start[1]) == 2:
+            self.en_passant = (end[0], (end[1] + start[1]) // 2)
+            key ^= EN_PASSANT_KEYS[end[0]]
+        else:
+            self.en_passant = ()
+        self.hash = key
+        self.mg = mg
+        self.eg = eg
+        self._board = None
+        self._fen = None
+
+        if is_pawn or captured != EMPTY:
+            self.halfmove = 0
+        else:
+            self.halfmove += 1
+        if self.turn == 'b':
+            self.fullmove += 1
+        self.turn = 'b' if self.turn == 'w' else 'w'
+        return undo
+
+    def unmake_move(self, undo):
+        move, captured, captured_index, castling, en_passant, halfmove, fullmove, key, mg, eg, phase, board, fen = undo
+        start, end, move_type, promotion = move
+        squares = self.squares
+        start_index = start[1] * 8 + start[0]
+        end_index = end[1] * 8 + end[0]
+        self.turn = 'b' if self.turn == 'w' else 'w'
+
+        if promotion:
+            squares[start_index] = WHITE_PAWN if self.turn == 'w' else BLACK_PAWN
+        else:
+            squares[start_index] = squares[end_index]
+        squares[end_index] = EMPTY
+        squares[captured_index] = captured
+
+        if move_type == "CASTLE":
+            rook_start, rook_end = CASTLE_ROOK_MOVES[end_index]
+            squares[rook_start] = squares[rook_end]
+            squares[rook_end] = EMPTY
+
+        self.castling = castling
+        self.en_passant = en_passant
+        self.halfmove = halfmove
+        self.fullmove = fullmove
+        self.hash = key
+        self.mg = mg
+        self.eg = eg
+        self.phase = phase
+        self._board = board
+        self._fen = fen
+
+
+def random_fens(count, plies=60, seed=1):
+    # positions from seeded random games, for benchmarks
+    rng = random.Random(seed)
+    fens = []
+    while len(fens) < count:
+        position = Position.from_fen()
+        for _ in range(rng.randrange(plies)):
+            moves = position.legal_moves()
+            if not moves:
+                break
+            position.make_move(rng.choice(moves))
+        fens.append(position.fen())
+    return fens
+
+
+def run_bench(fens, repeat):
+    def rate(count, elapsed):
+        return f"{count / elapsed:,.0f}/s" if elapsed > 0 else "inf"
+
+    count = len(fens) * repeat
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for fen in fens:
+            parse_fen(fen)
+    print(f"parse_fen:          {rate(count, time.perf_counter() - started)}")
+
+    started = time.perf_counter()
+    for _ in range(repeat):
+        positions = [Position.from_fen(fen) for fen in fens]
+    print(f"Position.from_fen:  {rate(count, time.perf_counter() - started)} (with hash and evaluation)")
+
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for position in positions:
+            position._fen = None
+            position.fen()
+    print(f"fen() uncached:     {rate(count, time.perf_counter() - started)}")
+
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for position in positions:
+            position.fen()
+    print(f"fen() cached:       {rate(count, time.perf_counter() - started)}")
+
+    cycles = 0
+    started = time.perf_counter()
+    for position in positions:
+        for move in position.legal_moves():
+            undo = position.make_move(move)
+            position.fen()
+            position.unmake_move(undo)
+            position.fen()
+            cycles += 1
+    print(f"make/fen/unmake/fen: {rate(cycles, time.perf_counter() - started)} (fen after unmake is restored)")
+
+    mismatches = sum(1 for fen, position in zip(fens, positions) if position.fen() != fen)
+    print(f"{len(fens)} FENs, {repeat} repeats, {mismatches} round-trip mismatches")
+    print(f"memory per position: {sys.getsizeof(positions[0]) + sys.getsizeof(positions[0].squares)} bytes "
+          f"(board as a list of 64 strings: {sys.getsizeof(list(positions[0].board))} bytes)")
+    return mismatches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark FEN parsing and serialization.")
+    parser.add_argument("corpus", nargs="?", help="file with one FEN per line (default: random game positions)")
+    parser.add_argument("--count", type=int, default=5000, help="random positions to generate without a corpus")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    if args.corpus:
+        with open(args.corpus) as corpus:
+            fens = [line.strip() for line in corpus if line.strip()]
+    else:
+        fens = random_fens(args.count)
+    return 1 if run_bench(fens, args.repeat) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+import time
+from collections import deque
+import pygame
+
+# Cached board rendering for the GUI. The empty board and every text surface are drawn
+# once; each frame works out what every square and the FEN panel should show, redraws only
+# what differs from the previous frame and pushes just those rectangles to the display
+# with pygame.display.update(rects). A frame where nothing changed draws nothing.
+
+BOARD_SIZE = 8
+
+LIGHT_SQUARE = (240, 217, 181)
+DARK_SQUARE = (181, 136, 99)
+BLACK = (0, 0, 0)
+HIGHLIGHT_LIGHT = (205, 162, 82)
+HIGHLIGHT_DARK = (163, 114, 41)
+LEGAL_MOVE_DOT = (80, 80, 80)
+ATTACKED_DOT = (200, 0, 0)
+DOT_RADIUS = 10
+
+WHITE = (255, 255, 255)
+FEN_BOX = (40, 40, 40)
+FEN_BORDER = (200, 200, 200)
+BUTTON = (60, 60, 60)
+BUTTON_BORDER = (160, 160, 160)
+TOOLTIP = (200, 200, 200)
+COPIED = (0, 255, 0)
+STATUS = (170, 170, 170)
+
+FRAME_SAMPLES = 120
+TEXT_CACHE_SIZE = 64
+
+
+class BoardRenderer:
+    # Draws frames onto screen; call invalidate() after drawing on the screen directly
+
+    def __init__(self, screen, pieces, origin, square_size, font, small_font):
+        self.screen = screen
+        self.pieces = pieces
+        self.origin = origin
+        self.square_size = square_size
+        self.font = font
+        self.small_font = small_font
+        # light and dark squares fall on the same screen cells either way up, so one
+        # empty board serves both orientations
+        self.empty_board = self._render_empty_board()
+        self.texts = {}
+
+        self.label_pos = (20, 0)
+        self.input_rect = pygame.Rect(20, 30, 900, 30)
+        self.button_rect = pygame.Rect(self.input_rect.right + 10, self.input_rect.y, 80, 30)
+        self.tooltip_pos = (self.button_rect.x, self.button_rect.y - 25)
+        self.copied_pos = (self.button_rect.x, self.button_rect.y + 35)
+        self.status_rect = pygame.Rect(self.input_rect.x, self.input_rect.bottom + 5, self.input_rect.width, 24)
+        self.panel_rect = self.input_rect.union(self.button_rect).union(self.status_rect).union(
+            self.text(font, "FEN:", WHITE).get_rect(topleft=self.label_pos)).union(
+            self.text(small_font, "Copy to clipboard", TOOLTIP).get_rect(topleft=self.tooltip_pos)).union(
+            self.text(small_font, "Copied!", COPIED).get_rect(topleft=self.copied_pos))
+
+        self.drawn = [None] * 64  # what each screen cell showed last frame
+        self.panel = None  # (fen, hovering, copied, status) shown last frame
+        self.board_state = None
+        self.full = True
+        self.frame_times = deque(maxlen=FRAME_SAMPLES)
+        self.dirty_counts = deque(maxlen=FRAME_SAMPLES)
+        self.frames = 0
+        self.full_frames = 0
+
+    def _render_empty_board(self):
+        size = self.square_size
+        surface = pygame.Surface((size * BOARD_SIZE, size * BOARD_SIZE))
+        for y in range(BOARD_SIZE):
+            for x in range(BOARD_SIZE):
+                color = LIGHT_SQUARE if (x + y) % 2 == 0 else DARK_SQUARE
+                surface.fill(color, pygame.Rect(x * size, y * size, size, size))
+        return surface.convert() if pygame.display.get_surface() else surface
+
+    def text(self, font, text, color):
+        key = (id(font), text, color)
+        surface = self.texts.get(key)
+        if surface is None:
+            if len(self.texts) >= TEXT_CACHE_SIZE:
+                self.texts.clear()
+            surface = self.texts[key] = font.render(text, True, color)
+        return surface
+
+    def invalidate(self):
+        # the next frame, or the next draw_board, redraws everything
+        self.full = True
+        self.drawn = [None] * 64
+
+    def cell_rect(self, cell):
+        return pygame.Rect(self.origin[0] + cell % BOARD_SIZE * self.square_size,
+                           self.origin[1] + cell // BOARD_SIZE * self.square_size, self.square_size, self.square_size)
+
+    def draw_board(self, board, flip_board, selected_square, last_move, legal_moves, attacked_squares):
+        # redraws the squares that changed; returns their rectangles
+        state = (board, flip_board, selected_square, last_move, tuple(legal_moves), tuple(attacked_squares))
+        if state == self.board_state and None not in self.drawn:
+            return []
+        self.board_state = state
+        highlighted = {selected_square}
+        if last_move:
+            highlighted.update(last_move[:2])
+        legal = set(legal_moves)
+        attacked = set(attacked_squares)
+
+        rects = []
+        screen = self.screen
+        origin_x, origin_y = self.origin
+        for y in range(BOARD_SIZE):
+            for x in range(BOARD_SIZE):
+                square = (x, y)
+                piece = board[y * 8 + x]
+                cell_state = (piece, square in highlighted, square in legal, square in attacked)
+                cell = (BOARD_SIZE - 1 - y) * 8 + BOARD_SIZE - 1 - x if flip_board else y * 8 + x
+                if self.drawn[cell] == cell_state:
+                    continue
+                self.drawn[cell] = cell_state
+                rect = self.cell_rect(cell)
+                if cell_state[1]:
+                    screen.fill(HIGHLIGHT_LIGHT if (x + y) % 2 == 0 else HIGHLIGHT_DARK, rect)
+                else:
+                    screen.blit(self.empty_board, rect, rect.move(-origin_x, -origin_y))
+                if piece != '.':
+                    screen.blit(self.pieces[piece], rect)
+                if cell_state[2]:
+                    pygame.draw.circle(screen, LEGAL_MOVE_DOT, rect.center, DOT_RADIUS)
+                if cell_state[3]:
+                    pygame.draw.circle(screen, ATTACKED_DOT, rect.center, DOT_RADIUS)
+                rects.append(rect)
+        return rects
+
+    def draw_panel(self, fen, hovering, copied, status=""):
+        screen = self.screen
+        screen.blit(self.text(self.font, "FEN:", WHITE), self.label_pos)
+        pygame.draw.rect(screen, FEN_BOX, self.input_rect)
+        pygame.draw.rect(screen, FEN_BORDER, self.input_rect, 2)
+        screen.blit(self.text(self.small_font, fen, WHITE), (self.input_rect.x + 10, self.input_rect.y + 5))
+        pygame.draw.rect(screen, BUTTON, self.button_rect)
+        pygame.draw.rect(screen, BUTTON_BORDER, self.button_rect, 2)
+        screen.blit(self.text(self.small_font, "Copy", WHITE), (self.button_rect.x + 15, self.button_rect.y + 5))
+        if hovering:
+            screen.blit(self.text(self.small_font, "Copy to clipboard", TOOLTIP), self.tooltip_pos)
+        if copied:
+            screen.blit(self.text(self.small_font, "Copied!", COPIED), self.copied_pos)
+        if status:
+            screen.blit(self.text(self.small_font, status, STATUS), (self.status_rect.x + 10, self.status_rect.y))
+
+    def draw_frame(self, board, flip_board, selected_square, last_move, legal_moves, attacked_squares, fen,
+                   mouse_pos, copied, status=""):
+        # draws and updates what changed since the last frame; returns the copy button's rect.
+        # status: a line under the FEN, such as the background analysis
+        started = time.perf_counter()
+        hovering = self.button_rect.collidepoint(mouse_pos)
+        panel = (fen, hovering, copied, status)
+        rects = []
+        full = self.full
+        if full:
+            self.screen.fill(BLACK)
+            self.drawn = [None] * 64
+            self.panel = None
+            self.full_frames += 1
+        if panel != self.panel:
+            # the panel may overlap the top of the board: clear it and let those squares redraw
+            self.screen.fill(BLACK, self.panel_rect)
+            for cell in range(64):
+                if self.drawn[cell] is not None and self.cell_rect(cell).colliderect(self.panel_rect):
+                    self.drawn[cell] = None
+            rects.append(self.panel_rect)
+
+        board_rects = self.draw_board(board, flip_board, selected_square, last_move, legal_moves, attacked_squares)
+        rects.extend(board_rects)
+        if panel != self.panel or self.panel_rect.collidelist(board_rects) >= 0:
+            self.draw_panel(fen, hovering, copied, status)
+            if self.panel_rect not in rects:
+                rects.append(self.panel_rect)
+        self.panel = panel
+        self.full = False
+
+        if full:
+            pygame.display.flip()
+        elif rects:
+            pygame.display.update(rects)
+        self.frames += 1
+        self.frame_times.append(time.perf_counter() - started)
+        self.dirty_counts.append(len(rects))
+        return self.button_rect
+
+    def frame_stats(self):
+        # (average ms per frame, average dirty rects per frame) over the recent frames
+        if not self.frame_times:
+            return 0.0, 0.0
+        return (sum(self.frame_times) / len(self.frame_times) * 1000,
+                sum(self.dirty_counts) / len(self.dirty_counts))
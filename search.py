@@ -0,0 +1,296 @@
+import argparse
+import sys
+import time
+from collections import namedtuple
+from evaluation import evaluate
+from move_generator import is_square_attacked, index_square
+from move_ordering import MoveOrderer
+from position import Position, START_FEN, move_to_uci
+from transposition import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND, pack_move
+
+MATE_SCORE = 100000
+MATE_THRESHOLD = MATE_SCORE - 1000  # scores beyond this are mates, adjusted by ply in the hash table
+INFINITY = 1000000
+MAX_DEPTH = 64
+MAX_PLY = 128
+ASPIRATION_WINDOW = 50
+ASPIRATION_MIN_DEPTH = 4
+CHECK_INTERVAL = 1024  # nodes between clock checks
+
+SearchResult = namedtuple("SearchResult", "best_move score pv depth nodes time nps")
+
+
+class SearchStopped(Exception):
+    pass
+
+
+def in_check(position):
+    king = 'K' if position.turn == 'w' else 'k'
+    enemy = 'b' if position.turn == 'w' else 'w'
+    return is_square_attacked(position.board, index_square(position.board.index(king)), enemy)
+
+
+def is_capture(position, move):
+    start, end, move_type, promotion = move
+    return move_type == "CAPTURE" or position.board[end[1] * 8 + end[0]] != '.'
+
+
+def score_to_table(score, ply):
+    # mate scores are stored relative to the node, not the root
+    if score >= MATE_THRESHOLD:
+        return score + ply
+    if score <= -MATE_THRESHOLD:
+        return score - ply
+    return score
+
+
+def score_from_table(score, ply):
+    if score >= MATE_THRESHOLD:
+        return score - ply
+    if score <= -MATE_THRESHOLD:
+        return score + ply
+    return score
+
+
+def format_score(score):
+    if score >= MATE_THRESHOLD:
+        return f"mate {(MATE_SCORE - score + 1) // 2}"
+    if score <= -MATE_THRESHOLD:
+        return f"mate -{(MATE_SCORE + score) // 2}"
+    return f"cp {score}"
+
+
+class Searcher:
+    # Negamax alpha-beta with iterative deepening, aspiration windows and a capture-only
+    # quiescence search. The transposition table is kept between searches; move ordering
+    # (hash move, MVV-LVA, killers, history) comes from the MoveOrderer.
+    # stop: an Event another thread or process can set to end the search early
+
+    def __init__(self, table=None, orderer=None, stop=None):
+        self.table = table if table is not None else TranspositionTable(16)
+        self.orderer = orderer if orderer is not None else MoveOrderer()
+        self.stop = stop
+        self.nodes = 0
+        self.deadline = None
+        self.max_nodes = None
+        self.path = []
+        self.pv_table = [[] for _ in range(MAX_PLY + 1)]
+
+    def search(self, position, movetime_ms=None, max_nodes=None, max_depth=None, history=(), info=None,
+               skip_depth=None):
+        # history: hashes of earlier game positions, for repetition detection
+        # info: called with a SearchResult after every completed iteration
+        # skip_depth: called with each iteration's depth below max_depth, true to leave it out, so
+        #             parallel helpers work on other depths than the main thread
+        position = position.copy()
+        self.nodes = 0
+        started = time.perf_counter()
+        self.deadline = started + movetime_ms / 1000 if movetime_ms else None
+        self.max_nodes = max_nodes
+        self.table.new_search()
+        self.orderer.new_search()
+
+        root_moves = position.legal_moves()
+        if not root_moves:
+            score = -MATE_SCORE if in_check(position) else 0
+            return SearchResult(None, score, [], 0, 0, 0.0, 0)
+
+        result = SearchResult(root_moves[0], 0, [root_moves[0]], 0, 0, 0.0, 0)
+        score = 0
+        max_depth = max_depth or MAX_DEPTH
+        for depth in range(1, max_depth + 1):
+            if skip_depth is not None and depth < max_depth and skip_depth(depth):
+                continue
+            self.path = list(history)
+            try:
+                score, pv = self.aspiration_search(position, depth, score)
+            except SearchStopped:
+                break
+            elapsed = time.perf_counter() - started
+            result = SearchResult(pv[0], score, pv, depth, self.nodes, elapsed,
+                                  int(self.nodes / elapsed) if elapsed > 0 else 0)
+            if info:
+                info(result)
+            if abs(score) >= MATE_THRESHOLD or len(root_moves) == 1:
+                break
+
+        elapsed = time.perf_counter() - started
+        return result._replace(nodes=self.nodes, time=elapsed,
+                               nps=int(self.nodes / elapsed) if elapsed > 0 else 0)
+
+    def aspiration_search(self, position, depth, previous_score):
+        if depth < ASPIRATION_MIN_DEPTH:
+            alpha, beta = -INFINITY, INFINITY
+        else:
+            alpha, beta = previous_score - ASPIRATION_WINDOW, previous_score + ASPIRATION_WINDOW
+        delta = ASPIRATION_WINDOW
+        while True:
+            score = self.negamax(position, depth, alpha, beta, 0)
+            if score <= alpha and alpha > -INFINITY:
+                alpha = max(score - delta, -INFINITY)
+            elif score >= beta and beta < INFINITY:
+                beta = min(score + delta, INFINITY)
+            else:
+                return score, self.pv_table[0]
+            delta *= 2
+
+    def count_node(self):
+        self.nodes += 1
+        if self.max_nodes and self.nodes >= self.max_nodes:
+            raise SearchStopped()
+        if not self.nodes % CHECK_INTERVAL:
+            if self.deadline and time.perf_counter() >= self.deadline:
+                raise SearchStopped()
+            if self.stop is not None and self.stop.is_set():
+                raise SearchStopped()
+
+    def negamax(self, position, depth, alpha, beta, ply):
+        self.count_node()
+        self.pv_table[ply] = []
+        if ply and (position.halfmove >= 100 or position.hash in self.path):
+            return 0
+        check = in_check(position)
+        if depth <= 0 or ply >= MAX_PLY:
+            return self.quiescence(position, alpha, beta, ply)
+
+        original_alpha = alpha
+        hash_move = 0
+        entry = self.table.probe(position.hash)
+        if entry is not None:
+            value, entry_depth, flag, hash_move = entry
+            if ply and entry_depth >= depth:
+                value = score_from_table(value, ply)
+                if flag == EXACT:
+                    return value
+                if flag == LOWER_BOUND and value >= beta:
+                    return value
+                if flag == UPPER_BOUND and value <= alpha:
+                    return value
+
+        best_score = -INFINITY
+        best_move = None
+        self.path.append(position.hash)
+        for index, move in enumerate(self.orderer.staged(position, hash_move, ply)):
+            undo = position.make_move(move)
+            score = -self.negamax(position, depth - 1, -beta, -alpha, ply + 1)
+            position.unmake_move(undo)
+            if score > best_score:
+                best_score = score
+                best_move = move
+                if score > alpha:
+                    alpha = score
+                    self.pv_table[ply] = [move] + self.pv_table[ply + 1]
+                    if alpha >= beta:
+                        quiet = not is_capture(position, move) and move[3] != 'q'
+                        self.orderer.record_cutoff(position, move, index, depth, ply, quiet)
+                        break
+        self.path.pop()
+        if best_move is None:
+            return -MATE_SCORE + ply if check else 0
+
+        if best_score <= original_alpha:
+            flag = UPPER_BOUND
+        elif best_score >= beta:
+            flag = LOWER_BOUND
+        else:
+            flag = EXACT
+        self.table.store(position.hash, score_to_table(best_score, ply), depth, flag, pack_move(best_move))
+        return best_score
+
+    def quiescence(self, position, alpha, beta, ply):
+        self.count_node()
+        self.pv_table[ply] = []
+        check = in_check(position) and ply < MAX_PLY
+        if check:
+            # no standing pat in check: every evasion is searched
+            best_score = -INFINITY
+        else:
+            best_score = evaluate(position)
+            if best_score >= beta or ply >= MAX_PLY:
+                return best_score
+            alpha = max(alpha, best_score)
+
+        searched = False
+        for move in self.orderer.staged(position, quiets=check):
+            if not check and move[3] not in (None, 'q'):
+                continue
+            searched = True
+            undo = position.make_move(move)
+            score = -self.quiescence(position, -beta, -alpha, ply + 1)
+            position.unmake_move(undo)
+            if score > best_score:
+                best_score = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        if check and not searched:
+            return -MATE_SCORE + ply
+        return best_score
+
+
+def search(position, movetime_ms=None, max_nodes=None, max_depth=None, table=None, history=(), info=None,
+           orderer=None):
+    return Searcher(table, orderer).search(position, movetime_ms, max_nodes, max_depth, history, info)
+
+
+def print_info(result):
+    print(f"info depth {result.depth} score {format_score(result.score)} nodes {result.nodes} "
+          f"nps {result.nps} time {int(result.time * 1000)} pv {' '.join(map(move_to_uci, result.pv))}")
+
+
+def print_ordering_stats(orderer):
+    print(f"ordering: {orderer.cutoffs} beta cutoffs, {orderer.first_move_cutoff_rate:.1%} on the first move, "
+          f"average cutoff move index {orderer.average_cutoff_index:.2f}")
+
+
+def run_bench(depth, hash_mb, ordering=True):
+    # fixed-depth searches over the perft reference positions; total nodes and nps
+    # are the numbers to compare between engine versions
+    from perft import REFERENCE_POSITIONS
+    total_nodes = 0
+    total_time = 0.0
+    cutoffs = first_move_cutoffs = cutoff_index_total = 0
+    for name, fen, _ in REFERENCE_POSITIONS[:7]:
+        orderer = MoveOrderer() if ordering else MoveOrderer(mvv_lva=False, killers=False, history=False)
+        result = search(Position.from_fen(fen), max_depth=depth, table=TranspositionTable(hash_mb), orderer=orderer)
+        total_nodes += result.nodes
+        total_time += result.time
+        cutoffs += orderer.cutoffs
+        first_move_cutoffs += orderer.first_move_cutoffs
+        cutoff_index_total += orderer.cutoff_index_total
+        print(f"{name}: bestmove {move_to_uci(result.best_move)} score {format_score(result.score)} "
+              f"nodes {result.nodes} time {result.time:.3f}s nps {result.nps}")
+    print(f"\nTotal: {total_nodes} nodes in {total_time:.3f}s, {int(total_nodes / total_time) if total_time else 0} nps")
+    if cutoffs:
+        print(f"ordering: {cutoffs} beta cutoffs, {first_move_cutoffs / cutoffs:.1%} on the first move, "
+              f"average cutoff move index {cutoff_index_total / cutoffs:.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search a position for the best move.")
+    parser.add_argument("fen", nargs="?", default=START_FEN, help="position to search (default: start position)")
+    parser.add_argument("--movetime", type=int, help="time budget in milliseconds")
+    parser.add_argument("--nodes", type=int, help="node budget")
+    parser.add_argument("-d", "--depth", type=int, help="maximum depth")
+    parser.add_argument("--hash", type=float, default=16, metavar="MB", help="transposition table size")
+    parser.add_argument("--bench", action="store_true", help="search the reference positions to --depth (default 3)")
+    parser.add_argument("--no-ordering", action="store_true",
+                        help="order by hash move only, to measure what MVV-LVA, killers and history save")
+    args = parser.parse_args(argv)
+
+    if args.bench:
+        run_bench(args.depth or 3, args.hash, not args.no_ordering)
+        return 0
+    if not (args.movetime or args.nodes or args.depth):
+        args.movetime = 1000
+    orderer = MoveOrderer(mvv_lva=False, killers=False, history=False) if args.no_ordering else MoveOrderer()
+    result = search(Position.from_fen(args.fen), args.movetime, args.nodes, args.depth,
+                    TranspositionTable(args.hash), info=print_info, orderer=orderer)
+    print_ordering_stats(orderer)
+    print(f"bestmove {move_to_uci(result.best_move) if result.best_move else '(none)'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+import argparse
+import multiprocessing
+import queue
+import sys
+import time
+from multiprocessing import shared_memory
+from move_ordering import MoveOrderer
+from position import Position, START_FEN, move_to_uci
+from search import Searcher, format_score, print_info
+from transposition import TranspositionTable
+
+# Lazy SMP: every worker process runs the ordinary iterative-deepening search on the same
+# position and they cooperate only through one transposition table in shared memory.
+# Helpers leave out some iteration depths, each on its own pattern, so at any moment they
+# are searching other depths than the main worker (worker 0), and each helper seeds its
+# history table differently; they fill the table with entries the main worker can use.
+# The table takes no locks; its entries are checksummed and a torn write reads as a miss.
+
+# Stockfish's skip pattern: helper n leaves out the depths where
+# (depth + SKIP_PHASE[i]) // SKIP_SIZE[i] is odd, with i = (n - 1) % 20
+SKIP_SIZE = (1, 1, 2, 2, 2, 2, 3, 3, 3, 3, 3, 3, 4, 4, 4, 4, 4, 4, 4, 4)
+SKIP_PHASE = (0, 1, 0, 1, 2, 3, 0, 1, 2, 3, 4, 5, 0, 1, 2, 3, 4, 5, 6, 7)
+
+
+def helper_skips(worker_id):
+    # skip_depth for Searcher.search: None for the main worker
+    if not worker_id:
+        return None
+    size = SKIP_SIZE[(worker_id - 1) % len(SKIP_SIZE)]
+    phase = SKIP_PHASE[(worker_id - 1) % len(SKIP_PHASE)]
+    return lambda depth: (depth + phase) // size % 2 == 1
+
+
+def _search_worker(worker_id, table_name, fen, history, movetime_ms, max_nodes, max_depth, stop, results, verbose):
+    memory = shared_memory.SharedMemory(name=table_name)
+    table = TranspositionTable(buffer=memory.buf)
+    try:
+        orderer = MoveOrderer(seed=worker_id if worker_id else None)
+        searcher = Searcher(table, orderer, stop)
+        result = searcher.search(Position.from_fen(fen), movetime_ms, max_nodes, max_depth, history,
+                                 print_info if verbose and worker_id == 0 else None, helper_skips(worker_id))
+        results.put((worker_id, result))
+    finally:
+        table.close()
+        memory.close()
+
+
+def parallel_search(position, workers=2, movetime_ms=None, max_nodes=None, max_depth=None, hash_mb=16,
+                    history=(), verbose=False):
+    # (SearchResult, SearchResult per worker or None). The result is the deepest completed
+    # search, the main worker's on ties, with nodes, time and nps totalled over all workers.
+    # Helpers are stopped as soon as the main worker finishes; max_nodes applies to each worker.
+    context = multiprocessing.get_context()
+    memory = shared_memory.SharedMemory(create=True, size=int(hash_mb * 1024 * 1024))
+    stop = context.Event()
+    results = context.Queue()
+    processes = [context.Process(target=_search_worker, daemon=True,
+                                 args=(worker_id, memory.name, position.fen(), tuple(history), movetime_ms,
+                                       max_nodes, max_depth, stop, results, verbose))
+                 for worker_id in range(workers)]
+    try:
+        started = time.perf_counter()
+        for process in processes:
+            process.start()
+        collected = {}
+        while len(collected) < workers:
+            try:
+                worker_id, result = results.get(timeout=0.1)
+            except queue.Empty:
+                if not any(process.is_alive() for process in processes) and results.empty():
+                    break
+                continue
+            collected[worker_id] = result
+            if worker_id == 0:
+                stop.set()
+        elapsed = time.perf_counter() - started
+        for process in processes:
+            process.join()
+    finally:
+        memory.close()
+        memory.unlink()
+
+    if 0 not in collected:
+        raise RuntimeError("the main search worker exited without a result")
+    best = collected[0]
+    for worker_id in sorted(collected):
+        if collected[worker_id].depth > best.depth and collected[worker_id].best_move is not None:
+            best = collected[worker_id]
+    worker_results = [collected.get(worker_id) for worker_id in range(workers)]
+    nodes = sum(result.nodes for result in collected.values())
+    return best._replace(nodes=nodes, time=elapsed, nps=int(nodes / elapsed) if elapsed > 0 else 0), worker_results
+
+
+def describe_workers(worker_results):
+    # "nodes/depth" of every worker, "-" for one without a result
+    return ' '.join(f"{result.nodes}/{result.depth}" if result else "-" for result in worker_results)
+
+
+def run_scaling(fen, max_workers, movetime_ms, max_depth, hash_mb):
+    # the same search with 1..max_workers processes; nps relative to one worker
+    position = Position.from_fen(fen)
+    base_nps = None
+    for workers in range(1, max_workers + 1):
+        result, worker_results = parallel_search(position, workers, movetime_ms, None, max_depth, hash_mb)
+        base_nps = base_nps or result.nps
+        print(f"{workers} workers: depth {result.depth} score {format_score(result.score)} "
+              f"bestmove {move_to_uci(result.best_move)} nodes {result.nodes} time {result.time:.3f}s "
+              f"nps {result.nps} ({result.nps / base_nps:.2f}x) nodes/depth per worker {describe_workers(worker_results)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search a position with several processes sharing one hash table.")
+    parser.add_argument("fen", nargs="?", default=START_FEN, help="position to search (default: start position)")
+    parser.add_argument("-j", "--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--movetime", type=int, help="time budget in milliseconds")
+    parser.add_argument("--nodes", type=int, help="node budget per worker")
+    parser.add_argument("-d", "--depth", type=int, help="maximum depth")
+    parser.add_argument("--hash", type=float, default=16, metavar="MB", help="shared transposition table size")
+    parser.add_argument("--scaling", action="store_true", help="report nps for 1 up to --workers processes")
+    args = parser.parse_args(argv)
+
+    if not (args.movetime or args.nodes or args.depth):
+        args.movetime = 1000
+    if args.scaling:
+        run_scaling(args.fen, args.workers, args.movetime, args.depth, args.hash)
+        return 0
+    result, worker_results = parallel_search(Position.from_fen(args.fen), args.workers, args.movetime, args.nodes,
+                                           args.depth, args.hash, verbose=True)
+    print(f"workers {args.workers} nodes {result.nodes} nps {result.nps} "
+          f"nodes/depth per worker {describe_workers(worker_results)}")
+    print(f"bestmove {move_to_uci(result.best_move) if result.best_move else '(none)'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
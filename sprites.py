@@ -0,0 +1,77 @@
+import hashlib
+import os
+import pygame
+
+# Piece sprites packed into one atlas surface, one square per piece in PIECE_ORDER. The
+# atlas for a square size is built from the twelve source PNGs once (decode and
+# smoothscale) and saved as raw RGBA pixels under a name made of the sources' hash and the
+# size, so later launches with the same images and size read one file and skip both.
+
+PIECE_IMAGES = {
+    "p": "black/pawn.png",
+    "n": "black/knight.png",
+    "b": "black/bishop.png",
+    "r": "black/rook.png",
+    "q": "black/queen.png",
+    "k": "black/king.png",
+    "P": "white/PAWN.png",
+    "N": "white/KNIGHT.png",
+    "B": "white/BISHOP.png",
+    "R": "white/ROOK.png",
+    "Q": "white/QUEEN.png",
+    "K": "white/KING.png",
+}
+PIECE_ORDER = "PNBRQKpnbrqk"
+CACHE_DIR = ".cache"  # under the assets directory
+
+
+def source_hash(base_path):
+    digest = hashlib.sha1()
+    for piece in PIECE_ORDER:
+        with open(os.path.join(base_path, PIECE_IMAGES[piece]), "rb") as image:
+            digest.update(image.read())
+    return digest.hexdigest()[:16]
+
+
+def atlas_path(cache_dir, digest, square_size):
+    return os.path.join(cache_dir, f"pieces-{digest}-{square_size}.rgba")
+
+
+def build_atlas(base_path, square_size):
+    atlas = pygame.Surface((square_size * len(PIECE_ORDER), square_size), pygame.SRCALPHA)
+    for slot, piece in enumerate(PIECE_ORDER):
+        image = pygame.image.load(os.path.join(base_path, PIECE_IMAGES[piece]))
+        # the atlas starts fully transparent, so BLEND_RGBA_MAX copies the pixels unchanged
+        atlas.blit(pygame.transform.smoothscale(image, (square_size, square_size)), (slot * square_size, 0),
+                   special_flags=pygame.BLEND_RGBA_MAX)
+    return atlas
+
+
+def load_atlas(base_path, square_size, cache_dir=None):
+    # (atlas, whether it came from the cache); a cache that cannot be written is skipped
+    cache_dir = cache_dir or os.path.join(base_path, CACHE_DIR)
+    path = atlas_path(cache_dir, source_hash(base_path), square_size)
+    size = (square_size * len(PIECE_ORDER), square_size)
+    try:
+        with open(path, "rb") as cached:
+            data = cached.read()
+        if len(data) == size[0] * size[1] * 4:
+            return pygame.image.frombuffer(data, size, "RGBA"), True
+    except OSError:
+        pass
+
+    atlas = build_atlas(base_path, square_size)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(path + ".tmp", "wb") as cached:
+            cached.write(pygame.image.tostring(atlas, "RGBA"))
+        os.replace(path + ".tmp", path)
+    except OSError:
+        pass
+    return atlas, False
+
+
+def piece_sprites(atlas):
+    # piece letter -> its square of the atlas
+    size = atlas.get_height()
+    return {piece: atlas.subsurface((slot * size, 0, size, size)) for slot, piece in enumerate(PIECE_ORDER)}
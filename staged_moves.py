@@ -0,0 +1,101 @@
+from move_encoding import PROMOTION_PIECES, to_legacy
+from move_generator import (analyze_king_safety, generate_piece_captures, generate_piece_pseudo_legal_moves,
+                            generate_piece_quiets, index_square, is_enemy, is_move_legal,
+                            has_legal_move as board_has_legal_move)
+
+# Lazy move generation for callers that often stop early. Moves come out in stages: the
+# hash move (checked for legality, nothing else generated yet), captures (capturing
+# promotions included), other promotions, then quiet moves including castling.
+# Captures and promotions are generated first, from enemy-occupied targets only; quiet
+# moves are generated and legality-checked only when their stage is reached, and never
+# with quiets=False.
+
+HASH_MOVE, CAPTURES, PROMOTIONS, QUIETS = "HASH_MOVE", "CAPTURES", "PROMOTIONS", "QUIETS"
+
+
+def is_legal(position, move, king_safety=None):
+    # whether a (start, end, move_type, promotion) move, e.g. from the hash table, is legal here
+    start, end, move_type, promotion = move
+    board = position.board
+    piece = board[start[1] * 8 + start[0]]
+    if piece == '.' or is_enemy(piece, position.turn):
+        return False
+    if (move_type == "PROMOTION") != (promotion is not None):
+        return False
+    if (end, move_type) not in generate_piece_pseudo_legal_moves(board, position.turn, start, position.en_passant,
+                                                                 position.castling):
+        return False
+    if king_safety is None:
+        king_safety = analyze_king_safety(board, position.turn)
+    return is_move_legal(board, position.turn, start, end, move_type, position.en_passant, king_safety)
+
+
+def move_stages(position, hash_move=0, quiets=True):
+    # (stage, legal moves) pairs, each computed when the caller asks for it; the hash move
+    # (a 16-bit code) is left out of the later stages. quiets=False stops after promotions.
+    board = position.board
+    turn = position.turn
+    en_passant = position.en_passant
+    castling = position.castling
+    king_safety = analyze_king_safety(board, turn)
+
+    skip = None
+    if hash_move:
+        move = to_legacy(hash_move)
+        if is_legal(position, move, king_safety):
+            skip = move
+            yield HASH_MOVE, [move]
+
+    own_squares = [index_square(index) for index, piece in enumerate(board)
+                   if piece != '.' and not is_enemy(piece, turn)]
+    captures = []
+    promotions = []
+    for start in own_squares:
+        for end, move_type in generate_piece_captures(board, turn, start, en_passant):
+            if move_type == "CAPTURE":
+                if is_move_legal(board, turn, start, end, move_type, en_passant, king_safety):
+                    move = (start, end, move_type, None)
+                    if move != skip:
+                        captures.append(move)
+            elif board[end[1] * 8 + end[0]] == '.':
+                promotions.append((start, end))
+            elif is_move_legal(board, turn, start, end, move_type, en_passant, king_safety):
+                for promotion in PROMOTION_PIECES:
+                    move = (start, end, move_type, promotion)
+                    if move != skip:
+                        captures.append(move)
+    if captures:
+        yield CAPTURES, captures
+
+    moves = []
+    for start, end in promotions:
+        if is_move_legal(board, turn, start, end, "PROMOTION", en_passant, king_safety):
+            for promotion in PROMOTION_PIECES:
+                move = (start, end, "PROMOTION", promotion)
+                if move != skip:
+                    moves.append(move)
+    if moves:
+        yield PROMOTIONS, moves
+
+    if quiets:
+        moves = []
+        for start in own_squares:
+            for end, move_type in generate_piece_quiets(board, turn, start, castling):
+                if is_move_legal(board, turn, start, end, move_type, en_passant, king_safety):
+                    move = (start, end, move_type, None)
+                    if move != skip:
+                        moves.append(move)
+        if moves:
+            yield QUIETS, moves
+
+
+def staged_moves(position, hash_move=0, quiets=True):
+    # the moves of move_stages one at a time
+    for _, moves in move_stages(position, hash_move, quiets):
+        yield from moves
+
+
+def has_legal_move(position):
+    # stops at the first legal move; the bitboard backend answers most positions from the
+    # check and pin masks without looking at single moves
+    return board_has_legal_move(position.board, position.turn, position.en_passant, position.castling)
@@ -0,0 +1,21 @@
+import queue
+from analysis_worker import ANALYSIS, MOVES, AnalysisWorker
+from game_state import START_FEN
+
+
+def test_worker_answers_in_a_spawned_process():
+    results = queue.Queue()
+    worker = AnalysisWorker(lambda *result: results.put(result), movetime_ms=50)
+    try:
+        # forking a process that has SDL running is unsafe, so the worker is spawned
+        assert type(worker.process).__name__ == "SpawnProcess"
+        request_id = worker.submit(START_FEN)
+        kind, answered_id, moves = results.get(timeout=30)
+        assert (kind, answered_id) == (MOVES, request_id)
+        assert sum(len(ends) for ends in moves["moves"].values()) == 20
+        kind, answered_id, analysis = results.get(timeout=30)
+        assert (kind, answered_id) == (ANALYSIS, request_id)
+        assert analysis["best_move"] and analysis["depth"] >= 1
+    finally:
+        worker.close()
+    assert not worker.process.is_alive()
@@ -0,0 +1,67 @@
+import io
+import json
+from batch import analyze, analyze_stream, main, read_positions, run_batch
+from perft import REFERENCE_POSITIONS
+from position import START_FEN
+
+LINES = [
+    "# reference positions",
+    "",
+    f"{START_FEN}",
+    "r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - bm Bb5; id \"ruy lopez\";",
+    "not a position",
+    "8/8/8/8/8/8/8/8 w - - 0 1",
+    "7k/5Q2/6K1/8/8/8/8/8 b - - id \"stalemate\";",
+]
+
+
+def test_read_positions():
+    positions = list(read_positions(LINES))
+    assert [number for number, _, _ in positions] == [3, 4, 5, 6, 7]
+    assert positions[0] == (3, START_FEN, "")
+    number, fen, operations = positions[1]
+    assert fen == "r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 0 1"
+    assert operations == "bm Bb5; id \"ruy lopez\";"
+
+
+def test_ids_and_error_records():
+    results = list(analyze_stream(read_positions(LINES)))
+    assert [result["line"] for result in results] == [3, 4, 5, 6, 7]
+    assert "id" not in results[0]
+    assert len(results[0]["moves"]) == 20 and results[0]["check"] is False
+    assert results[1]["id"] == "ruy lopez"
+    assert "error" in results[2] and "moves" not in results[2]
+    assert "error" in results[3]
+    assert results[4]["id"] == "stalemate"
+    assert results[4]["moves"] == [] and results[4]["mobility"]["total"] == 0
+
+
+def test_fields():
+    record = analyze("4k3/8/8/8/8/8/8/4K2R b K - 0 1", ("check", "attacks"))
+    assert set(record) == {"check", "attacks"}
+    assert record["check"] is False
+    assert "e1" in record["attacks"]["w"] and "h8" in record["attacks"]["w"]
+    record = analyze("4k3/8/8/8/8/8/8/4R2K b - - 0 1", ("check", "mobility"))
+    assert record["check"] is True
+    assert record["mobility"] == {"total": 4, "by_piece": {"K": 4}}
+
+
+def test_parallel_output_order():
+    lines = [fen for _, fen, _ in REFERENCE_POSITIONS] * 3 + ["bad"] + LINES
+    serial = list(analyze_stream(read_positions(lines)))
+    parallel = list(analyze_stream(read_positions(lines), workers=2, chunk_size=1))
+    assert parallel == serial
+    assert [result["line"] for result in parallel] == sorted(result["line"] for result in parallel)
+
+
+def test_run_batch_and_cli(tmp_path):
+    output = io.StringIO()
+    assert run_batch(LINES, output) == (5, 2)
+    records = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert [record["line"] for record in records] == [3, 4, 5, 6, 7]
+
+    source = tmp_path / "positions.epd"
+    source.write_text("\n".join(LINES) + "\n")
+    target = tmp_path / "out.jsonl"
+    assert main([str(source), "-o", str(target), "-j", "2", "--chunk", "1"]) == 1
+    assert [json.loads(line) for line in target.read_text().splitlines()] == records
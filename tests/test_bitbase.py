@@ -0,0 +1,105 @@
+import random
+import pytest
+from bitbase import (DRAW, INVALID, LOSS, WIN, SYMMETRIES, Bitbase, KING_PAIRS, PAWN_KING_PAIRS,
+                     close_tables, generate, probe, probe_board)
+from position import Position
+from search import in_check
+
+MATERIAL = ("KQvK", "KRvK")
+
+
+@pytest.fixture(scope="module")
+def tables(tmp_path_factory):
+    directory = str(tmp_path_factory.mktemp("bitbases"))
+    paths = {material: generate(material, directory, verbose=False)[0] for material in MATERIAL}
+    yield directory, paths
+    close_tables()
+
+
+def wins_within(position, plies):
+    # the side to move mates in at most plies, by plain minimax
+    if plies < 1:
+        return False
+    for move in position.legal_moves():
+        undo = position.make_move(move)
+        lost = loses_within(position, plies - 1)
+        position.unmake_move(undo)
+        if lost:
+            return True
+    return False
+
+
+def loses_within(position, plies):
+    moves = position.legal_moves()
+    if not moves:
+        return in_check(position)
+    for move in moves:
+        undo = position.make_move(move)
+        won = wins_within(position, plies - 1)
+        position.unmake_move(undo)
+        if not won:
+            return False
+    return True
+
+
+def random_boards(rng, pieces, count):
+    boards = []
+    while len(boards) < count:
+        squares = rng.sample(range(64), len(pieces))
+        white, black = squares[:2]
+        if max(abs(white % 8 - black % 8), abs(white // 8 - black // 8)) < 2:
+            continue
+        board = ['.'] * 64
+        for piece, square in zip(pieces, squares):
+            board[square] = piece
+        boards.append((''.join(board), rng.choice('wb')))
+    return boards
+
+
+def test_king_pairs():
+    assert len(KING_PAIRS[0]) == 462
+    assert len(PAWN_KING_PAIRS[0]) == 1806
+
+
+def test_longest_mates(tables):
+    # mate in 10 moves at worst with a queen and 16 with a rook: 19 and 31 plies for the
+    # winner, one more for the side being mated
+    _, paths = tables
+    for material, longest in (("KQvK", 19), ("KRvK", 31)):
+        with Bitbase(paths[material]) as table:
+            entries = [table.entry(index) for index in range(table.count)]
+        assert max(dtm for value, dtm in entries if value == WIN) == longest
+        assert max(dtm for value, dtm in entries if value == LOSS) == longest + 1
+
+
+@pytest.mark.parametrize("fen, expected", [
+    ("k7/8/1K6/8/8/8/7Q/8 w - - 0 1", (WIN, 1)),
+    ("k6Q/8/1K6/8/8/8/8/8 b - - 0 1", (LOSS, 0)),
+    ("k7/8/1Q6/8/8/8/8/7K b - - 0 1", (DRAW, 0)),
+    ("8/7q/8/8/8/1k6/8/K7 b - - 0 1", (WIN, 1)),
+    ("7K/8/8/8/8/8/1k6/R7 b - - 0 1", (DRAW, 0)),
+])
+def test_known_positions(tables, fen, expected):
+    directory, _ = tables
+    assert probe(Position.from_fen(fen), directory) == expected
+
+
+@pytest.mark.parametrize("material, pieces", [("KQvK", "KkQ"), ("KRvK", "KkR")])
+def test_symmetric_positions_agree(tables, material, pieces):
+    directory, _ = tables
+    for board, turn in random_boards(random.Random(material), pieces, 200):
+        results = {probe_board(''.join(board[table.index(square)] for square in range(64)), turn, directory)
+                   for table in SYMMETRIES}
+        assert len(results) == 1
+
+
+@pytest.mark.parametrize("material, pieces", [("KQvK", "KkQ"), ("KRvK", "KkR")])
+def test_short_mates_match_search(tables, material, pieces):
+    directory, _ = tables
+    for board, turn in random_boards(random.Random(material), pieces, 100):
+        value, dtm = probe_board(board, turn, directory)
+        if value == INVALID:
+            continue
+        position = Position(board, turn, '-', (), 0, 1)
+        assert wins_within(position, 3) == (value == WIN and dtm <= 3)
+        assert loses_within(position, 2) == (value == LOSS and dtm <= 2)
@@ -0,0 +1,45 @@
+import random
+from evaluation import accumulate, evaluate, evaluate_board
+from perft import REFERENCE_POSITIONS
+from position import Position
+
+# positions with promotions (quiet and capturing), en passant and castling close at hand
+FENS = [fen for _, fen, _ in REFERENCE_POSITIONS] + [
+    "r3k2r/1P4P1/8/8/8/8/1p4p1/R3K2R w KQkq - 0 1",
+    "n1n5/PPPk4/8/8/8/8/4Kppp/5N1N b - - 0 1",
+    "4k3/8/8/2pP4/1P6/8/6p1/4K3 w - c6 0 1",
+    "4k3/8/8/8/3pP3/8/8/4K3 b - e3 0 1",
+]
+
+
+def is_special(position, move):
+    start, end, move_type, promotion = move
+    en_passant = move_type == "CAPTURE" and position.board[end[1] * 8 + end[0]] == '.'
+    return promotion is not None or en_passant or move_type == "CASTLE"
+
+
+def test_incremental_matches_full_evaluation():
+    rng = random.Random(10)
+    seen = {"promotion": 0, "en passant": 0}
+    for fen in FENS:
+        for _ in range(10):
+            position = Position.from_fen(fen)
+            undos = []
+            for _ in range(30):
+                moves = position.legal_moves()
+                if not moves:
+                    break
+                special = [move for move in moves if is_special(position, move)]
+                move = rng.choice(special if special and rng.random() < 0.5 else moves)
+                if move[3] is not None:
+                    seen["promotion"] += 1
+                elif is_special(position, move) and move[2] == "CAPTURE":
+                    seen["en passant"] += 1
+                undos.append(((position.mg, position.eg, position.phase), position.make_move(move)))
+                assert (position.mg, position.eg, position.phase) == accumulate(position.board)
+                assert evaluate(position) == evaluate_board(position.board, position.turn)
+            while undos:
+                totals, undo = undos.pop()
+                position.unmake_move(undo)
+                assert (position.mg, position.eg, position.phase) == totals
+    assert seen["promotion"] and seen["en passant"]
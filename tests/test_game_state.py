@@ -0,0 +1,42 @@
+from analysis_worker import engine_analysis, position_moves
+from game_state import START_FEN, board_to_fen, get_fen_en_passent, interpret_fen, make_fen_en_passent, make_move
+from position import Position
+from search import Searcher
+
+
+def play(fen, moves):
+    # the GUI's path: interpret_fen, make_move per (start, end, move_type), board_to_fen
+    board, turn, castling, en_passant, halfmove, fullmove = interpret_fen(fen)
+    en_passant = get_fen_en_passent(en_passant)
+    for start, end, move_type in moves:
+        board, turn, castling, en_passant, halfmove, fullmove = make_move(
+            board, start, end, move_type, en_passant, halfmove, turn, fullmove, castling)
+    return board_to_fen(board, turn, castling, make_fen_en_passent(en_passant), halfmove, fullmove)
+
+
+def test_captured_rook_loses_castling_right():
+    # 1. b3 g6 2. Bb2 a6 3. Bxh8
+    fen = play(START_FEN, [((1, 6), (1, 5), "QUIET"), ((6, 1), (6, 2), "QUIET"), ((2, 7), (1, 6), "QUIET"),
+                           ((0, 1), (0, 2), "QUIET"), ((1, 6), (7, 0), "CAPTURE")])
+    assert fen == "rnbqkbnB/1ppppp1p/p5p1/8/8/1P6/P1PPPPPP/RN1QKBNR b KQq - 0 3"
+    Position.from_fen(fen)
+    assert "error" not in engine_analysis(Searcher(), fen, 20)
+    assert "error" not in position_moves(fen)
+
+
+def test_moved_king_and_rooks_lose_castling_rights():
+    fen = play("r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1",
+               [((0, 7), (0, 6), "QUIET"), ((7, 0), (7, 1), "QUIET"), ((4, 7), (5, 7), "QUIET"),
+                ((4, 0), (3, 0), "QUIET")])
+    assert fen == "r2k4/7r/8/8/8/8/R7/5K1R w - - 4 3"
+    Position.from_fen(fen)
+
+
+def test_castling_moves_the_rook():
+    fen = play("r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1", [((4, 7), (6, 7), "CASTLE"), ((4, 0), (2, 0), "CASTLE")])
+    assert fen == "2kr3r/8/8/8/8/8/8/R4RK1 w - - 2 2"
+
+
+def test_en_passant_capture_removes_the_pawn():
+    fen = play("4k3/8/8/3pP3/8/8/8/4K3 w - d6 0 2", [((4, 3), (3, 2), "CAPTURE")])
+    assert fen == "4k3/8/3P4/8/8/8/8/4K3 b - - 0 2"
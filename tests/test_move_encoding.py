@@ -0,0 +1,40 @@
+import pytest
+from move_encoding import from_legacy, from_uci, new_move_list, perft_codes, to_legacy, to_uci
+from perft import REFERENCE_POSITIONS
+from position import Position, move_to_uci
+
+FENS = [fen for _, fen, _ in REFERENCE_POSITIONS]
+
+
+@pytest.mark.parametrize("fen", FENS)
+def test_move_codes_match_moves(fen):
+    position = Position.from_fen(fen)
+    codes = new_move_list()
+    count = position.legal_move_codes(codes)
+    assert sorted(map(str, map(to_legacy, codes[:count]))) == sorted(map(str, position.legal_moves()))
+
+
+@pytest.mark.parametrize("fen", FENS)
+def test_code_conversions_round_trip(fen):
+    position = Position.from_fen(fen)
+    codes = new_move_list()
+    count = position.legal_move_codes(codes)
+    for code in codes[:count]:
+        move = to_legacy(code)
+        assert from_legacy(move) == code
+        assert to_uci(code) == move_to_uci(move)
+        assert from_uci(to_uci(code), codes, count) == code
+
+
+def test_unknown_uci_is_rejected():
+    position = Position.from_fen(FENS[0])
+    codes = new_move_list()
+    count = position.legal_move_codes(codes)
+    with pytest.raises(ValueError):
+        from_uci("e2e5", codes, count)
+
+
+@pytest.mark.parametrize("name, fen, counts", REFERENCE_POSITIONS[:7], ids=[case[0] for case in REFERENCE_POSITIONS[:7]])
+def test_perft_on_codes(name, fen, counts):
+    buffers = [new_move_list() for _ in range(3)]
+    assert perft_codes(Position.from_fen(fen), 2, buffers) == counts[2]
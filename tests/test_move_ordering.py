@@ -0,0 +1,65 @@
+from move_ordering import MoveOrderer
+from position import Position, START_FEN, move_to_uci
+from transposition import pack_move
+
+# white can take the queen with the pawn (e4d5) or the queen (d1d5), or a pawn with the queen (d1a4)
+CAPTURES_FEN = "4k3/8/8/3q4/p3P3/8/8/3QK3 w - - 0 1"
+
+
+def ordered(orderer, position, hash_move=0, ply=None):
+    return [move_to_uci(move) for move in orderer.order(position, position.legal_moves(), hash_move, ply)]
+
+
+def find(position, uci):
+    return next(move for move in position.legal_moves() if move_to_uci(move) == uci)
+
+
+def test_mvv_lva_puts_pawn_takes_queen_first():
+    position = Position.from_fen(CAPTURES_FEN)
+    moves = ordered(MoveOrderer(), position, ply=0)
+    assert moves[:3] == ["e4d5", "d1d5", "d1a4"]
+    staged = [move_to_uci(move) for move in MoveOrderer().staged(position, ply=0)]
+    assert staged[:3] == ["e4d5", "d1d5", "d1a4"]
+    assert sorted(staged) == sorted(moves)
+
+
+def test_killers_and_history_after_cutoff():
+    position = Position.from_fen(START_FEN)
+    orderer = MoveOrderer()
+    assert ordered(orderer, position, ply=3)[0] != "b1c3"
+    orderer.record_cutoff(position, find(position, "b1c3"), 5, 4, 3, True)
+    orderer.record_cutoff(position, find(position, "g2g3"), 5, 2, 3, True)
+    assert orderer.killers[3] == [find(position, "g2g3"), find(position, "b1c3")]
+    # killers at their own ply, most recent first
+    assert ordered(orderer, position, ply=3)[:2] == ["g2g3", "b1c3"]
+    # elsewhere history alone decides, and the deeper cutoff scored more
+    assert ordered(orderer, position, ply=5)[:2] == ["b1c3", "g2g3"]
+    assert orderer.cutoffs == 2 and orderer.first_move_cutoffs == 0
+
+
+def test_captures_do_not_train_quiet_heuristics():
+    position = Position.from_fen(CAPTURES_FEN)
+    orderer = MoveOrderer()
+    orderer.record_cutoff(position, find(position, "d1a4"), 0, 4, 1, False)
+    assert orderer.killers[1] == [None, None]
+    assert not any(orderer.history['w'])
+    assert orderer.first_move_cutoff_rate == 1.0
+
+
+def test_staged_yields_legal_hash_move_first():
+    position = Position.from_fen(CAPTURES_FEN)
+    hash_move = find(position, "e1f2")
+    staged = list(MoveOrderer().staged(position, pack_move(hash_move), ply=0))
+    assert staged[0] == hash_move
+    assert staged.count(hash_move) == 1
+    assert len(staged) == len(position.legal_moves())
+
+
+def test_staged_skips_illegal_hash_move():
+    position = Position.from_fen(CAPTURES_FEN)
+    # legal in the start position, but there is no pawn on e2 here
+    hash_move = pack_move(find(Position.from_fen(START_FEN), "e2e4"))
+    staged = [move_to_uci(move) for move in MoveOrderer().staged(position, hash_move, ply=0)]
+    assert "e2e4" not in staged
+    assert staged[0] == "e4d5"
+    assert len(staged) == len(position.legal_moves())
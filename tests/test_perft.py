@@ -0,0 +1,31 @@
+import os
+import subprocess
+import sys
+import pytest
+from perft import REFERENCE_POSITIONS, divide, perft
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SHALLOW = [(name, fen, depth, nodes) for name, fen, counts in REFERENCE_POSITIONS
+           for depth, nodes in sorted(counts.items()) if depth <= 2]
+
+
+@pytest.mark.parametrize("name, fen, depth, expected", SHALLOW, ids=[f"{case[0]}-{case[2]}" for case in SHALLOW])
+def test_reference_counts(name, fen, depth, expected):
+    assert perft(fen, depth) == expected
+
+
+@pytest.mark.parametrize("backend", ["board", "bitboard"])
+def test_suite_on_backend(backend):
+    # the backend is picked when move_generator is imported, so each one runs in its own process
+    env = dict(os.environ, CHESS_MOVEGEN_BACKEND=backend)
+    result = subprocess.run([sys.executable, "perft.py", "--suite", "-d", "3"], cwd=ROOT, env=env,
+                            capture_output=True, text=True)
+    assert result.returncode == 0, result.stdout + result.stderr
+    assert "FAIL" not in result.stdout
+
+
+def test_divide_sums_to_perft():
+    _, fen, counts = REFERENCE_POSITIONS[0]
+    split = divide(fen, 2)
+    assert len(split) == counts[1]
+    assert sum(split.values()) == counts[2]
@@ -0,0 +1,74 @@
+import io
+import pytest
+from perft import REFERENCE_POSITIONS
+from pgn import move_to_san, parse_san, positions, random_games, read_games, write_game
+from position import Position, classify_move, move_to_uci
+
+GAME = """[Event "Test"]
+[White "A"]
+[Black "B"]
+[Result "1-0"]
+
+1. e4 {best by test
+   1... c5 is a comment} e5 2. Nf3 (2. f4 exf4) Nc6 $1 3. Bb5 a6!? ; to the end
+4. Ba4 Nf6 5. O-O Be7 6.Re1 b5 7. Bb3 d6 8. c3 O-O 1-0
+
+[Event "Second"]
+
+1. d4 d5 *
+"""
+
+
+def test_read_games_keeps_mainline():
+    games = list(read_games(io.StringIO(GAME)))
+    assert [tags.get("Event") for tags, _ in games] == ["Test", "Second"]
+    assert games[0][1] == ["e4", "e5", "Nf3", "Nc6", "Bb5", "a6!?", "Ba4", "Nf6", "O-O", "Be7", "Re1", "b5",
+                           "Bb3", "d6", "c3", "O-O"]
+    assert games[1][1] == ["d4", "d5"]
+
+
+def test_positions_replay():
+    errors = []
+    replayed = [(ply, position.fen(), move) for _, ply, position, move in
+                positions(read_games(io.StringIO(GAME)), errors)]
+    assert errors == []
+    assert replayed[16][1] == "r1bq1rk1/2p1bppp/p1np1n2/1p2p3/4P3/1BP2N2/PP1P1PPP/RNBQR1K1 w - - 1 9"
+    assert replayed[16][2] is None
+
+
+def test_bad_move_stops_the_game():
+    errors = []
+    list(positions(read_games(io.StringIO("1. e4 e5 2. Ke3 Nc6 *\n")), errors))
+    assert [(number, ply) for number, ply, _ in errors] == [(1, 2)]
+
+
+@pytest.mark.parametrize("fen", [fen for _, fen, _ in REFERENCE_POSITIONS])
+def test_san_round_trip(fen):
+    position = Position.from_fen(fen)
+    for move in position.legal_moves():
+        assert parse_san(position, move_to_san(position, move)) == move
+
+
+def test_written_games_read_back():
+    games = list(random_games(5, max_plies=80, seed=4))
+    output = io.StringIO()
+    for tags, sans in games:
+        write_game(output, tags, sans)
+    assert list(read_games(io.StringIO(output.getvalue()))) == games
+    errors = []
+    list(positions(iter(games), errors))
+    assert errors == []
+
+
+@pytest.mark.parametrize("fen, uci, san", [
+    ("rnbqkbnr/pppp1ppp/8/4p3/6P1/5P2/PPPPP2P/RNBQKBNR b KQkq - 0 2", "d8h4", "Qh4#"),
+    ("3k4/8/8/8/8/8/8/R3K3 w Q - 0 1", "e1c1", "O-O-O+"),
+    ("4k3/1P6/8/8/8/8/8/4K3 w - - 0 1", "b7b8q", "b8=Q+"),
+    ("4k3/1P6/8/8/8/8/8/4K3 w - - 0 1", "b7b8n", "b8=N"),
+    ("6k1/5ppp/8/8/8/8/8/R3K3 w Q - 0 1", "a1a8", "Ra8#"),
+])
+def test_check_suffixes(fen, uci, san):
+    position = Position.from_fen(fen)
+    move = next(move for move in position.legal_moves() if move_to_uci(move) == uci)
+    assert move_to_san(position, move) == san
+    assert classify_move(position, move) == {'#': "CHECKMATE", '+': "CHECK"}.get(san[-1], move[2])
@@ -0,0 +1,60 @@
+import random
+import pytest
+from perft import REFERENCE_POSITIONS
+from polyglot import PolyglotBook, decode_book_move, encode_book_move, polyglot_key, write_book
+from position import Position, START_FEN
+
+# the example keys of the Polyglot book format description
+REFERENCE_KEYS = [
+    ("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1", 0x463b96181691fc9c),
+    ("rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1", 0x823c9b50fd114196),
+    ("rnbqkbnr/ppp1pppp/8/3p4/4P3/8/PPPP1PPP/RNBQKBNR w KQkq d6 0 2", 0x0756b94461c50fb0),
+    ("rnbqkbnr/ppp1pppp/8/3pP3/8/8/PPPP1PPP/RNBQKBNR b KQkq - 0 2", 0x662fafb965db29d4),
+    ("rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3", 0x22a48b5a8e47ff78),
+    ("rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPPKPPP/RNBQ1BNR b kq - 0 3", 0x652a607ca3f242c1),
+    ("rnbq1bnr/ppp1pkpp/8/3pPp2/8/8/PPPPKPPP/RNBQ1BNR w - - 0 4", 0x00fdd303c946bdd9),
+    ("rnbqkbnr/p1pppppp/8/8/PpP4P/8/1P1PPPP1/RNBQKBNR b KQkq c3 0 3", 0x3c8123ea7b067637),
+    ("rnbqkbnr/p1pppppp/8/8/P6P/R1p5/1P1PPPP1/1NBQKBNR b Kkq - 0 4", 0x5c3f9b829b279560),
+]
+
+
+@pytest.mark.parametrize("fen, key", REFERENCE_KEYS)
+def test_reference_keys(fen, key):
+    assert polyglot_key(Position.from_fen(fen)) == key
+
+
+@pytest.mark.parametrize("fen", [fen for _, fen, _ in REFERENCE_POSITIONS])
+def test_move_codes_round_trip(fen):
+    position = Position.from_fen(fen)
+    moves = position.legal_moves()
+    for move in moves:
+        assert decode_book_move(position, encode_book_move(move), moves) == move
+
+
+def test_castling_written_as_king_takes_rook():
+    position = Position.from_fen("r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1")
+    castles = [move for move in position.legal_moves() if move[2] == "CASTLE"]
+    assert sorted(encode_book_move(move) & 0x3f for move in castles) == [0, 7]  # a1 and h1
+
+
+def test_written_book_reads_back(tmp_path):
+    rng = random.Random(3)
+    position = Position.from_fen(START_FEN)
+    weights = {}
+    expected = {}
+    for _ in range(12):
+        moves = position.legal_moves()
+        chosen = rng.sample(moves, 3)
+        key = polyglot_key(position)
+        for weight, move in enumerate(chosen, 1):
+            weights[(key, encode_book_move(move))] = weight * 10
+        expected[position.fen()] = [(move, weight * 10) for weight, move in reversed(list(enumerate(chosen, 1)))]
+        position.make_move(chosen[0])
+
+    path = tmp_path / "book.bin"
+    write_book(weights, str(path))
+    with PolyglotBook(str(path)) as book:
+        assert len(book) == len(weights)
+        for fen, moves in expected.items():
+            assert book.moves(Position.from_fen(fen)) == moves
+        assert book.moves(Position.from_fen("4k3/8/8/8/8/8/8/4K3 w - - 0 1")) == []
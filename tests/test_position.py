@@ -0,0 +1,70 @@
+import random
+import pytest
+from perft import REFERENCE_POSITIONS
+from position import Position, START_FEN, parse_fen
+
+FENS = [fen for _, fen, _ in REFERENCE_POSITIONS]
+
+
+@pytest.mark.parametrize("fen", FENS)
+def test_make_unmake_restores_position(fen):
+    position = Position.from_fen(fen)
+    before = (position.fen(), bytes(position.squares))
+    for move in position.legal_moves():
+        undo = position.make_move(move)
+        assert position.board == Position.from_fen(position.fen()).board
+        position.unmake_move(undo)
+        assert (position.fen(), bytes(position.squares)) == before
+
+
+def test_random_games_unwind():
+    rng = random.Random(7)
+    for _ in range(20):
+        position = Position.from_fen(START_FEN)
+        undos = []
+        for _ in range(80):
+            moves = position.legal_moves()
+            if not moves:
+                break
+            undos.append((position.fen(), position.make_move(rng.choice(moves))))
+        while undos:
+            fen, undo = undos.pop()
+            position.unmake_move(undo)
+            assert position.fen() == fen
+
+
+def test_copy_is_independent():
+    position = Position.from_fen(START_FEN)
+    copy = position.copy()
+    copy.make_move(copy.legal_moves()[0])
+    assert position.fen() == START_FEN
+
+
+@pytest.mark.parametrize("fen", FENS)
+def test_fen_round_trip(fen):
+    assert Position.from_fen(fen).fen() == fen
+
+
+def test_epd_fields_default_counters():
+    position = Position.from_fen("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq -")
+    assert position.fen() == START_FEN
+
+
+@pytest.mark.parametrize("fen", [
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq",  # three fields
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPP/RNBQKBNR w KQkq - 0 1",  # short rank
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPPP/RNBQKBNR w KQkq - 0 1",  # long rank
+    "rnbqkbnr/pppppppp/44/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",  # consecutive digits
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP w KQkq - 0 1",  # seven ranks
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQ1BNR w kq - 0 1",  # no white king
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR x KQkq - 0 1",  # side to move
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w QKkq - 0 1",  # castling order
+    "rnbqkbn1/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",  # k without its rook
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq e3 0 1",  # en passant for the wrong side
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq e6 0 1",  # en passant without the pawn
+    "rnbqkbnP/pppppppp/8/8/8/8/PPPPPPP1/RNBQKBNR w KQq - 0 1",  # pawn on the last rank
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - x 1",  # counters
+])
+def test_strict_parser_rejects(fen):
+    with pytest.raises(ValueError):
+        parse_fen(fen)
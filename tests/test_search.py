@@ -0,0 +1,45 @@
+from position import Position, START_FEN, move_to_uci
+from search import MATE_SCORE, Searcher, format_score, search
+
+
+def test_finds_mate_in_one():
+    result = search(Position.from_fen("6k1/5ppp/8/8/8/8/8/R6K w - - 0 1"), max_depth=4)
+    assert move_to_uci(result.best_move) == "a1a8"
+    assert result.score == MATE_SCORE - 1
+    assert format_score(result.score) == "mate 1"
+
+
+def test_mated_root_has_no_move():
+    result = search(Position.from_fen("k6R/8/1K6/8/8/8/8/8 b - - 0 1"), max_depth=4)
+    assert result.best_move is None
+    assert result.score == -MATE_SCORE
+
+
+def test_stalemated_root_has_no_move():
+    result = search(Position.from_fen("k7/8/1Q6/8/8/8/8/7K b - - 0 1"), max_depth=4)
+    assert result.best_move is None
+    assert result.score == 0
+
+
+def test_node_limit():
+    result = search(Position.from_fen(START_FEN), max_nodes=2000)
+    assert result.best_move is not None
+    assert result.nodes <= 2000
+
+
+def test_movetime():
+    result = search(Position.from_fen(START_FEN), movetime_ms=200)
+    assert result.best_move is not None
+    assert result.time < 1.0
+
+
+def test_repetition_scores_zero():
+    # a queen up, but every move repeats a position from the game
+    position = Position.from_fen("k7/8/8/8/8/8/8/KQ6 w - - 0 1")
+    assert Searcher().search(position, max_depth=3).score > 500
+    history = []
+    for move in position.legal_moves():
+        undo = position.make_move(move)
+        history.append(position.hash)
+        position.unmake_move(undo)
+    assert Searcher().search(position, max_depth=3, history=history).score == 0
@@ -0,0 +1,68 @@
+import queue
+from multiprocessing import shared_memory
+from move_ordering import MoveOrderer
+from position import Position, START_FEN
+from search import Searcher
+from smp import _search_worker, helper_skips, parallel_search
+from transposition import TranspositionTable
+
+FEN = "r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3"
+
+
+def searched_depths(worker_id, max_depth=8):
+    skip = helper_skips(worker_id)
+    return [depth for depth in range(1, max_depth + 1) if skip is None or not skip(depth)]
+
+
+def test_helpers_search_other_depths():
+    assert searched_depths(0) == [1, 2, 3, 4, 5, 6, 7, 8]
+    assert searched_depths(1) == [2, 4, 6, 8]
+    assert searched_depths(2) == [1, 3, 5, 7]
+    assert len({tuple(searched_depths(worker_id)) for worker_id in range(7)}) == 7
+
+
+def test_helper_fills_shared_table():
+    memory = shared_memory.SharedMemory(create=True, size=1024 * 1024)
+    try:
+        results = queue.Queue()
+        _search_worker(1, memory.name, FEN, (), None, None, 4, None, results, False)
+        worker_id, helper = results.get_nowait()
+        assert worker_id == 1 and helper.depth == 4
+
+        table = TranspositionTable(buffer=memory.buf)
+        try:
+            position = Position.from_fen(FEN)
+            assert table.probe(position.hash) is not None
+            assert table.hashfull() > 0
+            # the main worker starts from the helper's entries
+            warm = Searcher(table).search(position, max_depth=4)
+            assert table.hits > 0
+        finally:
+            table.close()
+        cold = Searcher(TranspositionTable(1)).search(position, max_depth=4)
+        assert warm.nodes < cold.nodes
+    finally:
+        memory.close()
+        memory.unlink()
+
+
+def test_helpers_diverge_from_main():
+    position = Position.from_fen(FEN)
+    trees = []
+    for worker_id in range(3):
+        depths = []
+        orderer = MoveOrderer(seed=worker_id if worker_id else None)
+        result = Searcher(TranspositionTable(1), orderer).search(
+            position, max_depth=4, info=lambda result: depths.append(result.depth), skip_depth=helper_skips(worker_id))
+        assert result.depth == 4
+        trees.append((tuple(depths), result.nodes))
+    assert len({depths for depths, _ in trees}) == 3
+    assert len({nodes for _, nodes in trees}) == 3
+
+
+def test_parallel_search():
+    position = Position.from_fen(START_FEN)
+    result, worker_results = parallel_search(position, workers=2, max_depth=3, hash_mb=1)
+    assert result.best_move in position.legal_moves()
+    assert worker_results[0] is not None
+    assert result.nodes == sum(worker.nodes for worker in worker_results if worker is not None)
@@ -0,0 +1,46 @@
+import pytest
+import bitboard
+import move_generator
+from move_encoding import from_legacy
+from perft import REFERENCE_POSITIONS
+from position import Position, random_fens
+from staged_moves import CAPTURES, HASH_MOVE, PROMOTIONS, QUIETS, move_stages
+
+FENS = [fen for _, fen, _ in REFERENCE_POSITIONS] + random_fens(100, plies=40, seed=5)
+
+
+@pytest.mark.parametrize("backend", [move_generator, bitboard], ids=["board", "bitboard"])
+def test_captures_and_quiets_split_pseudo_legal_moves(backend):
+    for fen in FENS:
+        position = Position.from_fen(fen)
+        board = position.board
+        for index, piece in enumerate(board):
+            if piece == '.' or move_generator.is_enemy(piece, position.turn):
+                continue
+            square = (index % 8, index // 8)
+            captures = backend.generate_piece_captures(board, position.turn, square, position.en_passant)
+            quiets = backend.generate_piece_quiets(board, position.turn, square, position.castling)
+            assert all(move_type in ("CAPTURE", "PROMOTION") for _, move_type in captures)
+            assert all(move_type in ("QUIET", "CASTLE") for _, move_type in quiets)
+            assert sorted(captures + quiets) == sorted(backend.generate_piece_pseudo_legal_moves(
+                board, position.turn, square, position.en_passant, position.castling))
+
+
+@pytest.mark.parametrize("fen", FENS[:len(REFERENCE_POSITIONS)] + FENS[len(REFERENCE_POSITIONS)::10])
+def test_stages_cover_legal_moves_once(fen):
+    position = Position.from_fen(fen)
+    legal = sorted(position.legal_moves(), key=str)
+    staged = [move for _, moves in move_stages(position) for move in moves]
+    assert sorted(staged, key=str) == legal
+
+    noisy = [move for _, moves in move_stages(position, quiets=False) for move in moves]
+    assert sorted(noisy, key=str) == sorted([move for move in legal if move[2] != "QUIET" and move[2] != "CASTLE"],
+                                            key=str)
+
+    if legal:
+        hash_move = legal[-1]
+        stages = list(move_stages(position, from_legacy(hash_move)))
+        assert stages[0] == (HASH_MOVE, [hash_move])
+        assert sorted([move for _, moves in stages for move in moves], key=str) == legal
+        assert [stage for stage, _ in stages[1:]] == [stage for stage in (CAPTURES, PROMOTIONS, QUIETS)
+                                                      if stage in dict(stages[1:])]
@@ -0,0 +1,122 @@
+import random
+import pytest
+from perft import REFERENCE_POSITIONS, perft
+from position import Position, START_FEN
+from search import MATE_SCORE, score_from_table, score_to_table
+from transposition import ENTRY_BYTES, ENTRY_WORDS, EXACT, LOWER_BOUND, UPPER_BOUND, TranspositionTable
+from zobrist import compute_hash
+
+
+def same_bucket_keys(table, count):
+    # keys that all land in bucket 3
+    return [3 + number * table.num_buckets for number in range(1, count + 1)]
+
+
+def test_store_probe_round_trip():
+    table = TranspositionTable(1)
+    table.store(0x123456789ABCDEF0, 42, 7, LOWER_BOUND, 0xBEEF)
+    assert table.probe(0x123456789ABCDEF0) == (42, 7, LOWER_BOUND, 0xBEEF)
+    assert table.probe(0x123456789ABCDEF1) is None
+    assert (table.probes, table.hits, table.stores) == (2, 1, 1)
+
+
+@pytest.mark.parametrize("score", [-1, -350, MATE_SCORE - 5, -(MATE_SCORE - 4)])
+def test_negative_and_mate_scores(score):
+    table = TranspositionTable(1)
+    table.store(99, score_to_table(score, 3), 5, EXACT)
+    value, _, _, _ = table.probe(99)
+    assert score_from_table(value, 3) == score
+    # the same entry reached at ply 1 is a mate 2 plies nearer the root
+    if abs(score) > 1000:
+        assert abs(score_from_table(value, 1)) == abs(score) + 2
+
+
+def test_depth_policy_keeps_deep_entries():
+    table = TranspositionTable(1, bucket_size=2, policy="depth")
+    deep, shallow, new = same_bucket_keys(table, 3)
+    table.store(deep, 1, 10)
+    table.new_search()
+    table.store(shallow, 2, 1)
+    table.store(new, 3, 4)
+    assert table.probe(deep) is not None
+    assert table.probe(shallow) is None
+    assert table.overwrites == 1
+
+
+def test_always_policy_evicts_oldest():
+    table = TranspositionTable(1, bucket_size=2, policy="always")
+    deep, shallow, new = same_bucket_keys(table, 3)
+    table.store(deep, 1, 10)
+    table.new_search()
+    table.store(shallow, 2, 1)
+    table.store(new, 3, 4)
+    assert table.probe(deep) is None
+    assert table.probe(shallow) is not None
+
+
+def test_same_key_replaces_in_place():
+    table = TranspositionTable(1, bucket_size=2)
+    table.store(5, 1, 3, UPPER_BOUND)
+    table.store(5, 2, 6, EXACT)
+    assert table.probe(5) == (2, 6, EXACT, 0)
+    assert table.overwrites == 0
+
+
+def test_torn_entry_reads_as_miss():
+    table = TranspositionTable(1)
+    table.store(77, 500, 8, EXACT, 1234)
+    slot = table._bucket(77)
+    # another process got as far as the value word of a different entry
+    table.words[slot + 1] = 12345
+    assert table.probe(77) is None
+
+
+def test_shared_buffer():
+    buffer = bytearray(ENTRY_BYTES * 4 * 10)
+    writer = TranspositionTable(buffer=buffer)
+    reader = TranspositionTable(buffer=buffer)
+    writer.store(1234, -77, 3, EXACT)
+    assert reader.probe(1234) == (-77, 3, EXACT, 0)
+
+
+@pytest.mark.parametrize("memory_mb", [1, 48, 64, 100])
+def test_memory_budget_is_used(memory_mb):
+    table = TranspositionTable(memory_mb)
+    budget = memory_mb * 1024 * 1024
+    assert budget - ENTRY_BYTES * table.bucket_size < table.memory_bytes <= budget
+    assert len(table.words) == table.capacity * ENTRY_WORDS
+
+
+def test_clear():
+    table = TranspositionTable(1)
+    table.store(8, 1, 1)
+    table.clear()
+    assert table.probe(8) is None
+    assert table.hashfull() == 0
+
+
+def test_incremental_hash_matches_recompute():
+    rng = random.Random(11)
+    for fen in [START_FEN] + [fen for _, fen, _ in REFERENCE_POSITIONS]:
+        position = Position.from_fen(fen)
+        undos = []
+        for _ in range(40):
+            moves = position.legal_moves()
+            if not moves:
+                break
+            undos.append((position.hash, position.make_move(rng.choice(moves))))
+            assert position.hash == compute_hash(position.board, position.turn, position.castling,
+                                                 position.en_passant)
+        while undos:
+            key, undo = undos.pop()
+            position.unmake_move(undo)
+            assert position.hash == key
+
+
+def test_perft_with_table():
+    name, fen, counts = REFERENCE_POSITIONS[1]
+    table = TranspositionTable(1)
+    assert perft(fen, 3, table) == counts[3]
+    assert table.hits > 0
+    # a second run answers from the table
+    assert perft(fen, 3, table) == counts[3]
@@ -0,0 +1,160 @@
+from move_encoding import from_legacy
+
+# Fixed-size transposition table keyed by Zobrist hash. Entries live in one flat buffer of
+# 64-bit words so the memory budget is exact: [key, value, info] per entry, grouped into
+# buckets; the key modulo the bucket count picks the bucket. The key word is stored xored
+# with the value and info words, so an entry half-written by another process sharing the
+# buffer fails the check in probe() and reads as a miss instead of returning mixed data.
+
+ENTRY_WORDS = 3
+ENTRY_BYTES = ENTRY_WORDS * 8
+
+# bound flags for search scores
+EXACT, LOWER_BOUND, UPPER_BOUND = 0, 1, 2
+
+MASK_64 = (1 << 64) - 1
+SIGN_BIT = 1 << 63
+OCCUPIED = 1 << 63  # info bit that marks a used slot
+
+REPLACEMENT_POLICIES = ("depth", "always")
+
+
+def pack_move(move):
+    # 16-bit form of a (start, end, move_type, promotion) move, see move_encoding; 0 for None
+    return from_legacy(move) if move is not None else 0
+
+
+def pack_info(move, depth, flag, generation):
+    return (move & 0xFFFF) | ((depth & 0xFF) << 16) | ((flag & 0x3) << 24) | ((generation & 0xFF) << 32) | OCCUPIED
+
+
+class TranspositionTable:
+    # policy "depth": a full bucket evicts the entry with the lowest depth, entries from
+    #                 older searches (see new_search) losing 8 plies per generation
+    # policy "always": a full bucket evicts its oldest entry regardless of depth
+
+    # buffer: existing writable memory to keep the entries in (e.g. a SharedMemory's buf),
+    #         sized by its length instead of memory_mb; call close() before releasing it
+
+    def __init__(self, memory_mb=16, bucket_size=4, policy="depth", buffer=None):
+        if policy not in REPLACEMENT_POLICIES:
+            raise ValueError(f"Unknown replacement policy {policy!r}, expected one of {REPLACEMENT_POLICIES}")
+        if bucket_size < 1:
+            raise ValueError("bucket_size must be at least 1")
+        bucket_bytes = ENTRY_BYTES * bucket_size
+        available = len(buffer) if buffer is not None else int(memory_mb * 1024 * 1024)
+        buckets = available // bucket_bytes
+        if buckets < 1:
+            raise ValueError(f"{available} bytes is too small for a bucket of {bucket_size} entries")
+        self.num_buckets = buckets  # not rounded to a power of two, which could waste half the budget
+        self.bucket_size = bucket_size
+        self.bucket_words = bucket_size * ENTRY_WORDS
+        self.policy = policy
+        size = self.num_buckets * bucket_bytes
+        self.buffer = bytearray(size) if buffer is None else memoryview(buffer)[:size]
+        self.words = memoryview(self.buffer).cast('Q')
+        self.generation = 0
+        self.reset_stats()
+
+    def close(self):
+        # drops the views on the buffer, which a SharedMemory needs before it can close
+        self.words.release()
+        if isinstance(self.buffer, memoryview):
+            self.buffer.release()
+
+    @property
+    def memory_bytes(self):
+        return len(self.buffer)
+
+    @property
+    def capacity(self):
+        return self.num_buckets * self.bucket_size
+
+    def reset_stats(self):
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.overwrites = 0
+
+    def clear(self):
+        self.words[:] = memoryview(bytes(len(self.buffer))).cast('Q')
+        self.generation = 0
+        self.reset_stats()
+
+    def new_search(self):
+        # ages existing entries so the "depth" policy prefers replacing them
+        self.generation = (self.generation + 1) & 0xFF
+
+    def _bucket(self, key):
+        return key % self.num_buckets * self.bucket_words
+
+    def probe(self, key):
+        # (value, depth, flag, move) or None
+        self.probes += 1
+        words = self.words
+        base = self._bucket(key)
+        for slot in range(base, base + self.bucket_words, ENTRY_WORDS):
+            value = words[slot + 1]
+            info = words[slot + 2]
+            if words[slot] ^ value ^ info == key and info & OCCUPIED:
+                self.hits += 1
+                if value & SIGN_BIT:
+                    value -= 1 << 64
+                return value, (info >> 16) & 0xFF, (info >> 24) & 0x3, info & 0xFFFF
+        return None
+
+    def store(self, key, value, depth=0, flag=EXACT, move=0):
+        words = self.words
+        base = self._bucket(key)
+        generation = self.generation
+        victim = base
+        victim_score = None
+        for slot in range(base, base + self.bucket_words, ENTRY_WORDS):
+            info = words[slot + 2]
+            if not info & OCCUPIED or words[slot] ^ words[slot + 1] ^ info == key:
+                victim = slot
+                victim_score = None
+                break
+            age = (generation - (info >> 32)) & 0xFF
+            if self.policy == "depth":
+                score = ((info >> 16) & 0xFF) - 8 * age
+            else:
+                score = -age
+            if victim_score is None or score < victim_score:
+                victim = slot
+                victim_score = score
+        if victim_score is not None:
+            self.overwrites += 1
+        self.stores += 1
+        value &= MASK_64
+        info = pack_info(move, depth, flag, generation)
+        words[victim] = key ^ value ^ info
+        words[victim + 1] = value
+        words[victim + 2] = info
+
+    @property
+    def misses(self):
+        return self.probes - self.hits
+
+    @property
+    def hit_rate(self):
+        return self.hits / self.probes if self.probes else 0.0
+
+    def hashfull(self):
+        # per mille of slots in use, sampled from the first 1000 entries like UCI engines report
+        sample = min(1000, self.capacity)
+        used = sum(1 for entry in range(sample) if self.words[entry * ENTRY_WORDS + 2] & OCCUPIED)
+        return used * 1000 // sample
+
+    def stats(self):
+        return {
+            "memory_bytes": self.memory_bytes,
+            "entries": self.capacity,
+            "probes": self.probes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+            "stores": self.stores,
+            "overwrites": self.overwrites,
+            "hashfull": self.hashfull(),
+        }
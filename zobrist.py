@@ -0,0 +1,40 @@
+import random
+
+# Fixed seed so hashes are stable between runs and processes
+_random = random.Random(0x5EED_C4E55)
+
+
+def _random_key():
+    return _random.getrandbits(64)
+
+
+PIECE_KEYS = {piece: [_random_key() for _ in range(64)] for piece in "PNBRQKpnbrqk"}
+SIDE_KEY = _random_key()  # xored in when black is to move
+CASTLING_KEYS = {right: _random_key() for right in "KQkq"}
+EN_PASSANT_KEYS = [_random_key() for _ in range(8)]  # one per file
+
+_castling_hashes = {}
+
+
+def castling_hash(castling):
+    key = _castling_hashes.get(castling)
+    if key is None:
+        key = 0
+        for right in castling:
+            key ^= CASTLING_KEYS.get(right, 0)
+        _castling_hashes[castling] = key
+    return key
+
+
+def compute_hash(board, turn, castling, en_passant):
+    # full recomputation; Position keeps its hash up to date incrementally instead
+    key = 0
+    for index, piece in enumerate(board):
+        if piece != '.':
+            key ^= PIECE_KEYS[piece][index]
+    if turn == 'b':
+        key ^= SIDE_KEY
+    key ^= castling_hash(castling)
+    if en_passant:
+        key ^= EN_PASSANT_KEYS[en_passant[0]]
+    return key